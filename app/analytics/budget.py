@@ -0,0 +1,204 @@
+"""
+Бюджет по правилу 50/30/20 (раздел `budgetPlan`), рассчитанный по реальным транзакциям пользователя.
+
+Расходы раскладываются по трем конвертам (обязательные траты, желания, накопления) по категории
+операции, доход — средний месячный доход за последние полные месяцы. Прогноз на конец месяца
+считается по темпу трат с начала месяца.
+
+Для каждого пользователя хранится состояние с помесячными суммами по конвертам. История пользователя
+обрабатывается векторно один раз, а новые транзакции после очередной синхронизации только добавляются
+в затронутые ячейки (месяц, конверт), поэтому расчет плана не зависит от длины истории.
+"""
+import calendar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.analytics.frame import TransactionFrame, transaction_key
+from app.analytics.state import UserStateCache
+from app.ui_connector import schemas
+
+# Конверты в порядке индексов в массивах состояния: (тип, название, доля дохода, цвет)
+ENVELOPES = (
+    ("essentials", "Обязательные платежи", 0.5, "#3b82f6"),
+    ("wants", "Развлечения и Хотелки", 0.3, "#a855f7"),
+    ("savings", "Накопления и Инвестиции", 0.2, "#22c55e"),
+)
+ESSENTIALS, WANTS, SAVINGS = range(len(ENVELOPES))
+
+# Категории обязательных трат и накоплений; остальные расходы считаются желаниями
+ESSENTIAL_CATEGORIES = frozenset({
+    "Супермаркеты", "Продукты", "АЗС", "Транспорт", "ЖКХ", "Коммунальные платежи", "Связь",
+    "Аптеки", "Здоровье", "Кредиты", "Образование",
+})
+SAVINGS_CATEGORIES = frozenset({"Накопления", "Инвестиции", "Вклады"})
+
+# За сколько последних полных месяцев усредняется доход
+INCOME_MONTHS = 3
+
+
+def _rubles(amount: float) -> str:
+    return f"{amount:,.0f} ₽".replace(",", " ")
+
+
+def envelope_of(category: Optional[str]) -> int:
+    """
+    Возвращает индекс конверта для категории расхода.
+    """
+    if category in ESSENTIAL_CATEGORIES:
+        return ESSENTIALS
+    if category in SAVINGS_CATEGORIES:
+        return SAVINGS
+    return WANTS
+
+
+@dataclass
+class _UserBudgetState:
+    """
+    Накопленные суммы пользователя: расходы по конвертам и доход по месяцам, в копейках.
+    """
+    spent: Dict[np.datetime64, np.ndarray] = field(default_factory=dict) # {месяц: [расход по каждому конверту]}
+    income: Dict[np.datetime64, int] = field(default_factory=dict)
+    seen_ids: Set[Tuple[str, str, str]] = field(default_factory=set) # Уже учтенные транзакции (банк, счет, id)
+
+    def add(self, frame: TransactionFrame):
+        """
+        Добавляет транзакции кадра к помесячным суммам одной векторной группировкой по (месяц, конверт).
+        """
+        dated = ~np.isnat(frame.timestamp)
+        if not dated.any():
+            return
+        frame = frame.filter(dated)
+        months = frame.months()
+        month_keys, month_index = np.unique(months, return_inverse=True)
+
+        # Код категории -> конверт; таблица категорий кадра обычно содержит десятки строк
+        envelope_by_code = np.array([envelope_of(name) for name in frame.categories.values], dtype=np.int64)
+        expenses = frame.amount < 0
+        if expenses.any():
+            cells = month_index[expenses] * len(ENVELOPES) + envelope_by_code[frame.category[expenses]]
+            spent = np.bincount(cells, weights=-frame.amount[expenses], minlength=len(month_keys) * len(ENVELOPES))
+            spent = spent.reshape(len(month_keys), len(ENVELOPES)).astype(np.int64)
+            for month, row in zip(month_keys, spent):
+                if row.any():
+                    self.spent[month] = self.spent.get(month, np.zeros(len(ENVELOPES), dtype=np.int64)) + row
+
+        incomes = frame.amount > 0
+        if incomes.any():
+            income = np.bincount(month_index[incomes], weights=frame.amount[incomes], minlength=len(month_keys)).astype(np.int64)
+            for month, total in zip(month_keys, income):
+                if total:
+                    self.income[month] = self.income.get(month, 0) + int(total)
+
+
+class BudgetEngine:
+    """
+    Рассчитывает `BudgetPlan` по транзакциям пользователя, храня помесячные суммы между запросами.
+
+    Состояние хранится для не более чем `max_users` пользователей (вытесняются давно не обращавшиеся).
+    """
+    def __init__(self, max_users: int = 10000):
+        self._states: UserStateCache[_UserBudgetState] = UserStateCache(_UserBudgetState, max_users)
+
+    def update(self, user_id: str, transactions: Iterable[schemas.Transaction]) -> int:
+        """
+        Учитывает новые транзакции пользователя. Транзакции, уже учтенные ранее (по банку, счету и `id`), пропускаются,
+        поэтому можно передавать всю полученную историю. Возвращает число добавленных транзакций.
+        """
+        state = self._states.get(user_id)
+        new = {}
+        for transaction in transactions:
+            key = transaction_key(transaction)
+            if key not in state.seen_ids:
+                new.setdefault(key, transaction)
+        if not new:
+            return 0
+        state.add(TransactionFrame.from_transactions(new.values()))
+        state.seen_ids.update(new)
+        return len(new)
+
+    def plan(self, user_id: str, now: Optional[datetime] = None) -> schemas.BudgetPlan:
+        """
+        Возвращает план на текущий месяц по накопленным суммам пользователя.
+        """
+        now = now or datetime.now(timezone.utc)
+        state = self._states.get(user_id)
+        current_month = np.datetime64(now.strftime("%Y-%m"), "M")
+        days_in_month = calendar.monthrange(now.year, now.month)[1]
+        days_elapsed = now.day
+        days_remaining = days_in_month - now.day + 1 # Сегодняшний день еще можно тратить
+
+        spent = state.spent.get(current_month, np.zeros(len(ENVELOPES), dtype=np.int64)) / 100
+        previous_months = [current_month - np.timedelta64(offset, "M") for offset in range(1, INCOME_MONTHS + 1)]
+        past_incomes = [state.income[month] for month in previous_months if month in state.income]
+        current_income = state.income.get(current_month, 0)
+
+        # Доход — среднее за полные месяцы; без истории — поступления текущего месяца
+        monthly_income = (sum(past_incomes) / len(past_incomes) if past_incomes else current_income) / 100
+        allocated = np.array([share for _, _, share, _ in ENVELOPES]) * monthly_income
+
+        # Темп трат переносится на оставшиеся дни; переводы в накопления разовые и не экстраполируются
+        forecast = spent / days_elapsed * days_in_month
+        forecast[SAVINGS] = spent[SAVINGS]
+
+        discretionary_left = allocated[ESSENTIALS] + allocated[WANTS] - spent[ESSENTIALS] - spent[WANTS]
+        envelopes = [
+            schemas.BudgetEnvelope(
+                id=f"env_{kind}",
+                name=name,
+                type=kind,
+                allocatedAmount=round(float(allocated[index]), 2),
+                spentAmount=round(float(spent[index]), 2),
+                forecastedAmount=round(float(forecast[index]), 2),
+                color=color,
+            )
+            for index, (kind, name, _, color) in enumerate(ENVELOPES)
+        ]
+        return schemas.BudgetPlan(
+            totalMonthlyIncome=round(monthly_income),
+            safeDailySpend=max(0, int(discretionary_left // days_remaining)),
+            daysRemainingInMonth=days_remaining,
+            envelopes=envelopes,
+            insights=self._insights(envelopes, monthly_income),
+        )
+
+    @staticmethod
+    def _insights(envelopes: List[schemas.BudgetEnvelope], monthly_income: float) -> List[str]:
+        if monthly_income <= 0:
+            return ["Поступлений пока не видно: подключите счет, на который приходит доход, чтобы рассчитать бюджет."]
+        insights = []
+        for envelope in envelopes[:SAVINGS]:
+            overrun = envelope.forecasted_amount - envelope.allocated_amount
+            if overrun > 0:
+                insights.append(f"При текущем темпе расходы на '{envelope.name}' превысят план на {_rubles(overrun)}.")
+        savings = envelopes[SAVINGS]
+        if savings.spent_amount >= savings.allocated_amount:
+            insights.append("Вы отлично справляетесь с накоплениями!")
+        else:
+            insights.append(f"До плана по накоплениям в этом месяце осталось {_rubles(savings.allocated_amount - savings.spent_amount)}.")
+        return insights
+
+    def forget(self, user_id: str):
+        """
+        Удаляет состояние пользователя (например, после отзыва согласий).
+        """
+        self._states.forget(user_id)
+
+    def clear(self):
+        """
+        Удаляет состояние всех пользователей.
+        """
+        self._states.clear()
+
+
+# Движок бюджета, общий для всех запросов к приложению
+budget_engine = BudgetEngine()
+
+
+def get_budget_engine() -> BudgetEngine:
+    """
+    Зависимость FastAPI для получения движка бюджета.
+    """
+    return budget_engine
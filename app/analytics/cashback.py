@@ -0,0 +1,258 @@
+"""
+Выбор карты с наибольшим кэшбэком (разделы `cashbackCategories` и `recommendedCardOffers`).
+
+Ставки кэшбэка карточных программ хранятся в матрице категория x программа: для категорий,
+которых нет в условиях программы, действует ее базовая ставка. При построении матрицы для каждой
+категории заранее вычисляется программа с наибольшей ставкой (argmax по строке), а для пользователя —
+лучшая из его карт, поэтому ответ на вопрос "какой картой платить в категории X" — чтение по индексу.
+
+Рекомендации карт считаются по тратам пользователя за последние `SPEND_DAYS` дней: вектор трат
+по категориям умножается на матрицу прироста ставки относительно лучшей карты пользователя —
+одно матрично-векторное произведение дает ожидаемый дополнительный кэшбэк каждой программы.
+
+API банков не отдает ставки кэшбэка, поэтому условия программ задаются каталогом `DEFAULT_PROGRAMS`.
+Какие программы есть у пользователя, определяется по его картам, счетам и договорам по продуктам.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.analytics.frame import TransactionFrame
+from app.analytics.state import UserStateCache
+from app.ui_connector import schemas
+
+# Строка матрицы для категорий, которых нет в условиях ни одной программы
+OTHER = "*"
+
+# За сколько последних дней учитываются траты при выборе рекомендуемых карт
+SPEND_DAYS = 90
+
+
+@dataclass(frozen=True)
+class CardProgram:
+    """
+    Условия кэшбэка карточной программы банка.
+
+    - `rates`: Кэшбэк в процентах по категориям операций.
+    - `base_rate`: Кэшбэк в процентах на остальные покупки.
+    - `product_id`: Продукт банка; договор по нему означает, что карта у пользователя есть.
+    - `offered`: Программа предлагается к оформлению; карты без этого признака выдаются
+      всем клиентам банка с дебетовым или кредитным счетом.
+    """
+    id: str
+    name: str
+    bank_name: str
+    rates: Dict[str, int]
+    base_rate: float = 0.0
+    is_credit: bool = False
+    brand_color: str = "#6b7280"
+    benefits: Tuple[str, ...] = ()
+    product_id: Optional[str] = None
+    offered: bool = False
+
+
+DEFAULT_PROGRAMS = (
+    CardProgram("abank_debit", "ABank Дебетовая", "ABank", {"Рестораны": 5, "АЗС": 3, "Путешествия": 2, "Супермаркеты": 3, "Подписки": 10, "Книги": 5, "Такси": 5}, 1.0, brand_color="#EF3124"),
+    CardProgram("sbank_debit", "SBank Дебетовая", "SBank", {"Супермаркеты": 2, "Рестораны": 1, "АЗС": 1, "Доставка": 5}, 0.5, brand_color="#228B22"),
+    CardProgram("vbank_debit", "VBank Дебетовая", "VBank", {"Маркетплейсы": 3, "Аптеки": 3, "Транспорт": 2}, 1.0, brand_color="#0033A0"),
+    CardProgram(
+        "rec_card_1", "ABank Premium", "ABank", {"Рестораны": 10, "Такси": 7, "Путешествия": 5}, 1.5,
+        brand_color="#333333", benefits=("Повышенный кэшбэк в ресторанах",), product_id="abank-premium-card", offered=True,
+    ),
+    CardProgram(
+        "rec_card_2", "VBank Travel", "VBank", {"Путешествия": 7, "АЗС": 5, "Такси": 5}, 1.0, is_credit=True,
+        brand_color="#0033A0", benefits=("Кэшбэк милями на путешествия", "Льготный период 100 дней"), product_id="vbank-travel-card", offered=True,
+    ),
+    CardProgram(
+        "rec_card_3", "SBank Семейная", "SBank", {"Супермаркеты": 7, "Аптеки": 5, "Доставка": 5}, 0.5,
+        brand_color="#228B22", benefits=("Повышенный кэшбэк на продукты",), product_id="sbank-family-card", offered=True,
+    ),
+)
+
+
+def _rubles(amount: float) -> str:
+    return f"{amount:,.0f} ₽".replace(",", " ")
+
+
+class CashbackMatrix:
+    """
+    Ставки кэшбэка в матрице категория x программа и лучшая программа для каждой категории.
+    """
+    def __init__(self, programs: Sequence[CardProgram]):
+        self.programs = list(programs)
+        categories = sorted({category for program in self.programs for category in program.rates})
+        self.categories = categories + [OTHER]
+        self._rows = {category: row for row, category in enumerate(self.categories)}
+        self.rates = np.array(
+            [[program.rates.get(category, program.base_rate) for program in self.programs] for category in categories]
+            + [[program.base_rate for program in self.programs]],
+            dtype=np.float64,
+        ).reshape(len(self.categories), len(self.programs))
+        self.best, self.best_rate = self.argmax(np.ones(len(self.programs), dtype=bool))
+
+    def row(self, category: str) -> int:
+        return self._rows.get(category, self._rows[OTHER])
+
+    def argmax(self, columns: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Для каждой категории возвращает индекс программы с наибольшей ставкой среди `columns`
+        (булева маска программ) и саму ставку. Без программ — индекс -1 и ставка 0.
+        """
+        if not columns.any():
+            return np.full(len(self.categories), -1), np.zeros(len(self.categories))
+        masked = np.where(columns, self.rates, -np.inf)
+        best = masked.argmax(axis=1)
+        return best, self.rates[np.arange(len(self.categories)), best]
+
+    def spend_vector(self, spend: Dict[str, float]) -> np.ndarray:
+        """
+        Раскладывает траты `{категория: сумма}` по строкам матрицы; неизвестные категории попадают в `OTHER`.
+        """
+        vector = np.zeros(len(self.categories))
+        for category, amount in spend.items():
+            vector[self.row(category)] += amount
+        return vector
+
+
+@dataclass
+class _UserCashbackState:
+    """
+    Программы пользователя (маска столбцов матрицы) и лучшая из них по каждой категории.
+    """
+    owned: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+    best: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    best_rate: np.ndarray = field(default_factory=lambda: np.zeros(0))
+
+
+class CashbackOptimizer:
+    """
+    Подбирает карту для оплаты в каждой категории и рекомендует новые карты по тратам пользователя.
+
+    Состояние хранится для не более чем `max_users` пользователей (вытесняются давно не обращавшиеся).
+    """
+    def __init__(self, programs: Sequence[CardProgram] = DEFAULT_PROGRAMS, max_users: int = 10000):
+        self.matrix = CashbackMatrix(programs)
+        self._states: UserStateCache[_UserCashbackState] = UserStateCache(_UserCashbackState, max_users)
+
+    def update_user(
+        self,
+        user_id: str,
+        accounts: Iterable[schemas.Account] = (),
+        cards: Iterable[schemas.Card] = (),
+        agreements: Iterable[schemas.ProductAgreementSummary] = (),
+    ):
+        """
+        Определяет программы пользователя по его картам, счетам и договорам и пересчитывает лучшую карту по категориям.
+        """
+        banks = {card.bank_name for card in cards} | {account.bank_name for account in accounts if account.type in ("debit", "credit")}
+        products = {agreement.product_id for agreement in agreements}
+        owned = np.array([
+            (program.bank_name in banks and not program.offered) or (program.product_id is not None and program.product_id in products)
+            for program in self.matrix.programs
+        ], dtype=bool)
+        state = self._states.get(user_id)
+        state.owned = owned
+        state.best, state.best_rate = self.matrix.argmax(owned)
+
+    def best_card(self, category: str, user_id: Optional[str] = None) -> tuple[Optional[CardProgram], float]:
+        """
+        Возвращает программу с наибольшим кэшбэком в категории и ставку: среди карт пользователя,
+        если указан `user_id`, иначе среди всех программ. Если карты пользователя неизвестны
+        (`update_user` не вызывался) или их нет, возвращает `(None, 0.0)`.
+        """
+        row = self.matrix.row(category)
+        if user_id is None:
+            index, rate = int(self.matrix.best[row]), float(self.matrix.best_rate[row])
+        else:
+            state = self._states.peek(user_id)
+            if state is None:
+                return None, 0.0
+            index, rate = int(state.best[row]), float(state.best_rate[row])
+        return (self.matrix.programs[index] if index >= 0 else None), rate
+
+    def cashback_categories(self, user_id: str) -> List[schemas.CashbackCategory]:
+        """
+        Возвращает ставки кэшбэка по категориям для каждого банка, карты которого есть у пользователя.
+        """
+        state = self._states.peek(user_id)
+        if state is None:
+            return []
+        by_bank: Dict[str, Dict[str, int]] = {}
+        for index in np.flatnonzero(state.owned):
+            program = self.matrix.programs[index]
+            categories = by_bank.setdefault(program.bank_name, {})
+            for category, rate in program.rates.items():
+                categories[category] = max(categories.get(category, 0), rate)
+        return [schemas.CashbackCategory(bankName=bank_name, categories=categories) for bank_name, categories in by_bank.items()]
+
+    def score(self, user_id: str, spend: np.ndarray) -> np.ndarray:
+        """
+        Возвращает дополнительный кэшбэк в рублях, который дала бы каждая программа при тратах `spend`
+        (вектор по строкам матрицы) по сравнению с лучшими картами пользователя. Для карт пользователя — 0.
+        """
+        state = self._states.peek(user_id)
+        current = state.best_rate if state is not None else np.zeros(len(self.matrix.categories))
+        uplift = np.maximum(self.matrix.rates - current[:, None], 0)
+        if state is not None:
+            uplift[:, state.owned] = 0
+        return uplift.T @ spend / 100
+
+    def recommend(
+        self,
+        user_id: str,
+        transactions: Sequence[schemas.Transaction],
+        now: Optional[datetime] = None,
+        limit: int = 3,
+    ) -> List[schemas.RecommendedCardOffer]:
+        """
+        Рекомендует предлагаемые банками карты, которые дали бы наибольший дополнительный кэшбэк
+        по тратам пользователя за последние `SPEND_DAYS` дней.
+        """
+        now = now or datetime.now(timezone.utc)
+        frame = TransactionFrame.from_transactions(transactions)
+        spend = frame.group_sum("category", frame.mask(start=now - timedelta(days=SPEND_DAYS), expenses=True))
+        monthly_spend = self.matrix.spend_vector({category: -amount / 100 for category, amount in spend.items()}) * 30 / SPEND_DAYS
+        gains = self.score(user_id, monthly_spend)
+
+        offers = []
+        for index in np.argsort(-gains, kind="stable"):
+            if gains[index] <= 0 or len(offers) == limit:
+                break
+            program = self.matrix.programs[index]
+            if not program.offered:
+                continue
+            offers.append(schemas.RecommendedCardOffer(
+                id=program.id,
+                name=program.name,
+                bankName=program.bank_name,
+                brandColor=program.brand_color,
+                benefits=[*program.benefits, f"≈ {_rubles(gains[index])} дополнительного кэшбэка в месяц по вашим тратам"],
+                isCredit=program.is_credit,
+                cashbackRates=program.rates,
+            ))
+        return offers
+
+    def forget(self, user_id: str):
+        """
+        Удаляет состояние пользователя.
+        """
+        self._states.forget(user_id)
+
+    def clear(self):
+        """
+        Удаляет состояние всех пользователей.
+        """
+        self._states.clear()
+
+
+# Подбор карт по кэшбэку, общий для всех запросов к приложению
+cashback_optimizer = CashbackOptimizer()
+
+
+def get_cashback_optimizer() -> CashbackOptimizer:
+    """
+    Зависимость FastAPI для получения подбора карт по кэшбэку.
+    """
+    return cashback_optimizer
@@ -0,0 +1,316 @@
+"""
+Колоночное представление истории транзакций пользователя для аналитики.
+
+Аналитические разделы UI (бюджет, финансовое здоровье, кэшбэк) обрабатывают всю историю
+транзакций пользователя. Список словарей в формате банка занимает около килобайта на транзакцию
+и обрабатывается циклами Python. `TransactionFrame` хранит те же данные в массивах NumPy:
+сумма в копейках, время проведения и коды строк (категория, контрагент, счет), а сами строки
+хранятся один раз в таблицах `StringTable`. Фильтры и группировки выполняются векторно.
+"""
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.ui_connector import mappers
+
+# Код отсутствующего значения в колонках строковых кодов
+MISSING = -1
+
+# Колонки, по которым выполняется группировка, и их таблицы строк
+GROUP_KEYS = ("category", "merchant", "account")
+
+_NON_LETTERS = re.compile(r"[^a-zа-я]+")
+
+
+class StringTable:
+    """
+    Таблица интернированных строк: каждая строка хранится один раз и заменяется в колонках кодом.
+    """
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value: Optional[str]) -> int:
+        """
+        Возвращает код строки, добавляя ее в таблицу при первом появлении. Для `None` возвращает `MISSING`.
+        """
+        if value is None:
+            return MISSING
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def find(self, value: str) -> int:
+        """
+        Возвращает код строки без добавления в таблицу или `MISSING`, если строки нет.
+        """
+        return self._codes.get(value, MISSING)
+
+    def __getitem__(self, code: int) -> Optional[str]:
+        return self.values[code] if code != MISSING else None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def normalize_merchant(name: Optional[str]) -> Optional[str]:
+    """
+    Приводит название контрагента или описание операции к виду для сравнения: нижний регистр,
+    без цифр и знаков (номера заказов, терминалов и т.п.). Возвращает `None`, если букв в строке нет.
+    """
+    if not name:
+        return None
+    normalized = _NON_LETTERS.sub(" ", name.lower().replace("ё", "е")).strip()
+    return normalized or None
+
+
+def transaction_key(transaction: Any) -> Tuple[str, str, str]:
+    """
+    Возвращает ключ транзакции UI для пропуска уже учтенных: идентификаторы банков не уникальны
+    между банками и счетами, поэтому ключ включает банк и счет.
+    """
+    return transaction.bank_name or "", transaction.account_id or "", transaction.id
+
+
+def to_minor_units(amount: float) -> int:
+    """
+    Переводит сумму в копейки. Целые копейки исключают накопление ошибок округления при суммировании.
+    """
+    return int(round(amount * 100))
+
+
+def _timestamp(value: str) -> np.datetime64:
+    """
+    Переводит дату транзакции в UTC-момент с точностью до секунды или `NaT`, если дата не распознана.
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return np.datetime64("NaT", "s")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(parsed, "s")
+
+
+class TransactionFrame:
+    """
+    Неизменяемый набор транзакций в колонках NumPy.
+
+    Колонки (одинаковой длины):
+    - `amount`: сумма со знаком в копейках (`int64`), списания отрицательные;
+    - `timestamp`: момент проведения в UTC (`datetime64[s]`), `NaT` для транзакций без даты;
+    - `category`, `merchant`, `account`: коды строк (`int32`) в таблицах `categories`, `merchants`, `accounts`.
+
+    Таблицы строк общие для кадра и всех кадров, полученных из него (`filter`, `append_payloads`),
+    поэтому коды можно сравнивать между ними.
+    """
+    def __init__(
+        self,
+        amount: np.ndarray,
+        timestamp: np.ndarray,
+        category: np.ndarray,
+        merchant: np.ndarray,
+        account: np.ndarray,
+        categories: StringTable,
+        merchants: StringTable,
+        accounts: StringTable,
+    ):
+        self.amount = amount
+        self.timestamp = timestamp
+        self.category = category
+        self.merchant = merchant
+        self.account = account
+        self.categories = categories
+        self.merchants = merchants
+        self.accounts = accounts
+
+    @classmethod
+    def empty(cls, categories: StringTable | None = None, merchants: StringTable | None = None, accounts: StringTable | None = None) -> "TransactionFrame":
+        return cls(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype="datetime64[s]"),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.int32),
+            categories if categories is not None else StringTable(),
+            merchants if merchants is not None else StringTable(),
+            accounts if accounts is not None else StringTable(),
+        )
+
+    @classmethod
+    def from_payloads(cls, payloads: Iterable[Dict[str, Any]], default_category: str = "Прочее") -> "TransactionFrame":
+        """
+        Строит кадр из транзакций в формате банка.
+        Счет транзакции берется из поля `account_id`, которое добавляет `MCPService.get_all_transactions`.
+        """
+        return cls.empty().append_payloads(payloads, default_category)
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Any]) -> "TransactionFrame":
+        """
+        Строит кадр из транзакций UI (`app.ui_connector.schemas.Transaction`).
+        """
+        return cls.empty().append_transactions(transactions)
+
+    def append_transactions(self, transactions: Iterable[Any]) -> "TransactionFrame":
+        """
+        Возвращает новый кадр, дополненный транзакциями UI. Таблицы строк общие с исходным кадром.
+        """
+        amount, timestamp, category, merchant, account = [], [], [], [], []
+        for transaction in transactions:
+            amount.append(to_minor_units(transaction.amount))
+            timestamp.append(_timestamp(transaction.date))
+            category.append(self.categories.code(transaction.category))
+            merchant.append(self.merchants.code(transaction.description))
+            account.append(self.accounts.code(transaction.account_id))
+        return self._concatenate(amount, timestamp, category, merchant, account)
+
+    def append_payloads(self, payloads: Iterable[Dict[str, Any]], default_category: str = "Прочее") -> "TransactionFrame":
+        """
+        Возвращает новый кадр, дополненный транзакциями в формате банка. Таблицы строк общие с исходным кадром.
+        """
+        amount, timestamp, category, merchant, account = [], [], [], [], []
+        for raw in payloads:
+            amount.append(to_minor_units(mappers.signed_amount(raw)))
+            timestamp.append(_timestamp(mappers.transaction_date(raw)))
+            category.append(self.categories.code(raw.get("category") or default_category))
+            merchant.append(self.merchants.code(mappers.merchant_name(raw) or raw.get("transactionInformation") or raw.get("description")))
+            account_id = raw.get("account_id")
+            account.append(self.accounts.code(str(account_id) if account_id is not None else None))
+        return self._concatenate(amount, timestamp, category, merchant, account)
+
+    def _concatenate(self, amount: List[int], timestamp: List[np.datetime64], category: List[int], merchant: List[int], account: List[int]) -> "TransactionFrame":
+        return TransactionFrame(
+            np.concatenate([self.amount, np.array(amount, dtype=np.int64)]),
+            np.concatenate([self.timestamp, np.array(timestamp, dtype="datetime64[s]")]),
+            np.concatenate([self.category, np.array(category, dtype=np.int32)]),
+            np.concatenate([self.merchant, np.array(merchant, dtype=np.int32)]),
+            np.concatenate([self.account, np.array(account, dtype=np.int32)]),
+            self.categories, self.merchants, self.accounts,
+        )
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Размер колонок в байтах (без таблиц строк, общих для всех транзакций).
+        """
+        return sum(column.nbytes for column in (self.amount, self.timestamp, self.category, self.merchant, self.account))
+
+    def mask(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        categories: Sequence[str] | None = None,
+        accounts: Sequence[str] | None = None,
+        expenses: bool | None = None,
+    ) -> np.ndarray:
+        """
+        Возвращает булеву маску транзакций, подходящих под все условия.
+
+        - `start`, `end`: Полуинтервал времени проведения `[start, end)`; транзакции без даты не проходят.
+        - `categories`, `accounts`: Допустимые категории и идентификаторы счетов.
+        - `expenses`: `True` — только списания, `False` — только поступления.
+        """
+        selected = np.ones(len(self), dtype=bool)
+        if start is not None:
+            selected &= self.timestamp >= _timestamp(start.isoformat())
+        if end is not None:
+            selected &= self.timestamp < _timestamp(end.isoformat())
+        if categories is not None:
+            selected &= np.isin(self.category, [self.categories.find(name) for name in categories])
+        if accounts is not None:
+            selected &= np.isin(self.account, [self.accounts.find(name) for name in accounts])
+        if expenses is True:
+            selected &= self.amount < 0
+        elif expenses is False:
+            selected &= self.amount > 0
+        return selected
+
+    def filter(self, mask: np.ndarray) -> "TransactionFrame":
+        """
+        Возвращает кадр из транзакций, отмеченных маской.
+        """
+        return TransactionFrame(
+            self.amount[mask], self.timestamp[mask], self.category[mask], self.merchant[mask], self.account[mask],
+            self.categories, self.merchants, self.accounts,
+        )
+
+    def months(self) -> np.ndarray:
+        """
+        Возвращает месяц проведения каждой транзакции (`datetime64[M]`).
+        """
+        return self.timestamp.astype("datetime64[M]")
+
+    def group_sum(self, by: str, mask: np.ndarray | None = None) -> Dict[str, int]:
+        """
+        Суммирует суммы в копейках по категории, контрагенту или счету (`by` из `GROUP_KEYS`).
+        Транзакции без значения ключа не учитываются.
+        """
+        codes, table = self._group_codes(by)
+        amount = self.amount
+        if mask is not None:
+            codes, amount = codes[mask], amount[mask]
+        present = codes != MISSING
+        # Суммы в копейках помещаются в float64 без потери точности до 2^53 копеек
+        sums = np.bincount(codes[present], weights=amount[present], minlength=len(table))
+        counts = np.bincount(codes[present], minlength=len(table))
+        return {table[code]: int(sums[code]) for code in np.flatnonzero(counts)}
+
+    def group_count(self, by: str, mask: np.ndarray | None = None) -> Dict[str, int]:
+        """
+        Считает транзакции по категории, контрагенту или счету.
+        """
+        codes, table = self._group_codes(by)
+        if mask is not None:
+            codes = codes[mask]
+        counts = np.bincount(codes[codes != MISSING], minlength=len(table))
+        return {table[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+    def monthly_sum(self, by: str | None = None, mask: np.ndarray | None = None) -> Dict[tuple[str, str | None], int]:
+        """
+        Суммирует суммы в копейках по месяцу (`"YYYY-MM"`) и, если указан `by`, по ключу группировки.
+        Транзакции без даты не учитываются.
+        """
+        selected = ~np.isnat(self.timestamp)
+        if mask is not None:
+            selected &= mask
+        months = self.months()[selected]
+        amount = self.amount[selected]
+        if by is None:
+            keys, inverse = np.unique(months, return_inverse=True)
+            sums = np.bincount(inverse, weights=amount, minlength=len(keys))
+            return {(str(month), None): int(total) for month, total in zip(keys, sums)}
+
+        codes, table = self._group_codes(by)
+        codes = codes[selected]
+        present = codes != MISSING
+        months, amount, codes = months[present], amount[present], codes[present]
+        month_keys, month_index = np.unique(months, return_inverse=True)
+        # Составной ключ (месяц, код) в одном целом, чтобы сгруппировать обе колонки за один проход
+        width = max(len(table), 1)
+        combined = month_index.astype(np.int64) * width + codes
+        keys, inverse = np.unique(combined, return_inverse=True)
+        sums = np.bincount(inverse, weights=amount, minlength=len(keys))
+        return {
+            (str(month_keys[key // width]), table[int(key % width)]): int(total)
+            for key, total in zip(keys, sums)
+        }
+
+    def _group_codes(self, by: str) -> tuple[np.ndarray, StringTable]:
+        columns = {
+            "category": (self.category, self.categories),
+            "merchant": (self.merchant, self.merchants),
+            "account": (self.account, self.accounts),
+        }
+        if by not in columns:
+            raise ValueError(f"Неизвестный ключ группировки: {by}. Допустимые: {', '.join(GROUP_KEYS)}")
+        return columns[by]
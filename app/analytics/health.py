@@ -0,0 +1,323 @@
+"""
+Оценка финансового здоровья (раздел `financialHealth`) по счетам, кредитам и транзакциям пользователя.
+
+Оценка складывается из четырех составляющих:
+- контроль трат: доля дохода, уходящая на расходы (без переводов в накопления);
+- кредитная нагрузка: платежи по кредитам и минимальные платежи по кредитным картам к доходу;
+- подушка безопасности: доля дохода, переводимая в накопления, и на сколько месяцев расходов хватит остатков накопительных счетов;
+- стабильность дохода: в скольких из последних месяцев были поступления.
+
+Для каждого пользователя хранятся помесячные суммы доходов, расходов и переводов в накопления.
+Новые транзакции только добавляются в ячейки своих месяцев, а оценка читает фиксированное число
+последних месяцев, поэтому ее пересчет после новой транзакции не зависит от длины истории.
+Время расчета каждой составляющей накапливается в `HealthEngine.stats` для профилирования.
+"""
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.analytics.budget import SAVINGS_CATEGORIES
+from app.analytics.frame import TransactionFrame, transaction_key
+from app.analytics.state import UserStateCache
+from app.ui_connector import schemas
+
+# Колонки помесячных сумм состояния
+INCOME, EXPENSES, SAVED = range(3)
+
+# За сколько последних полных месяцев усредняются доходы и расходы
+AVERAGE_MONTHS = 3
+# За сколько последних полных месяцев оценивается стабильность дохода
+REGULARITY_MONTHS = 6
+
+# Доля задолженности по кредитной карте, принимаемая за ежемесячный минимальный платеж
+CREDIT_CARD_MIN_PAYMENT = 0.05
+
+# Доли дохода и запас накоплений, при которых составляющая получает полный или нулевой балл
+SPENDING_RATIO_GOOD, SPENDING_RATIO_BAD = 0.7, 1.0
+DEBT_RATIO_GOOD, DEBT_RATIO_BAD = 0.2, 0.5
+SAVINGS_RATE_GOOD = 0.2
+CUSHION_MONTHS_GOOD = 6
+
+# Награды за итоговую оценку: (id, название, описание, необходимая оценка)
+REWARDS = (
+    ("r1", "Повышенный кэшбэк", "+1% на все покупки в следующем месяце", 70),
+    ("r2", "Скидка на кредит", "-0.5% к ставке по потребительскому кредиту", 85),
+    ("r3", "Бесплатное обслуживание", "Премиум тариф бесплатно на 3 месяца", 95),
+)
+
+
+def _scale(value: float, bad: float, good: float) -> float:
+    """
+    Линейно переводит показатель в долю балла: `bad` и хуже — 0, `good` и лучше — 1.
+    """
+    if good == bad:
+        return 1.0 if value >= good else 0.0
+    return float(min(1.0, max(0.0, (value - bad) / (good - bad))))
+
+
+def _status(score: int, max_score: int) -> str:
+    share = score / max_score if max_score else 0
+    if share >= 0.85:
+        return "excellent"
+    if share >= 0.6:
+        return "good"
+    if share >= 0.35:
+        return "fair"
+    return "poor"
+
+
+def _percent(share: float) -> str:
+    return f"{share * 100:.0f}%"
+
+
+@dataclass
+class _UserHealthState:
+    """
+    Накопленные суммы пользователя по месяцам в копейках: доход, расходы без накоплений, переводы в накопления.
+    """
+    months: Dict[np.datetime64, np.ndarray] = field(default_factory=dict)
+    invested: bool = False # Были ли переводы в инвестиции
+    seen_ids: Set[Tuple[str, str, str]] = field(default_factory=set) # Уже учтенные транзакции (банк, счет, id)
+
+    def add(self, frame: TransactionFrame):
+        """
+        Добавляет транзакции кадра к помесячным суммам одной векторной группировкой по (месяц, колонка).
+        """
+        dated = ~np.isnat(frame.timestamp)
+        if not dated.any():
+            return
+        frame = frame.filter(dated)
+        month_keys, month_index = np.unique(frame.months(), return_inverse=True)
+
+        saving_codes = [frame.categories.find(name) for name in SAVINGS_CATEGORIES]
+        saved = np.isin(frame.category, saving_codes) & (frame.amount < 0)
+        column = np.where(frame.amount > 0, INCOME, np.where(saved, SAVED, EXPENSES))
+        sums = np.bincount(month_index * 3 + column, weights=np.abs(frame.amount), minlength=len(month_keys) * 3)
+        for month, row in zip(month_keys, sums.reshape(len(month_keys), 3).astype(np.int64)):
+            self.months[month] = self.months.get(month, np.zeros(3, dtype=np.int64)) + row
+        self.invested = self.invested or bool((saved & (frame.category == frame.categories.find("Инвестиции"))).any())
+
+
+@dataclass
+class _Inputs:
+    """
+    Показатели пользователя за последние месяцы, общие для всех составляющих оценки (в рублях).
+    """
+    monthly_income: float
+    monthly_expenses: float
+    monthly_saved: float
+    income_months: List[bool] # Были ли поступления в каждом из последних `REGULARITY_MONTHS` месяцев
+    debt_payments: float # Ежемесячные платежи по кредитам и кредитным картам
+    savings_balance: float
+    has_debt: bool
+    invested: bool
+
+
+class HealthEngine:
+    """
+    Рассчитывает `FinancialHealth` по транзакциям, счетам и кредитам пользователя, храня помесячные суммы между запросами.
+
+    Состояние хранится для не более чем `max_users` пользователей (вытесняются давно не обращавшиеся).
+    """
+    def __init__(self, max_users: int = 10000):
+        self._states: UserStateCache[_UserHealthState] = UserStateCache(_UserHealthState, max_users)
+        # Составляющие в порядке вывода: (id, категория, название, максимальный балл, функция расчета)
+        self.components: Sequence[tuple[str, str, str, int, Callable[[_Inputs], tuple[float, str]]]] = (
+            ("comp_spending", "spending", "Контроль трат", 30, self._spending),
+            ("comp_debt", "debt", "Кредитная нагрузка", 30, self._debt),
+            ("comp_savings", "savings", "Подушка безопасности", 20, self._savings),
+            ("comp_regularity", "regularity", "Стабильность дохода", 20, self._regularity),
+        )
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def update(self, user_id: str, transactions: Iterable[schemas.Transaction]) -> int:
+        """
+        Учитывает новые транзакции пользователя. Транзакции, уже учтенные ранее (по банку, счету и `id`), пропускаются,
+        поэтому можно передавать всю полученную историю. Возвращает число добавленных транзакций.
+        """
+        started = time.perf_counter()
+        state = self._states.get(user_id)
+        new = {}
+        for transaction in transactions:
+            key = transaction_key(transaction)
+            if key not in state.seen_ids:
+                new.setdefault(key, transaction)
+        if new:
+            state.add(TransactionFrame.from_transactions(new.values()))
+            state.seen_ids.update(new)
+        self._record("update", started)
+        return len(new)
+
+    def score(
+        self,
+        user_id: str,
+        accounts: Sequence[schemas.Account] = (),
+        loans: Sequence[schemas.Loan] = (),
+        now: Optional[datetime] = None,
+    ) -> schemas.FinancialHealth:
+        """
+        Возвращает оценку финансового здоровья по накопленным суммам пользователя, его счетам и кредитам.
+        """
+        started = time.perf_counter()
+        inputs = self._inputs(self._states.get(user_id), accounts, loans, now or datetime.now(timezone.utc))
+        self._record("inputs", started)
+
+        components = []
+        for component_id, category, label, max_score, compute in self.components:
+            started = time.perf_counter()
+            share, advice = compute(inputs)
+            score = round(share * max_score)
+            components.append(schemas.HealthComponent(
+                id=component_id,
+                category=category,
+                label=label,
+                score=score,
+                maxScore=max_score,
+                status=_status(score, max_score),
+                advice=advice,
+            ))
+            self._record(category, started)
+
+        total_score = sum(component.score for component in components)
+        return schemas.FinancialHealth(
+            totalScore=total_score,
+            components=components,
+            badges=self._badges(inputs),
+            rewards=[
+                schemas.Reward(id=reward_id, title=title, description=description, requiredScore=required, isLocked=total_score < required)
+                for reward_id, title, description, required in REWARDS
+            ],
+        )
+
+    @staticmethod
+    def _inputs(state: _UserHealthState, accounts: Sequence[schemas.Account], loans: Sequence[schemas.Loan], now: datetime) -> _Inputs:
+        current_month = np.datetime64(now.strftime("%Y-%m"), "M")
+        previous_months = [current_month - np.timedelta64(offset, "M") for offset in range(1, REGULARITY_MONTHS + 1)]
+        empty = np.zeros(3, dtype=np.int64)
+
+        # Средние за полные месяцы; без истории — суммы текущего месяца
+        recent = [state.months[month] for month in previous_months[:AVERAGE_MONTHS] if month in state.months]
+        average = (sum(recent) / len(recent) if recent else state.months.get(current_month, empty)) / 100
+
+        credit_debt = sum(-account.balance for account in accounts if account.type == "credit" and account.balance < 0)
+        return _Inputs(
+            monthly_income=float(average[INCOME]),
+            monthly_expenses=float(average[EXPENSES]),
+            monthly_saved=float(average[SAVED]),
+            income_months=[bool(state.months.get(month, empty)[INCOME]) for month in previous_months],
+            debt_payments=sum(loan.monthly_payment for loan in loans) + credit_debt * CREDIT_CARD_MIN_PAYMENT,
+            savings_balance=sum(account.balance for account in accounts if account.type == "savings" and account.balance > 0),
+            has_debt=bool(loans) or credit_debt > 0,
+            invested=state.invested,
+        )
+
+    @staticmethod
+    def _spending(inputs: _Inputs) -> tuple[float, str]:
+        if inputs.monthly_income <= 0:
+            return 0.0, "Поступлений пока не видно: подключите счет, на который приходит доход."
+        ratio = inputs.monthly_expenses / inputs.monthly_income
+        if ratio <= SPENDING_RATIO_GOOD:
+            advice = f"Расходы составляют {_percent(ratio)} дохода. Вы держитесь в рамках бюджета."
+        elif ratio < SPENDING_RATIO_BAD:
+            advice = f"Расходы составляют {_percent(ratio)} дохода. Постарайтесь снизить их до {_percent(SPENDING_RATIO_GOOD)}."
+        else:
+            advice = f"Расходы превышают доход ({_percent(ratio)}). Пересмотрите необязательные траты."
+        return _scale(ratio, SPENDING_RATIO_BAD, SPENDING_RATIO_GOOD), advice
+
+    @staticmethod
+    def _debt(inputs: _Inputs) -> tuple[float, str]:
+        if not inputs.has_debt:
+            return 1.0, "У вас нет кредитной нагрузки."
+        if inputs.monthly_income <= 0:
+            return 0.0, "Платежи по кредитам не покрываются видимыми поступлениями."
+        ratio = inputs.debt_payments / inputs.monthly_income
+        if ratio <= DEBT_RATIO_GOOD:
+            advice = f"Платежи по кредитам составляют {_percent(ratio)} от дохода. Нагрузка комфортная."
+        else:
+            advice = f"Платежи по кредитам составляют {_percent(ratio)} от дохода. Лучше снизить до {_percent(DEBT_RATIO_GOOD)}."
+        return _scale(ratio, DEBT_RATIO_BAD, DEBT_RATIO_GOOD), advice
+
+    @staticmethod
+    def _savings(inputs: _Inputs) -> tuple[float, str]:
+        rate = inputs.monthly_saved / inputs.monthly_income if inputs.monthly_income > 0 else 0.0
+        cushion = inputs.savings_balance / inputs.monthly_expenses if inputs.monthly_expenses > 0 else (CUSHION_MONTHS_GOOD if inputs.savings_balance > 0 else 0)
+        share = (_scale(rate, 0, SAVINGS_RATE_GOOD) + _scale(cushion, 0, CUSHION_MONTHS_GOOD)) / 2
+        if cushion >= CUSHION_MONTHS_GOOD:
+            advice = f"Накоплений хватит более чем на {CUSHION_MONTHS_GOOD} месяцев расходов. Отличная работа!"
+        else:
+            advice = (
+                f"Накоплений хватит на {cushion:.0f} мес. расходов, в накопления уходит {_percent(rate)} дохода. "
+                f"Рекомендуем запас на {CUSHION_MONTHS_GOOD} месяцев."
+            )
+        return share, advice
+
+    @staticmethod
+    def _regularity(inputs: _Inputs) -> tuple[float, str]:
+        share = sum(inputs.income_months) / len(inputs.income_months)
+        if share == 1:
+            advice = "Поступления регулярны и предсказуемы. Отличная работа!"
+        else:
+            advice = f"Поступления были в {sum(inputs.income_months)} из последних {len(inputs.income_months)} месяцев."
+        return share, advice
+
+    @staticmethod
+    def _badges(inputs: _Inputs) -> List[schemas.Badge]:
+        rate = inputs.monthly_saved / inputs.monthly_income if inputs.monthly_income > 0 else 0.0
+        badges = (
+            ("b1", "Зарплатник", "Регулярные поступления 3 месяца подряд", "briefcase", all(inputs.income_months[:3])),
+            ("b2", "Сберегатель", "Откладывать не менее 10% дохода", "piggy", rate >= 0.1),
+            ("b3", "Уничтожитель долгов", "Закрыть все кредиты и задолженности по картам", "shield", not inputs.has_debt),
+            ("b4", "Инвестор", "Перевести деньги в инвестиции", "chart", inputs.invested),
+        )
+        return [
+            schemas.Badge(id=badge_id, name=name, description=description, iconName=icon, unlocked=unlocked)
+            for badge_id, name, description, icon, unlocked in badges
+        ]
+
+    def _record(self, stage: str, started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        timing = self._timings.setdefault(stage, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0})
+        timing["calls"] += 1
+        timing["total_ms"] += elapsed_ms
+        timing["max_ms"] = max(timing["max_ms"], elapsed_ms)
+        timing["last_ms"] = elapsed_ms
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает время расчета по этапам: учет транзакций (`update`), сбор показателей (`inputs`)
+        и каждая составляющая оценки (по категории) — число вызовов, суммарное, максимальное и последнее время в мс.
+        """
+        return {
+            "users": len(self._states),
+            "timings": {
+                stage: {**timing, "avg_ms": timing["total_ms"] / timing["calls"]}
+                for stage, timing in self._timings.items()
+            },
+        }
+
+    def forget(self, user_id: str):
+        """
+        Удаляет состояние пользователя (например, после отзыва согласий).
+        """
+        self._states.forget(user_id)
+
+    def clear(self):
+        """
+        Удаляет состояние всех пользователей и время расчета.
+        """
+        self._states.clear()
+        self._timings.clear()
+
+
+# Движок оценки финансового здоровья, общий для всех запросов к приложению
+health_engine = HealthEngine()
+
+
+def get_health_engine() -> HealthEngine:
+    """
+    Зависимость FastAPI для получения движка оценки финансового здоровья.
+    """
+    return health_engine
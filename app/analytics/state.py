@@ -0,0 +1,46 @@
+"""
+Хранилище состояния аналитики по пользователям.
+
+Движки аналитики держат между запросами накопленные суммы каждого пользователя, чтобы новые транзакции
+обновляли их, а не вызывали пересчет всей истории. Число пользователей в памяти ограничено:
+давно не обращавшиеся вытесняются и при следующем запросе пересчитываются из истории.
+"""
+from collections import OrderedDict
+from typing import Callable, Generic, Optional, TypeVar
+
+State = TypeVar("State")
+
+
+class UserStateCache(Generic[State]):
+    """
+    LRU-словарь состояний пользователей, создающий состояние при первом обращении.
+    """
+    def __init__(self, factory: Callable[[], State], max_users: int = 10000):
+        self.factory = factory
+        self.max_users = max_users
+        self._states: OrderedDict[str, State] = OrderedDict()
+
+    def get(self, user_id: str) -> State:
+        state = self._states.get(user_id)
+        if state is None:
+            state = self._states[user_id] = self.factory()
+            while len(self._states) > self.max_users:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(user_id)
+        return state
+
+    def peek(self, user_id: str) -> Optional[State]:
+        """
+        Возвращает состояние пользователя, не создавая его и не меняя порядок вытеснения.
+        """
+        return self._states.get(user_id)
+
+    def forget(self, user_id: str):
+        self._states.pop(user_id, None)
+
+    def clear(self):
+        self._states.clear()
+
+    def __len__(self) -> int:
+        return len(self._states)
@@ -0,0 +1,230 @@
+"""
+Поиск регулярных платежей и подписок (раздел `subscriptions`) в истории транзакций.
+
+Списания счета группируются по нормализованному контрагенту и близкой сумме: после сортировки
+по (контрагент, сумма) новая группа начинается, когда контрагент меняется или сумма отличается
+от предыдущей больше чем на `AMOUNT_TOLERANCE`, поэтому плавное изменение цены подписки не разрывает группу.
+Затем платежи каждой группы сортируются по времени, и интервалы между соседними платежами
+сравниваются с периодами из `PERIODS` с допуском. Группа считается подпиской, если платежей
+не меньше минимального числа для периода и почти все интервалы совпадают с периодом.
+
+Все шаги — сортировки и векторные операции над колонками `TransactionFrame`, то есть O(n log n)
+по числу списаний. Подписки ищутся отдельно по каждому счету: после синхронизации пересчитываются
+только счета, по которым пришли новые транзакции.
+"""
+import calendar
+import hashlib
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.analytics.frame import MISSING, StringTable, TransactionFrame, normalize_merchant, transaction_key
+from app.analytics.state import UserStateCache
+from app.ui_connector import schemas
+
+
+@dataclass(frozen=True)
+class Period:
+    billing_cycle: str
+    days: float # Средняя длина периода в днях
+    tolerance: float # Допустимое отклонение интервала между платежами в днях
+    min_payments: int # Минимальное число платежей для признания подписки
+
+
+PERIODS = (
+    Period("weekly", 7, 1.5, 4),
+    Period("monthly", 30.44, 3.5, 3),
+    Period("yearly", 365.25, 10, 2),
+)
+
+# Допустимое относительное различие соседних сумм платежей одной подписки
+AMOUNT_TOLERANCE = 0.1
+# Доля интервалов группы, которые должны совпасть с периодом
+MATCH_SHARE = 0.75
+
+
+def _add_months(day: date, months: int) -> date:
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _next_payment(last: date, period: Period) -> date:
+    if period.billing_cycle == "monthly":
+        return _add_months(last, 1)
+    if period.billing_cycle == "yearly":
+        return _add_months(last, 12)
+    return last + timedelta(days=round(period.days))
+
+
+def detect_subscriptions(frame: TransactionFrame, now: Optional[datetime] = None) -> List[schemas.Subscription]:
+    """
+    Находит подписки среди списаний кадра. Подписки, очередной платеж по которым просрочен
+    больше допуска периода, считаются отмененными и не возвращаются.
+    """
+    now = now or datetime.now(timezone.utc)
+    frame = frame.filter(frame.mask(expenses=True) & ~np.isnat(frame.timestamp))
+
+    # Нормализация выполняется один раз на строку таблицы контрагентов, а не на транзакцию
+    normalized = StringTable()
+    normalized_codes = np.array([normalized.code(normalize_merchant(name)) for name in frame.merchants.values] + [MISSING], dtype=np.int32)
+    merchant = normalized_codes[frame.merchant] # Код MISSING (-1) берет последний элемент, тоже MISSING
+    known = merchant != MISSING
+    frame, merchant = frame.filter(known), merchant[known]
+    if len(frame) < min(period.min_payments for period in PERIODS):
+        return []
+    amount = -frame.amount
+
+    # Группы (контрагент, близкая сумма)
+    by_amount = np.lexsort((amount, merchant))
+    sorted_amount, sorted_merchant = amount[by_amount], merchant[by_amount]
+    starts = np.ones(len(frame), dtype=bool)
+    starts[1:] = (sorted_merchant[1:] != sorted_merchant[:-1]) | (sorted_amount[1:] > sorted_amount[:-1] * (1 + AMOUNT_TOLERANCE))
+    group = np.empty(len(frame), dtype=np.int64)
+    group[by_amount] = np.cumsum(starts) - 1
+    groups = int(group.max()) + 1
+
+    # Интервалы между соседними по времени платежами группы
+    by_time = np.lexsort((frame.timestamp, group))
+    group, timestamp = group[by_time], frame.timestamp[by_time]
+    same_group = group[1:] == group[:-1]
+    interval_days = np.diff(timestamp).astype(np.int64) / 86400
+    sizes = np.bincount(group, minlength=groups)
+    first = np.flatnonzero(np.insert(~same_group, 0, True)) # Позиции первого и последнего платежа каждой группы
+    last = np.flatnonzero(np.append(~same_group, True))
+
+    best_period = np.full(groups, -1)
+    best_matches = np.zeros(groups, dtype=np.int64)
+    for index, period in enumerate(PERIODS):
+        matching = same_group & (np.abs(interval_days - period.days) <= period.tolerance)
+        matches = np.bincount(group[1:][matching], minlength=groups)
+        accepted = (sizes >= period.min_payments) & (matches >= MATCH_SHARE * (sizes - 1)) & (matches > best_matches)
+        best_period[accepted] = index
+        best_matches[accepted] = matches[accepted]
+
+    subscriptions = []
+    today = now.astimezone(timezone.utc).date()
+    for group_id in np.flatnonzero(best_period >= 0):
+        period = PERIODS[best_period[group_id]]
+        position = by_time[last[group_id]]
+        last_payment = timestamp[last[group_id]].astype(datetime).date()
+        next_payment = _next_payment(last_payment, period)
+        if (today - next_payment).days > period.tolerance:
+            continue
+        name = frame.merchants[int(frame.merchant[position])]
+        account_id = frame.accounts[int(frame.account[position])] or ""
+        # Идентификатор не меняется при появлении новых платежей: первый платеж группы остается прежним
+        key = f"{account_id}:{normalized[int(merchant[position])]}:{period.billing_cycle}:{timestamp[first[group_id]]}"
+        subscriptions.append(schemas.Subscription(
+            id="sub_" + hashlib.sha1(key.encode()).hexdigest()[:12],
+            name=name,
+            amount=amount[position] / 100,
+            billingCycle=period.billing_cycle,
+            nextPaymentDate=next_payment.isoformat(),
+            linkedAccountId=account_id,
+            status="active",
+        ))
+    return sorted(subscriptions, key=lambda subscription: subscription.next_payment_date)
+
+
+@dataclass
+class _AccountHistory:
+    """
+    Списания одного счета и найденные по ним подписки (`None` — нужно пересчитать).
+    """
+    frame: TransactionFrame = field(default_factory=TransactionFrame.empty)
+    subscriptions: Optional[List[schemas.Subscription]] = None
+
+
+@dataclass
+class _UserSubscriptionState:
+    accounts: Dict[str, _AccountHistory] = field(default_factory=dict)
+    seen_ids: Set[Tuple[str, str, str]] = field(default_factory=set) # Уже учтенные транзакции (банк, счет, id)
+    detected_on: Optional[date] = None # День последнего поиска: просроченные подписки отсеиваются по текущей дате
+
+
+class SubscriptionDetector:
+    """
+    Находит подписки пользователя, храня историю списаний по счетам между запросами.
+
+    Состояние хранится для не более чем `max_users` пользователей (вытесняются давно не обращавшиеся).
+    """
+    def __init__(self, max_users: int = 10000):
+        self._states: UserStateCache[_UserSubscriptionState] = UserStateCache(_UserSubscriptionState, max_users)
+        self._stats: Dict[str, int] = {
+            "detections": 0, # Поиски подписок по счету
+            "reused": 0, # Счета без новых транзакций, для которых переиспользован прошлый результат
+        }
+
+    def update(self, user_id: str, transactions: Iterable[schemas.Transaction]) -> int:
+        """
+        Учитывает новые списания пользователя и помечает их счета для повторного поиска.
+        Транзакции, уже учтенные ранее (по банку, счету и `id`), пропускаются. Возвращает число добавленных транзакций.
+        """
+        state = self._states.get(user_id)
+        new: Dict[str, List[schemas.Transaction]] = {}
+        for transaction in transactions:
+            key = transaction_key(transaction)
+            if key in state.seen_ids:
+                continue
+            state.seen_ids.add(key)
+            if transaction.amount < 0:
+                new.setdefault(transaction.account_id or "", []).append(transaction)
+        for account_id, account_transactions in new.items():
+            history = state.accounts.setdefault(account_id, _AccountHistory())
+            history.frame = history.frame.append_transactions(account_transactions)
+            history.subscriptions = None
+        return sum(len(account_transactions) for account_transactions in new.values())
+
+    def subscriptions(self, user_id: str, now: Optional[datetime] = None) -> List[schemas.Subscription]:
+        """
+        Возвращает подписки пользователя по всем счетам, ближайшие платежи первыми.
+        """
+        now = now or datetime.now(timezone.utc)
+        state = self._states.get(user_id)
+        if state.detected_on != now.date():
+            # Пересчет раз в день отсеивает подписки, платеж по которым так и не пришел
+            for history in state.accounts.values():
+                history.subscriptions = None
+            state.detected_on = now.date()
+
+        subscriptions = []
+        for history in state.accounts.values():
+            if history.subscriptions is None:
+                history.subscriptions = detect_subscriptions(history.frame, now)
+                self._stats["detections"] += 1
+            else:
+                self._stats["reused"] += 1
+            subscriptions.extend(history.subscriptions)
+        return sorted(subscriptions, key=lambda subscription: subscription.next_payment_date)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает число поисков подписок и переиспользованных результатов по счетам.
+        """
+        return {**self._stats, "users": len(self._states)}
+
+    def forget(self, user_id: str):
+        """
+        Удаляет состояние пользователя (например, после отзыва согласий).
+        """
+        self._states.forget(user_id)
+
+    def clear(self):
+        """
+        Удаляет состояние всех пользователей.
+        """
+        self._states.clear()
+
+
+# Поиск подписок, общий для всех запросов к приложению
+subscription_detector = SubscriptionDetector()
+
+
+def get_subscription_detector() -> SubscriptionDetector:
+    """
+    Зависимость FastAPI для получения поиска подписок.
+    """
+    return subscription_detector
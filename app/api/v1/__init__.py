@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, data, payments, products, aggregator, cards
+from app.api.v1.endpoints import auth, data, payments, products, aggregator, cards, admin
 from app.mcp.router import router as mcp_router
 from app.llm_integration.router import router as llm_router
 from app.public_ai_adapter.router import router as public_ai_adapter_router
@@ -13,6 +13,7 @@ api_router.include_router(payments.router, prefix="/payments", tags=["payments"]
 api_router.include_router(products.router, prefix="/products", tags=["products"])
 api_router.include_router(aggregator.router, prefix="/aggregator", tags=["aggregator"])
 api_router.include_router(cards.router, prefix="/cards", tags=["cards"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
 api_router.include_router(mcp_router, prefix="/mcp", tags=["mcp"])
 api_router.include_router(llm_router, prefix="/llm", tags=["llm"])
 api_router.include_router(public_ai_adapter_router, prefix="/public_adapter", tags=["public_adapter"])
@@ -0,0 +1,158 @@
+"""
+API-роутер для служебных (административных) эндпоинтов.
+Предоставляет диагностическую информацию о состоянии внутренних компонентов приложения.
+"""
+from fastapi import APIRouter, Depends
+
+from app.db.database import engine
+from app.db.pool import pool_metrics
+from app.utils.bank_clients import BankClientRegistry, get_bank_client_registry
+from app.banks.response_cache import BankResponseCache, get_bank_response_cache
+from app.auth_manager.dependencies import get_auth_manager, get_token_renewal_scheduler
+from app.auth_manager.services import BaseAuthManager
+from app.auth_manager.scheduler import TokenRenewalScheduler
+from app.mcp.transaction_store import get_transaction_sync_stats
+from app.mcp.consent_registry import get_consent_registry_stats
+from app.analytics.categorizer import Categorizer, get_categorizer
+from app.analytics.health import HealthEngine, get_health_engine
+from app.analytics.subscriptions import SubscriptionDetector, get_subscription_detector
+
+router = APIRouter()
+
+
+@router.get("/bank-clients/stats")
+async def get_bank_clients_stats(
+    registry: BankClientRegistry = Depends(get_bank_client_registry),
+):
+    """
+    Возвращает статистику пулов соединений клиентов банков:
+    idle/active соединения, число запросов и сэкономленных хэндшейков.
+    """
+    return {"bank_clients": registry.stats()}
+
+
+@router.get("/bank-clients/circuit-breakers")
+async def get_bank_clients_circuit_breakers(
+    registry: BankClientRegistry = Depends(get_bank_client_registry),
+):
+    """
+    Возвращает состояние circuit breaker-ов банков (closed/open/half_open),
+    счетчики ошибок, отклоненных запросов и повторов.
+    """
+    return {"circuit_breakers": registry.circuit_breakers()}
+
+
+@router.get("/bank-clients/coalescing/stats")
+async def get_bank_clients_coalescing_stats(
+    registry: BankClientRegistry = Depends(get_bank_client_registry),
+):
+    """
+    Возвращает статистику объединения одинаковых одновременных запросов к банкам:
+    число отправленных запросов и запросов, сэкономленных за счет объединения.
+    """
+    return {"coalescing": registry.coalescing()}
+
+
+@router.get("/bank-clients/response-cache/stats")
+async def get_bank_response_cache_stats(
+    cache: BankResponseCache = Depends(get_bank_response_cache),
+):
+    """
+    Возвращает статистику кэша ответов банков: попадания (в том числе устаревшие),
+    промахи, фоновые обновления, вытеснения и инвалидации.
+    """
+    return {"response_cache": cache.stats()}
+
+
+@router.get("/auth/token-refresh/stats")
+async def get_token_refresh_stats(
+    auth_manager: BaseAuthManager = Depends(get_auth_manager),
+):
+    """
+    Возвращает счетчики обновлений токенов банков:
+    число обновлений, объединенных ожидающих запросов и задержки обновления.
+    """
+    return {"token_refresh": auth_manager.get_refresh_stats()}
+
+
+@router.get("/auth/token-renewal/stats")
+async def get_token_renewal_stats(
+    scheduler: TokenRenewalScheduler = Depends(get_token_renewal_scheduler),
+):
+    """
+    Возвращает состояние фонового планировщика обновления токенов по каждому банку.
+    """
+    return {"running": scheduler.running, "banks": scheduler.stats()}
+
+
+@router.get("/auth/jwks/stats")
+async def get_jwks_stats(
+    auth_manager: BaseAuthManager = Depends(get_auth_manager),
+):
+    """
+    Возвращает статистику кэша JWKS: попадания, загрузки и повторные загрузки при ротации ключей.
+    """
+    return {"jwks": auth_manager.get_jwks_stats()}
+
+
+@router.get("/auth/jwt-cache/stats")
+async def get_jwt_cache_stats(
+    auth_manager: BaseAuthManager = Depends(get_auth_manager),
+):
+    """
+    Возвращает статистику кэша проверенных JWT: попадания, промахи, вытеснения и размер.
+    """
+    return {"jwt_cache": auth_manager.get_jwt_cache_stats()}
+
+
+@router.get("/db/pool/stats")
+async def get_db_pool_stats():
+    """
+    Возвращает статистику пула соединений с БД: время ожидания свободного соединения,
+    таймауты и текущее число выданных соединений.
+    """
+    return {"db_pool": pool_metrics.stats(engine.pool)}
+
+
+@router.get("/transactions/sync/stats")
+async def get_transactions_sync_stats():
+    """
+    Возвращает счетчики синхронизации локального хранилища транзакций:
+    число обращений к банкам, чтений из БД без синхронизации и полученных транзакций.
+    """
+    return {"transaction_sync": get_transaction_sync_stats()}
+
+
+@router.get("/consents/registry/stats")
+async def get_consents_registry_stats():
+    """
+    Возвращает счетчики реестра согласий: сколько запросов обслужено действующим согласием из БД
+    и сколько согласий пришлось создать в банках.
+    """
+    return {"consent_registry": get_consent_registry_stats()}
+
+
+@router.get("/analytics/health/stats")
+async def get_health_engine_stats(health_engine: HealthEngine = Depends(get_health_engine)):
+    """
+    Возвращает время расчета оценки финансового здоровья по этапам и составляющим
+    для поиска самой медленной из них.
+    """
+    return {"health_engine": health_engine.stats()}
+
+
+@router.get("/analytics/subscriptions/stats")
+async def get_subscription_detector_stats(subscription_detector: SubscriptionDetector = Depends(get_subscription_detector)):
+    """
+    Возвращает число поисков подписок по счетам и сколько раз результат переиспользован без пересчета.
+    """
+    return {"subscription_detector": subscription_detector.stats()}
+
+
+@router.get("/analytics/categorizer/stats")
+async def get_categorizer_stats(categorizer: Categorizer = Depends(get_categorizer)):
+    """
+    Возвращает счетчики определения категорий: сколько описаний обработано
+    и сколько из них обслужено памятью результатов без поиска по правилам.
+    """
+    return {"categorizer": categorizer.stats()}
@@ -4,28 +4,32 @@ API-роутер для агрегации данных из различных
 Этот роутер действует как основная точка входа для фронтенда,
 используя `ui_connector` сервис для сбора и подготовки данных.
 """
-from fastapi import APIRouter, Depends, Body
-from pydantic import BaseModel
-from typing import Any
+from fastapi import APIRouter, Depends, Body, Header, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Any, AsyncIterator, Dict, List, Optional
 
+from app.analytics.cashback import CashbackOptimizer, get_cashback_optimizer
 from app.ui_connector.services import UIService, get_ui_service
-from app.ui_connector.schemas import FinancialData
+from app.ui_connector.schemas import FinancialData, AggregatorStreamEvent
 
 router = APIRouter()
 
 class AggregatorRequest(BaseModel):
     user_id: str
-    # В будущем здесь можно будет передавать список consent_id или другие параметры
-    # для более гранулярного запроса данных.
+    # Согласия на доступ к данным по банкам {bank_name: consent_id}
+    consents: Dict[str, str] = Field(default_factory=dict)
+    # Банки для опроса. По умолчанию — все банки из настройки AGGREGATOR_BANKS.
+    bank_names: Optional[List[str]] = None
 
 @router.post(
     "/all",
     response_model=FinancialData,
     summary="Получить все агрегированные финансовые данные",
-    description="Возвращает единый объект `FinancialData` со всей информацией, необходимой для рендеринга UI, агрегируя данные из всех подключенных банков и сервисов.",
+    description="Возвращает единый объект `FinancialData` со всей информацией, необходимой для рендеринга UI, агрегируя данные из всех подключенных банков и сервисов. Банки опрашиваются параллельно; данные банков, не ответивших вовремя, отмечаются в `sources`, а ответ — флагом `isPartial`.",
 )
 async def get_all_aggregated_data(
-    # request_data: AggregatorRequest, # Пока user_id не используется в заглушке, можно закомментировать
+    request_data: AggregatorRequest,
     ui_service: UIService = Depends(get_ui_service),
 ) -> Any:
     """
@@ -34,7 +38,79 @@ async def get_all_aggregated_data(
     Собирает, агрегирует и форматирует все данные, необходимые для работы UI,
     включая счета, транзакции, цели, подписки, кредиты, рекомендации и т.д.
     """
-    # user_id = request_data.user_id
-    # В данный момент сервис-заглушка не требует user_id, но в будущем он будет использоваться.
-    aggregated_data = await ui_service.get_aggregated_financial_data()
+    aggregated_data = await ui_service.get_aggregated_financial_data(
+        user_id=request_data.user_id,
+        consents=request_data.consents,
+        bank_names=request_data.bank_names,
+    )
     return aggregated_data
+
+
+def _encode_ndjson(event: AggregatorStreamEvent) -> str:
+    return event.model_dump_json(by_alias=True) + "\n"
+
+
+def _encode_sse(event: AggregatorStreamEvent) -> str:
+    return f"event: {event.event}\ndata: {event.model_dump_json(by_alias=True)}\n\n"
+
+
+@router.post(
+    "/stream",
+    summary="Получить агрегированные финансовые данные потоком",
+    description=(
+        "Потоковый вариант `/all`: данные каждого банка отправляются по разделам (`accounts`, `transactions`, "
+        "`cards`, `agreements`), как только банк ответил, а последним событием (`complete`) — итоговый `FinancialData`. "
+        "По умолчанию ответ в формате NDJSON (`application/x-ndjson`, одно событие на строку); "
+        "с заголовком `Accept: text/event-stream` — в формате Server-Sent Events."
+    ),
+)
+async def stream_all_aggregated_data(
+    request_data: AggregatorRequest,
+    ui_service: UIService = Depends(get_ui_service),
+    accept: Optional[str] = Header(None),
+) -> StreamingResponse:
+    """
+    Потоковый эндпоинт для фронтенда. Время до первого байта не зависит от самого медленного банка.
+    """
+    use_sse = "text/event-stream" in (accept or "")
+    encode = _encode_sse if use_sse else _encode_ndjson
+
+    async def body() -> AsyncIterator[str]:
+        async for event in ui_service.stream_aggregated_financial_data(
+            user_id=request_data.user_id,
+            consents=request_data.consents,
+            bank_names=request_data.bank_names,
+        ):
+            yield encode(event)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        # Отключает буферизацию ответа в nginx, чтобы события доходили до клиента сразу
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/cashback/best-card",
+    summary="Выбрать карту с наибольшим кэшбэком в категории",
+    description="Возвращает карту пользователя с наибольшим кэшбэком в категории и лучшую из всех программ банков. Карты пользователя определяются при последнем запросе `/all` или `/stream`.",
+)
+async def get_best_cashback_card(
+    category: str = Query(..., description="Категория покупки"),
+    user_id: Optional[str] = Query(None, description="Пользователь, среди карт которого выбирать"),
+    optimizer: CashbackOptimizer = Depends(get_cashback_optimizer),
+) -> Any:
+    """
+    Ответ — чтение из заранее рассчитанного индекса лучшей карты по категориям, без перебора программ.
+    """
+    def describe(program, rate):
+        if program is None:
+            return None
+        return {"id": program.id, "name": program.name, "bankName": program.bank_name, "rate": rate, "offered": program.offered}
+
+    return {
+        "category": category,
+        "ownCard": describe(*optimizer.best_card(category, user_id)) if user_id else None,
+        "bestCard": describe(*optimizer.best_card(category)),
+    }
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 
 from app.core.config import settings
@@ -9,6 +9,7 @@ from app.utils.bank_clients import get_bank_client
 from app.auth_manager.dependencies import get_auth_manager
 from app.auth_manager.services import BaseAuthManager
 from app.auth_manager.exceptions import TokenFetchError
+from app.mcp.consent_registry import ConsentRegistry
 
 router = APIRouter()
 
@@ -42,7 +43,7 @@ class ConsentRequest(BaseModel):
 @router.post("/create-consent")
 async def create_consent(
     request: ConsentRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     """
@@ -63,6 +64,8 @@ async def create_consent(
             consent_id = await bank_client.create_payment_consent(access_token, request.permissions, request.user_id, settings.CLIENT_ID, request.debtor_account, request.amount, currency="RUB")
         else:
             consent_id = await bank_client.create_consent(access_token, request.permissions, request.user_id)
+            # MCP переиспользует это согласие вместо создания нового
+            await ConsentRegistry(db, auth_manager).register_safely(bank_name, request.user_id, consent_id, request.permissions)
         
         return {"message": "Согласие успешно создано.", "consent_id": consent_id}
     
@@ -83,7 +86,7 @@ async def get_consent_details(
     consent_id: str,
     bank_name: str = Query(..., description="Название банка (например, 'vbank')"),
     user_id: str = Query(..., description="Идентификатор пользователя"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     """
@@ -115,7 +118,7 @@ async def revoke_consent(
     consent_id: str,
     bank_name: str = Query(..., description="Название банка (например, 'vbank')"),
     user_id: str = Query(..., description="Идентификатор пользователя"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     """
@@ -126,6 +129,7 @@ async def revoke_consent(
         bank_client = get_bank_client(bank_name.lower())
 
         revoke_result = await bank_client.revoke_consent(access_token, consent_id, user_id)
+        await ConsentRegistry(db, auth_manager).revoke(bank_name.lower(), consent_id)
         return {"message": "Согласие успешно отозвано.", "details": revoke_result}
 
     except TokenFetchError as e:
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from typing import List, Optional
 
 from app.schemas.card import Card
 from app.utils.bank_clients import get_bank_client
 from app.banks.base_client import BaseBankClient
+from app.banks.response_cache import BankResponseCache, CACHE_STATUS_HEADER, get_bank_response_cache
 from app.auth_manager.dependencies import get_user_bank_token, get_current_user_id
 
 router = APIRouter()
@@ -11,19 +12,25 @@ router = APIRouter()
 @router.get("/{bank_name}/cards", response_model=List[Card], tags=["Cards"])
 async def get_cards(
     bank_name: str,
+    response: Response,
     consent_id: str = Header(..., description="Consent ID for accessing card data"),
     user_id: str = Depends(get_current_user_id),
     bank_client: BaseBankClient = Depends(get_bank_client),
     token: str = Depends(get_user_bank_token),
+    cache: BankResponseCache = Depends(get_bank_response_cache),
 ):
     """
     Получение списка карт клиента из указанного банка.
+    Ответ кэшируется, статус кэша возвращается в заголовке `X-Cache`.
     """
     try:
-        cards_data = await bank_client.cards.get_cards(
-            access_token=token,
-            user_id=user_id,
-            consent_id=consent_id
+        cards_data, response.headers[CACHE_STATUS_HEADER] = await cache.get_or_fetch(
+            bank_name.lower(), user_id, consent_id, "cards", (),
+            lambda: bank_client.cards.get_cards(
+                access_token=token,
+                user_id=user_id,
+                consent_id=consent_id
+            )
         )
         return [Card(**card) for card in cards_data]
     except Exception as e:
@@ -33,20 +40,26 @@ async def get_cards(
 async def get_card_details(
     bank_name: str,
     card_id: str,
+    response: Response,
     consent_id: str = Header(..., description="Consent ID for accessing card data"),
     user_id: str = Depends(get_current_user_id),
     bank_client: BaseBankClient = Depends(get_bank_client),
     token: str = Depends(get_user_bank_token),
+    cache: BankResponseCache = Depends(get_bank_response_cache),
 ):
     """
     Получение детальной информации по конкретной карте.
+    Ответ кэшируется, статус кэша возвращается в заголовке `X-Cache`.
     """
     try:
-        card_data = await bank_client.cards.get_card_details(
-            access_token=token,
-            user_id=user_id,
-            consent_id=consent_id,
-            card_id=card_id
+        card_data, response.headers[CACHE_STATUS_HEADER] = await cache.get_or_fetch(
+            bank_name.lower(), user_id, consent_id, "card_details", (card_id,),
+            lambda: bank_client.cards.get_card_details(
+                access_token=token,
+                user_id=user_id,
+                consent_id=consent_id,
+                card_id=card_id
+            )
         )
         return Card(**card_data)
     except Exception as e:
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 
 from app.db.database import get_db
@@ -9,6 +11,15 @@ from app.schemas.account import AccountCreateRequest, AccountDetailsRequest, Acc
 from app.auth_manager.dependencies import get_auth_manager
 from app.auth_manager.services import BaseAuthManager
 from app.auth_manager.exceptions import TokenFetchError
+from app.mcp.transaction_store import TransactionStore, decode_page_cursor
+from app.banks.response_cache import BankResponseCache, CACHE_STATUS_HEADER, get_bank_response_cache
+from app.core.config import settings
+from app.mcp.dependencies import get_mcp_service
+from app.mcp.schemas import AccountDataRequest
+from app.mcp.services import MCPService
+from app.analytics.budget import budget_engine
+from app.analytics.categorizer import Categorizer, get_categorizer
+from app.analytics.health import health_engine
 
 router = APIRouter()
 
@@ -27,17 +38,37 @@ class TransactionsRequest(BaseModel):
     bank_name: str
     consent_id: str
     user_id: str
+    limit: int = Field(settings.TRANSACTIONS_PAGE_SIZE, ge=1, le=settings.TRANSACTIONS_MAX_PAGE_SIZE, description="Размер страницы")
+    cursor: str | None = Field(None, description="Курсор следующей страницы из предыдущего ответа (`next_cursor`)")
+    date_from: datetime | None = Field(None, description="Начало периода по дате проведения (включительно)")
+    date_to: datetime | None = Field(None, description="Конец периода по дате проведения (включительно)")
+    amount_min: float | None = Field(None, description="Минимальная сумма со знаком: списания отрицательные")
+    amount_max: float | None = Field(None, description="Максимальная сумма со знаком")
+    category: str | None = Field(None, description="Категория операции (с учетом правил пользователя)")
+    query: str | None = Field(None, description="Поиск по описанию, контрагенту и категории без учета регистра")
+
+class BatchRequest(BaseModel):
+    user_id: str
+    consents: dict[str, str] = Field(default_factory=dict, description="Согласия по банкам; для банков без согласия оно берется из реестра")
+    items: list[AccountDataRequest] = Field(..., min_length=1, max_length=settings.DATA_BATCH_MAX_ITEMS)
+
+class CategoryOverrideRequest(BaseModel):
+    user_id: str
+    pattern: str = Field(..., description="Название контрагента или слова из описания операции")
+    category: str | None = Field(None, description="Категория операций с этим описанием; пустое значение удаляет правило")
 
 
 @router.post("/accounts")
 async def create_account(
     request: AccountCreateRequest,
     bank_name: str = Query(..., description="Название банка (например, 'vbank')"),
-    db: Session = Depends(get_db),
-    auth_manager: BaseAuthManager = Depends(get_auth_manager)
+    db: AsyncSession = Depends(get_db),
+    auth_manager: BaseAuthManager = Depends(get_auth_manager),
+    cache: BankResponseCache = Depends(get_bank_response_cache)
 ):
     """
     Создает новый счет для пользователя в указанном банке.
+    Кэшированные списки счетов банка сбрасываются: запрос не содержит `user_id`, поэтому для всех пользователей.
     """
     try:
         bank_name_lower = bank_name.lower()
@@ -46,6 +77,7 @@ async def create_account(
         
         account_data = request.model_dump()
         new_account = await bank_client.accounts.create_account(access_token, account_data)
+        cache.invalidate(bank_name_lower, operations=["accounts"])
         return {"message": "Счет успешно создан.", "account": new_account}
 
     except TokenFetchError as e:
@@ -63,18 +95,24 @@ async def create_account(
 @router.post("/accounts/list")
 async def get_accounts(
     request: AccountsRequest,
-    db: Session = Depends(get_db),
-    auth_manager: BaseAuthManager = Depends(get_auth_manager)
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    auth_manager: BaseAuthManager = Depends(get_auth_manager),
+    cache: BankResponseCache = Depends(get_bank_response_cache)
 ):
     """
     Получает список счетов для указанного банка, используя предоставленный `consent_id`.
+    Ответ кэшируется, статус кэша возвращается в заголовке `X-Cache`.
     """
     try:
         bank_name_lower = request.bank_name.lower()
         access_token = await auth_manager.get_access_token(db, bank_name_lower)
         bank_client = get_bank_client(bank_name_lower)
 
-        accounts = await bank_client.accounts.get_accounts(access_token, request.consent_id, request.user_id)
+        accounts, response.headers[CACHE_STATUS_HEADER] = await cache.get_or_fetch(
+            bank_name_lower, request.user_id, request.consent_id, "accounts", (),
+            lambda: bank_client.accounts.get_accounts(access_token, request.consent_id, request.user_id)
+        )
         return {"message": "Счета успешно получены.", "accounts": accounts}
 
     except TokenFetchError as e:
@@ -92,19 +130,25 @@ async def get_accounts(
 @router.get("/accounts/{account_id}")
 async def get_account_details(
     account_id: str,
+    response: Response,
     request: AccountDetailsRequest = Depends(),
-    db: Session = Depends(get_db),
-    auth_manager: BaseAuthManager = Depends(get_auth_manager)
+    db: AsyncSession = Depends(get_db),
+    auth_manager: BaseAuthManager = Depends(get_auth_manager),
+    cache: BankResponseCache = Depends(get_bank_response_cache)
 ):
     """
     Получает детальную информацию о конкретном счете.
+    Ответ кэшируется, статус кэша возвращается в заголовке `X-Cache`.
     """
     try:
         bank_name_lower = request.bank_name.lower()
         access_token = await auth_manager.get_access_token(db, bank_name_lower)
         bank_client = get_bank_client(bank_name_lower)
 
-        account_details = await bank_client.accounts.get_account_details(access_token, request.consent_id, request.user_id, account_id)
+        account_details, response.headers[CACHE_STATUS_HEADER] = await cache.get_or_fetch(
+            bank_name_lower, request.user_id, request.consent_id, "account_details", (account_id,),
+            lambda: bank_client.accounts.get_account_details(access_token, request.consent_id, request.user_id, account_id)
+        )
         return {"message": "Детали счета успешно получены.", "account": account_details}
 
     except TokenFetchError as e:
@@ -123,11 +167,12 @@ async def get_account_details(
 async def update_account_status(
     account_id: str,
     request: AccountStatusUpdateRequest,
-    db: Session = Depends(get_db),
-    auth_manager: BaseAuthManager = Depends(get_auth_manager)
+    db: AsyncSession = Depends(get_db),
+    auth_manager: BaseAuthManager = Depends(get_auth_manager),
+    cache: BankResponseCache = Depends(get_bank_response_cache)
 ):
     """
-    Изменяет статус счета пользователя.
+    Изменяет статус счета пользователя и сбрасывает кэшированные данные его счетов.
     """
     try:
         bank_name_lower = request.bank_name.lower()
@@ -135,6 +180,7 @@ async def update_account_status(
         bank_client = get_bank_client(bank_name_lower)
 
         updated_account = await bank_client.accounts.update_account_status(access_token, request.user_id, account_id, request.status)
+        cache.invalidate(bank_name_lower, request.user_id, operations=["accounts", "account_details"])
         return {"message": "Статус счета успешно обновлен.", "account": updated_account}
 
     except TokenFetchError as e:
@@ -153,11 +199,12 @@ async def update_account_status(
 async def close_account(
     account_id: str,
     request: AccountCloseRequest,
-    db: Session = Depends(get_db),
-    auth_manager: BaseAuthManager = Depends(get_auth_manager)
+    db: AsyncSession = Depends(get_db),
+    auth_manager: BaseAuthManager = Depends(get_auth_manager),
+    cache: BankResponseCache = Depends(get_bank_response_cache)
 ):
     """
-    Закрывает счет пользователя.
+    Закрывает счет пользователя и сбрасывает кэшированные данные его счетов.
     """
     try:
         bank_name_lower = request.bank_name.lower()
@@ -165,6 +212,8 @@ async def close_account(
         bank_client = get_bank_client(bank_name_lower)
 
         closed_account = await bank_client.accounts.close_account(access_token, request.user_id, account_id)
+        # Остаток закрываемого счета переводится на другой счет, поэтому сбрасываются и балансы
+        cache.invalidate(bank_name_lower, request.user_id, operations=["accounts", "account_details", "balances"])
         return {"message": "Счет успешно закрыт.", "account": closed_account}
 
     except TokenFetchError as e:
@@ -183,18 +232,24 @@ async def close_account(
 async def get_account_balances(
     account_id: str,
     request: BalancesRequest,
-    db: Session = Depends(get_db),
-    auth_manager: BaseAuthManager = Depends(get_auth_manager)
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    auth_manager: BaseAuthManager = Depends(get_auth_manager),
+    cache: BankResponseCache = Depends(get_bank_response_cache)
 ):
     """
     Получает балансы для указанного `account_id`.
+    Ответ кэшируется, статус кэша возвращается в заголовке `X-Cache`.
     """
     try:
         bank_name_lower = request.bank_name.lower()
         access_token = await auth_manager.get_access_token(db, bank_name_lower)
         bank_client = get_bank_client(bank_name_lower)
 
-        balances = await bank_client.accounts.get_account_balances(access_token, request.consent_id, request.user_id, account_id)
+        balances, response.headers[CACHE_STATUS_HEADER] = await cache.get_or_fetch(
+            bank_name_lower, request.user_id, request.consent_id, "balances", (account_id,),
+            lambda: bank_client.accounts.get_account_balances(access_token, request.consent_id, request.user_id, account_id)
+        )
         return {"message": "Балансы успешно получены.", "balances": balances}
 
     except TokenFetchError as e:
@@ -213,19 +268,37 @@ async def get_account_balances(
 async def get_account_transactions(
     account_id: str,
     request: TransactionsRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     """
-    Получает историю транзакций для указанного `account_id`.
+    Получает историю транзакций для указанного `account_id` постранично, от новых к старым.
+    Транзакции читаются из локального хранилища, у банка запрашиваются только новые (см. `TransactionStore`).
+
+    Следующая страница запрашивается с `cursor` из `next_cursor` предыдущего ответа и теми же фильтрами;
+    `next_cursor: null` означает, что страница последняя.
     """
+    if request.cursor:
+        try:
+            decode_page_cursor(request.cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     try:
         bank_name_lower = request.bank_name.lower()
-        access_token = await auth_manager.get_access_token(db, bank_name_lower)
-        bank_client = get_bank_client(bank_name_lower)
-
-        transactions = await bank_client.accounts.get_account_transactions(access_token, request.consent_id, request.user_id, account_id)
-        return {"message": "Транзакции успешно получены.", "transactions": transactions}
+        store = TransactionStore(db, auth_manager)
+
+        transactions, next_cursor = await store.get_account_transactions_page(
+            bank_name_lower, request.user_id, request.consent_id, account_id,
+            limit=request.limit,
+            cursor=request.cursor,
+            date_from=request.date_from,
+            date_to=request.date_to,
+            amount_min=request.amount_min,
+            amount_max=request.amount_max,
+            category=request.category,
+            text=request.query,
+        )
+        return {"message": "Транзакции успешно получены.", "transactions": transactions, "next_cursor": next_cursor}
 
     except TokenFetchError as e:
         raise HTTPException(status_code=502, detail=f"Не удалось получить токен доступа: {e.details}")
@@ -236,4 +309,62 @@ async def get_account_transactions(
             error_detail = e.response.text
         raise HTTPException(status_code=e.response.status_code, detail=f"Не удалось получить транзакции: {error_detail}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Произошла непредвиденная ошибка: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Произошла непредвиденная ошибка: {e}")
+
+
+@router.post("/batch")
+async def get_accounts_batch(
+    request: BatchRequest,
+    mcp_service: MCPService = Depends(get_mcp_service)
+):
+    """
+    Выполняет операции чтения (`details`, `balances`, `transactions`) по многим счетам одним запросом.
+    Заменяет отдельные запросы UI к `/accounts/{account_id}/balances` и `/accounts/{account_id}/transactions`.
+
+    Результаты возвращаются по ключу `"{bank_name}:{account_id}"` и операции. Ошибка отдельной операции
+    не прерывает запрос и возвращается в ее результате (`status: "failed"`).
+    """
+    results = await mcp_service.get_accounts_data(
+        request.items,
+        request.user_id,
+        {bank_name.lower(): consent_id for bank_name, consent_id in request.consents.items()},
+    )
+    failed = sum(response.status != "success" for operations in results.values() for response in operations.values())
+    return {"message": "Пакетный запрос выполнен.", "results": results, "failed": failed}
+
+
+@router.put("/categories/overrides")
+async def set_category_override(
+    request: CategoryOverrideRequest,
+    db: AsyncSession = Depends(get_db),
+    auth_manager: BaseAuthManager = Depends(get_auth_manager),
+    categorizer: Categorizer = Depends(get_categorizer)
+):
+    """
+    Задает категорию операций пользователя, в описании которых встречается `pattern`.
+    Правило пользователя важнее категории банка и встроенных правил.
+    Категории уже сохраненных транзакций пользователя пересчитываются, чтобы по ним работал фильтр `category`.
+    """
+    if request.category:
+        try:
+            categorizer.set_override(request.user_id, request.pattern, request.category)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        categorizer.remove_override(request.user_id, request.pattern)
+    await TransactionStore(db, auth_manager, categorizer=categorizer).recategorize(request.user_id)
+    # Бюджет и оценка здоровья накоплены по старым категориям: пересчитываются при следующем запросе агрегатора
+    budget_engine.forget(request.user_id)
+    health_engine.forget(request.user_id)
+    return {"message": "Правило категории сохранено.", "overrides": categorizer.get_overrides(request.user_id)}
+
+
+@router.get("/categories/overrides")
+async def get_category_overrides(
+    user_id: str,
+    categorizer: Categorizer = Depends(get_categorizer)
+):
+    """
+    Возвращает правила категорий пользователя `{образец: категория}`.
+    """
+    return {"overrides": categorizer.get_overrides(user_id)}
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Header
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 from typing import Optional
 
@@ -10,6 +10,7 @@ from app.schemas.payment import PaymentInitiationRequest, PaymentConsentCreateRe
 from app.auth_manager.dependencies import get_auth_manager
 from app.auth_manager.services import BaseAuthManager
 from app.auth_manager.exceptions import TokenFetchError
+from app.banks.response_cache import BankResponseCache, get_bank_response_cache
 
 router = APIRouter()
 
@@ -17,7 +18,7 @@ router = APIRouter()
 @router.post("/payment-consents")
 async def create_payment_consent(
     request: PaymentConsentCreateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     """
@@ -55,12 +56,16 @@ async def create_payment_consent(
 async def create_payment(
     bank_name: str,
     request: PaymentInitiationRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager),
-    consent_id: str = Header(..., alias="X-Consent-Id", description="ID согласия на платеж.")
+    cache: BankResponseCache = Depends(get_bank_response_cache),
+    consent_id: str = Header(..., alias="X-Consent-Id", description="ID согласия на платеж."),
+    creditor_bank: Optional[str] = Query(None, description="Банк получателя, если он известен (например, 'abank')")
 ):
     """
     Инициирует разовый платеж через указанный банк.
+    Кэшированные балансы банка сбрасываются: запрос не содержит `user_id`, поэтому для всех пользователей.
+    Если указан банк получателя, сбрасываются и его кэшированные балансы.
     """
     try:
         bank_name_lower = bank_name.lower()
@@ -72,6 +77,9 @@ async def create_payment(
             payment_request=request,
             consent_id=consent_id
         )
+        cache.invalidate(bank_name_lower, operations=["balances", "account_details"])
+        if creditor_bank and creditor_bank.lower() != bank_name_lower:
+            cache.invalidate(creditor_bank.lower(), operations=["balances"])
         return {"message": "Платеж успешно инициирован.", "details": payment_response}
 
     except TokenFetchError as e:
@@ -93,7 +101,7 @@ async def get_payment_status(
     bank_name: str,
     payment_id: str,
     client_id: str = Query(..., description="ID клиента (например, team042-1)"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     """
@@ -126,7 +134,7 @@ async def get_payment_consent_details(
     consent_id: str,
     bank_name: str = Query(..., description="Название банка"),
     user_id: str = Query(..., description="Идентификатор пользователя"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     """
@@ -159,7 +167,7 @@ async def revoke_payment_consent(
     consent_id: str,
     bank_name: str = Query(..., description="Название банка"),
     user_id: str = Query(..., description="Идентификатор пользователя"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     """
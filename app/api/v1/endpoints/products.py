@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import httpx
 
@@ -12,7 +12,7 @@ from app.auth_manager.exceptions import TokenFetchError
 
 router = APIRouter()
 
-async def _handle_request(bank_name: str, db: Session, auth_manager: BaseAuthManager, func, *args, **kwargs):
+async def _handle_request(bank_name: str, db: AsyncSession, auth_manager: BaseAuthManager, func, *args, **kwargs):
     """Вспомогательная функция для уменьшения дублирования кода."""
     try:
         access_token = await auth_manager.get_access_token(db, bank_name.lower())
@@ -31,7 +31,7 @@ async def _handle_request(bank_name: str, db: Session, auth_manager: BaseAuthMan
 @router.get("/products", response_model=List[Product])
 async def get_products(
     bank_name: str = Query(..., description="Название банка"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     bank_client = get_bank_client(bank_name)
@@ -41,7 +41,7 @@ async def get_products(
 async def get_product_details(
     product_id: str,
     bank_name: str = Query(..., description="Название банка"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     bank_client = get_bank_client(bank_name)
@@ -50,7 +50,7 @@ async def get_product_details(
 @router.post("/product-agreement-consents/request")
 async def create_product_agreement_consent(
     request: ProductAgreementConsentRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     bank_client = get_bank_client(request.bank_name)
@@ -66,7 +66,7 @@ async def get_product_agreement_consent(
     consent_id: str,
     bank_name: str = Query(..., description="Название банка"),
     user_id: str = Query(..., description="ID пользователя"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     bank_client = get_bank_client(bank_name)
@@ -81,7 +81,7 @@ async def revoke_product_agreement_consent(
     consent_id: str,
     bank_name: str = Query(..., description="Название банка"),
     user_id: str = Query(..., description="ID пользователя"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     bank_client = get_bank_client(bank_name)
@@ -96,7 +96,7 @@ async def get_product_agreements(
     bank_name: str = Query(..., description="Название банка"),
     consent_id: str = Query(..., description="ID согласия"),
     user_id: str = Query(..., description="ID пользователя"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     bank_client = get_bank_client(bank_name)
@@ -111,7 +111,7 @@ async def create_product_agreement(
     request: ProductAgreementCreateRequest,
     bank_name: str = Query(..., description="Название банка"),
     consent_id: str = Query(..., description="ID согласия"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     bank_client = get_bank_client(bank_name)
@@ -127,7 +127,7 @@ async def get_product_agreement_details(
     bank_name: str = Query(..., description="Название банка"),
     consent_id: str = Query(..., description="ID согласия"),
     user_id: str = Query(..., description="ID пользователя"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     bank_client = get_bank_client(bank_name)
@@ -143,7 +143,7 @@ async def close_product_agreement(
     bank_name: str = Query(..., description="Название банка"),
     consent_id: str = Query(..., description="ID согласия"),
     user_id: str = Query(..., description="ID пользователя"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ):
     bank_client = get_bank_client(bank_name)
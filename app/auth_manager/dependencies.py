@@ -1,13 +1,26 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.db.database import get_db, SessionLocal
 from app.auth_manager.services import BaseAuthManager, OAuth2AuthManager
+from app.auth_manager.scheduler import TokenRenewalScheduler
 
 # Экземпляр менеджера создается один раз и переиспользуется
 # Это позволяет эффективно использовать in-memory кэш
 _auth_manager_instance = OAuth2AuthManager()
 
+# Планировщик фонового обновления токенов. Запускается lifespan-ом приложения.
+_token_renewal_scheduler = TokenRenewalScheduler(
+    auth_manager=_auth_manager_instance,
+    session_factory=SessionLocal,
+    bank_names=settings.TOKEN_RENEWAL_BANKS,
+    renewal_fraction=settings.TOKEN_RENEWAL_FRACTION,
+    jitter=settings.TOKEN_RENEWAL_JITTER,
+    retry_base_delay=settings.TOKEN_RENEWAL_RETRY_BASE_DELAY,
+    retry_max_delay=settings.TOKEN_RENEWAL_RETRY_MAX_DELAY,
+)
+
 def get_auth_manager() -> BaseAuthManager:
     """
     Зависимость FastAPI для получения экземпляра AuthManager.
@@ -16,9 +29,16 @@ def get_auth_manager() -> BaseAuthManager:
     return _auth_manager_instance
 
 
+def get_token_renewal_scheduler() -> TokenRenewalScheduler:
+    """
+    Зависимость FastAPI для получения планировщика фонового обновления токенов.
+    """
+    return _token_renewal_scheduler
+
+
 async def get_user_bank_token(
     bank_name: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager),
 ) -> str:
     """
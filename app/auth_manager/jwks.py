@@ -0,0 +1,183 @@
+"""
+Хранилище JWKS банков с учетом TTL и ротации ключей.
+
+Ключи каждого банка индексируются по `kid` и хранятся уже разобранными (объекты `jose.jwk`),
+поэтому проверка JWT сводится к поиску в словаре и проверке подписи.
+"""
+import asyncio
+import functools
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict
+
+import httpx
+from jose import jwk
+from jose.backends.base import Key
+
+from app.auth_manager.exceptions import JWKSFetchError, JWTVerificationError
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+@dataclass
+class _JWKSEntry:
+    """
+    Закэшированный набор ключей одного банка.
+    """
+    keys: Dict[str, Key] # Разобранные ключи {kid: key}
+    fetched_at: float # Момент загрузки (time.monotonic)
+    expires_at: float # Момент истечения TTL (time.monotonic)
+
+
+class JWKSStore:
+    """
+    Кэш JWKS, ключом которого является базовый URL API банка.
+
+    - TTL берется из `Cache-Control: max-age` ответа банка, иначе используется `default_ttl`.
+    - Неизвестный `kid` вызывает одну повторную загрузку JWKS (ротация ключей), но не чаще,
+      чем раз в `min_refetch_interval` секунд, чтобы токены с чужим `kid` не вызывали шторм запросов.
+    - Конкурентные загрузки JWKS одного банка объединяются в одну.
+    """
+    def __init__(self, default_ttl: float = 3600, min_refetch_interval: float = 30, http_client: httpx.AsyncClient | None = None):
+        self.default_ttl = default_ttl
+        self.min_refetch_interval = min_refetch_interval
+        self._http_client = http_client
+        self._entries: Dict[str, _JWKSEntry] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, int] = {
+            "hits": 0, # Ключ найден в кэше
+            "misses": 0, # JWKS банка отсутствовал в кэше или истек его TTL
+            "fetches": 0, # Выполненные загрузки JWKS
+            "fetch_errors": 0, # Неудачные загрузки JWKS
+            "unknown_kid_refetches": 0, # Повторные загрузки из-за неизвестного kid
+            "stale_served": 0, # Использования устаревшего JWKS при недоступности банка
+        }
+
+    async def get_key(self, bank_api_url: str, kid: str) -> Key:
+        """
+        Возвращает разобранный ключ банка по `kid`.
+        """
+        entry = self._entries.get(bank_api_url)
+        now = time.monotonic()
+        if entry is not None and entry.expires_at > now:
+            key = entry.keys.get(kid)
+            if key is not None:
+                self._stats["hits"] += 1
+                return key
+            # Неизвестный kid: возможно, банк ротировал ключи
+            if now - entry.fetched_at < self.min_refetch_interval:
+                raise JWTVerificationError("Unable to find appropriate key in JWKS")
+            self._stats["unknown_kid_refetches"] += 1
+        else:
+            self._stats["misses"] += 1
+
+        entry = await self._refresh(bank_api_url)
+        key = entry.keys.get(kid)
+        if key is None:
+            raise JWTVerificationError("Unable to find appropriate key in JWKS")
+        return key
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает счетчики кэша и число закэшированных ключей по банкам.
+        """
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["keys"] = {bank_api_url: len(entry.keys) for bank_api_url, entry in self._entries.items()}
+        return stats
+
+    def clear(self):
+        """
+        Очищает кэш JWKS.
+        """
+        self._entries.clear()
+
+    async def aclose(self):
+        """
+        Закрывает HTTP-клиент хранилища. Вызывается при завершении работы приложения.
+        """
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def _refresh(self, bank_api_url: str) -> _JWKSEntry:
+        """
+        Загружает JWKS банка. Одновременно выполняется не более одной загрузки на банк.
+
+        Загрузка выполняется в отдельной задаче: отмена вызова, начавшего ее, не отменяет
+        загрузку для остальных ожидающих.
+        """
+        task = self._in_flight.get(bank_api_url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(bank_api_url))
+            self._in_flight[bank_api_url] = task
+            task.add_done_callback(functools.partial(self._forget, bank_api_url))
+        return await asyncio.shield(task)
+
+    def _forget(self, bank_api_url: str, task: asyncio.Task):
+        if self._in_flight.get(bank_api_url) is task:
+            del self._in_flight[bank_api_url]
+        # Ошибка уже передана ожидающим; если все они были отменены, помечаем ее обработанной
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch_and_store(self, bank_api_url: str) -> _JWKSEntry:
+        """
+        Загружает JWKS банка и кладет его в кэш. Если банк недоступен, продлевает устаревший набор ключей.
+        """
+        try:
+            entry = await self._fetch(bank_api_url)
+        except JWKSFetchError:
+            self._stats["fetch_errors"] += 1
+            stale_entry = self._entries.get(bank_api_url)
+            if stale_entry is None:
+                raise
+            # Банк недоступен: продолжаем работать со старым набором ключей
+            # и повторяем загрузку не раньше, чем через min_refetch_interval
+            self._stats["stale_served"] += 1
+            now = time.monotonic()
+            stale_entry.fetched_at = now
+            stale_entry.expires_at = now + self.min_refetch_interval
+            return stale_entry
+        self._entries[bank_api_url] = entry
+        return entry
+
+    async def _fetch(self, bank_api_url: str) -> _JWKSEntry:
+        """
+        Выполняет HTTP-запрос JWKS и строит индекс `kid -> key`.
+        """
+        jwks_url = f"{bank_api_url}/.well-known/jwks.json"
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient()
+        try:
+            response = await self._http_client.get(jwks_url)
+            response.raise_for_status()
+            jwks = response.json()
+        except httpx.HTTPStatusError as e:
+            raise JWKSFetchError(f"Failed to fetch JWKS from {jwks_url}. Status: {e.response.status_code}")
+        except Exception as e:
+            raise JWKSFetchError(f"An unexpected error occurred while fetching JWKS from {jwks_url}: {e}")
+        self._stats["fetches"] += 1
+
+        keys = {}
+        for key_data in jwks.get("keys", []):
+            try:
+                keys[key_data["kid"]] = jwk.construct(key_data, key_data.get("alg", "RS256"))
+            except Exception as e:
+                print(f"WARNING: Пропущен некорректный ключ в JWKS {jwks_url}: {e}")
+
+        now = time.monotonic()
+        return _JWKSEntry(keys=keys, fetched_at=now, expires_at=now + self._ttl_from_headers(response.headers))
+
+    def _ttl_from_headers(self, headers: httpx.Headers) -> float:
+        """
+        Определяет TTL по заголовку Cache-Control. Для `no-cache`/`no-store`
+        используется минимальный интервал повторной загрузки.
+        """
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-cache" in cache_control or "no-store" in cache_control:
+            return self.min_refetch_interval
+        match = _MAX_AGE_RE.search(cache_control)
+        if match:
+            return max(float(match.group(1)), self.min_refetch_interval)
+        return self.default_ttl
@@ -0,0 +1,83 @@
+"""
+Кэш результатов проверки JWT.
+
+Один и тот же bearer-токен за время своей жизни проверяется тысячи раз. Кэш хранит
+уже проверенные payload-ы, поэтому повторная проверка сводится к вычислению SHA-256
+и поиску в словаре вместо разбора заголовка и проверки RSA-подписи.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+
+class VerifiedJWTCache:
+    """
+    Ограниченный по размеру LRU-кэш проверенных JWT.
+
+    - Ключ — SHA-256 от токена (сами токены в памяти не хранятся) и URL банка.
+    - Запись истекает в момент `exp` токена, но живет не дольше `max_ttl` секунд,
+      чтобы отзыв ключа банком вступал в силу за ограниченное время.
+    - Токены без `exp` не кэшируются.
+    """
+    def __init__(self, max_size: int = 10000, max_ttl: float = 300):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        # {(bank_api_url, digest): (payload, expires_at)}, порядок — от давно использованных к недавним
+        self._entries: OrderedDict[tuple[str, bytes], tuple[Dict[str, Any], float]] = OrderedDict()
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0, # Вытеснения по LRU при переполнении
+            "expirations": 0, # Записи, удаленные из-за истечения срока
+        }
+
+    @staticmethod
+    def _key(token: str, bank_api_url: str) -> tuple[str, bytes]:
+        return bank_api_url, hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str, bank_api_url: str) -> Dict[str, Any] | None:
+        """
+        Возвращает payload ранее проверенного токена или None.
+        """
+        key = self._key(token, bank_api_url)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        payload, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return dict(payload)
+
+    def put(self, token: str, bank_api_url: str, payload: Dict[str, Any]):
+        """
+        Сохраняет payload успешно проверенного токена.
+        """
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        expires_at = min(float(exp), time.time() + self.max_ttl)
+        key = self._key(token, bank_api_url)
+        self._entries[key] = (dict(payload), expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        """
+        Очищает кэш.
+        """
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает счетчики попаданий, промахов, вытеснений и текущий размер кэша.
+        """
+        return {**self._stats, "size": len(self._entries), "max_size": self.max_size}
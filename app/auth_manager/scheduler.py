@@ -0,0 +1,143 @@
+"""
+Фоновый планировщик заблаговременного обновления токенов доступа банков.
+
+Без планировщика токен обновляется лениво, первым запросом после истечения срока,
+и этот запрос пользователя ждет полный круг `/auth/bank-token`. Планировщик обновляет
+токен каждого банка заранее, по достижении доли `TOKEN_RENEWAL_FRACTION` от `expires_in`,
+поэтому ленивый путь в `OAuth2AuthManager.get_access_token` срабатывает только если
+планировщик отстал (например, банк долго недоступен).
+"""
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth_manager.services import OAuth2AuthManager
+
+
+class TokenRenewalScheduler:
+    """
+    Планировщик, который держит по одной фоновой задаче на банк.
+    Запускается и останавливается lifespan-ом приложения (см. `main.py`).
+    """
+    def __init__(
+        self,
+        auth_manager: OAuth2AuthManager,
+        session_factory: Callable[[], AsyncSession],
+        bank_names: List[str],
+        renewal_fraction: float = 0.75,
+        jitter: float = 0.05,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 60.0,
+    ):
+        self.auth_manager = auth_manager
+        self.session_factory = session_factory
+        self.bank_names = bank_names
+        self.renewal_fraction = renewal_fraction
+        self.jitter = jitter
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def running(self) -> bool:
+        """
+        Возвращает True, если фоновые задачи планировщика запущены.
+        """
+        return bool(self._tasks)
+
+    def start(self):
+        """
+        Запускает фоновую задачу обновления для каждого банка.
+        """
+        for bank_name in self.bank_names:
+            if bank_name in self._tasks:
+                continue
+            self._stats[bank_name] = {
+                "renewals": 0,
+                "failures": 0,
+                "consecutive_failures": 0,
+                "last_renewal_at": None,
+                "next_renewal_at": None,
+                "last_error": None,
+            }
+            self._tasks[bank_name] = asyncio.create_task(self._run(bank_name), name=f"token-renewal-{bank_name}")
+
+    async def stop(self):
+        """
+        Останавливает все фоновые задачи и дожидается их завершения.
+        """
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Возвращает состояние планировщика по каждому банку.
+        """
+        return {bank_name: dict(bank_stats) for bank_name, bank_stats in self._stats.items()}
+
+    def _next_renewal_at(self, bank_name: str) -> datetime:
+        """
+        Вычисляет момент следующего обновления токена с учетом разброса (jitter).
+        Если токен еще не известен, обновление нужно выполнить немедленно.
+        """
+        lifetime = self.auth_manager.get_token_lifetime(bank_name)
+        if lifetime is None:
+            return datetime.now(timezone.utc)
+        issued_at, expires_in = lifetime
+        jitter_factor = random.uniform(1 - self.jitter, 1 + self.jitter)
+        # Не чаще одного раза в retry_base_delay, даже для токенов с очень коротким сроком жизни
+        renew_after = max(expires_in * self.renewal_fraction * jitter_factor, self.retry_base_delay)
+        return issued_at + timedelta(seconds=renew_after)
+
+    def _retry_delay(self, attempt: int) -> float:
+        """
+        Экспоненциальная задержка повтора с разбросом ("full jitter").
+        """
+        delay = min(self.retry_base_delay * 2 ** (attempt - 1), self.retry_max_delay)
+        return random.uniform(delay / 2, delay)
+
+    async def _renew(self, bank_name: str):
+        """
+        Получает новый токен банка через AuthManager в отдельной сессии БД.
+        """
+        async with self.session_factory() as db:
+            await self.auth_manager.refresh_access_token(db, bank_name)
+
+    async def _run(self, bank_name: str):
+        """
+        Цикл фоновой задачи одного банка: ожидание момента обновления -> обновление,
+        при ошибке -> повтор с экспоненциальной задержкой.
+        """
+        bank_stats = self._stats[bank_name]
+        while True:
+            next_renewal_at = self._next_renewal_at(bank_name)
+            bank_stats["next_renewal_at"] = next_renewal_at.isoformat()
+            delay = (next_renewal_at - datetime.now(timezone.utc)).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                await self._renew(bank_name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                bank_stats["failures"] += 1
+                bank_stats["consecutive_failures"] += 1
+                bank_stats["last_error"] = str(e)
+                retry_delay = self._retry_delay(bank_stats["consecutive_failures"])
+                bank_stats["next_renewal_at"] = (datetime.now(timezone.utc) + timedelta(seconds=retry_delay)).isoformat()
+                print(f"WARNING: Не удалось заранее обновить токен банка {bank_name}: {e}. Повтор через {retry_delay:.1f} с.")
+                await asyncio.sleep(retry_delay)
+                continue
+
+            bank_stats["renewals"] += 1
+            bank_stats["consecutive_failures"] = 0
+            bank_stats["last_error"] = None
+            bank_stats["last_renewal_at"] = datetime.now(timezone.utc).isoformat()
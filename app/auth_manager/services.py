@@ -1,22 +1,59 @@
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any
+import asyncio
+import functools
+import time
 import httpx
-from sqlalchemy.orm import Session
-from jose import jwt, jwk
+from sqlalchemy.ext.asyncio import AsyncSession
+from jose import jwt
 from jose.exceptions import JWTError
 from fastapi import Depends
 
 from app.core.config import settings
 from app.db import crud
+from app.db.database import session_lock, task_session
 from app.utils.bank_clients import get_bank_client
 from app.auth_manager.exceptions import TokenFetchError, JWKSFetchError, JWTVerificationError
 from app.auth_manager.schemas import TokenResponse
+from app.auth_manager.jwks import JWKSStore
+from app.auth_manager.jwt_cache import VerifiedJWTCache
 
 # Простой in-memory кэш для токенов {bank_name: (token, expiry_time)}
 _token_cache: Dict[str, tuple[str, datetime]] = {}
-# Простой in-memory кэш для JWKS {bank_api_url: jwks_dict}
-_jwks_cache: Dict[str, Dict[str, Any]] = {}
+# Время выдачи и время жизни текущих токенов {bank_name: (issued_at, expires_in)}.
+# Используется планировщиком фонового обновления токенов.
+_token_lifetimes: Dict[str, tuple[datetime, int]] = {}
+# Кэш JWKS банков с TTL и индексом kid -> разобранный ключ
+_jwks_store = JWKSStore(default_ttl=settings.JWKS_DEFAULT_TTL, min_refetch_interval=settings.JWKS_MIN_REFETCH_INTERVAL)
+# LRU-кэш уже проверенных JWT {(bank_api_url, sha256(token)): payload}
+_verified_jwt_cache = VerifiedJWTCache(max_size=settings.JWT_CACHE_MAX_SIZE, max_ttl=settings.JWT_CACHE_MAX_TTL)
+# Текущие обновления токенов {bank_name: задача}. Обеспечивает single-flight:
+# на один банк выполняется не более одного запроса /auth/bank-token одновременно.
+_token_refresh_in_flight: Dict[str, asyncio.Task] = {}
+# Счетчики обновлений токенов для диагностики
+_token_refresh_stats: Dict[str, float] = {
+    "refreshes": 0, # Число выполненных запросов на получение токена
+    "lazy_refreshes": 0, # Число обновлений на пути запроса пользователя (промах кэша)
+    "db_hits": 0, # Число токенов, взятых из БД вместо запроса к банку
+    "warm_start_loaded": 0, # Число токенов, загруженных из БД при старте приложения
+    "failed_refreshes": 0, # Число неудачных запросов на получение токена
+    "coalesced_waiters": 0, # Число запросов, дождавшихся уже идущего обновления вместо своего
+    "last_refresh_latency_ms": 0.0, # Длительность последнего обновления
+    "max_refresh_latency_ms": 0.0, # Максимальная длительность обновления
+    "total_refresh_latency_ms": 0.0, # Суммарная длительность всех обновлений
+}
+
+
+def _forget_token_refresh(bank_name: str, task: asyncio.Task):
+    """
+    Убирает завершенное обновление токена из `_token_refresh_in_flight`.
+    """
+    if _token_refresh_in_flight.get(bank_name) is task:
+        del _token_refresh_in_flight[bank_name]
+    # Ошибка уже передана ожидающим; если все они были отменены, помечаем ее обработанной
+    if not task.cancelled():
+        task.exception()
 
 
 class BaseAuthManager(ABC):
@@ -26,7 +63,7 @@ class BaseAuthManager(ABC):
     """
 
     @abstractmethod
-    async def get_access_token(self, db: Session, bank_name: str) -> str:
+    async def get_access_token(self, db: AsyncSession, bank_name: str) -> str:
         """
         Получает валидный токен доступа для указанного банка.
         """
@@ -39,24 +76,46 @@ class BaseAuthManager(ABC):
         """
         pass
 
+    def get_refresh_stats(self) -> Dict[str, float]:
+        """
+        Возвращает счетчики обновлений токенов. Реализации без статистики возвращают пустой словарь.
+        """
+        return {}
+
+    def get_jwks_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает статистику кэша JWKS. Реализации без статистики возвращают пустой словарь.
+        """
+        return {}
+
+    def get_jwt_cache_stats(self) -> Dict[str, int]:
+        """
+        Возвращает статистику кэша проверенных JWT. Реализации без статистики возвращают пустой словарь.
+        """
+        return {}
+
+    async def aclose(self):
+        """
+        Освобождает сетевые ресурсы менеджера. Вызывается при завершении работы приложения.
+        """
+        pass
+
 
 class OAuth2AuthManager(BaseAuthManager):
     """
     Реализация менеджера аутентификации, использующая OAuth 2.0 и JWKS.
     """
 
-    async def get_access_token(self, db: Session, bank_name: str) -> str:
+    async def get_access_token(self, db: AsyncSession, bank_name: str) -> str:
         """
-        Получает токен, используя каскадную логику: in-memory кэш -> новый запрос.
+        Получает токен, используя каскадную логику: in-memory кэш -> БД -> новый запрос.
 
         Сначала проверяется наличие валидного токена в in-memory кэше.
+        Затем — в БД (токен мог получить другой воркер или предыдущий запуск приложения).
         Если токен отсутствует или истек, выполняется запрос на получение нового токена,
         который затем сохраняется в БД и кэшируется в памяти.
-
-        TODO: Реализовать второй уровень кэширования (БД).
-        Текущая реализация не использует токены, сохраненные в БД, для восстановления
-        кэша после перезапуска приложения. Для этого требуется добавить
-        в модель `Token` поле с датой создания токена.
+        Обновление выполняется по схеме single-flight: конкурентные запросы к тому же банку
+        не отправляют свои запросы, а ожидают результат уже идущего обновления.
         """
         cached_token = _token_cache.get(bank_name)
         if cached_token:
@@ -64,91 +123,191 @@ class OAuth2AuthManager(BaseAuthManager):
             if expiry > datetime.now(timezone.utc):
                 return token
 
-        return await self._fetch_and_cache_new_token(db, bank_name)
+        # Если обновление уже идет, к нему выгоднее присоединиться, чем читать БД
+        if bank_name not in _token_refresh_in_flight:
+            stored_token = await self._load_token_from_db(db, bank_name)
+            if stored_token:
+                _token_refresh_stats["db_hits"] += 1
+                return stored_token
+
+        # Ленивое обновление: при работающем планировщике сюда попадаем, только если он отстал
+        _token_refresh_stats["lazy_refreshes"] += 1
+        token_data = await self._refresh_token_single_flight(db, bank_name)
+        return token_data.access_token
 
-    async def _fetch_and_cache_new_token(self, db: Session, bank_name: str) -> str:
+    async def refresh_access_token(self, db: AsyncSession, bank_name: str) -> TokenResponse:
         """
-        Получает новый токен от банка, используя соответствующий клиент, и кэширует его.
+        Принудительно получает новый токен от банка (например, из фонового планировщика).
+        Участвует в single-flight вместе с ленивыми обновлениями из `get_access_token`.
         """
-        try:
-            bank_client = get_bank_client(bank_name)
-            token_data = await bank_client.get_bank_token()
+        return await self._refresh_token_single_flight(db, bank_name)
 
-        except httpx.HTTPStatusError as e:
-            raise TokenFetchError(bank_name, f"HTTP error {e.response.status_code}: {e.response.text}")
-        except Exception as e:
-            raise TokenFetchError(bank_name, f"An unexpected error occurred: {str(e)}")
+    async def warm_start(self, db: AsyncSession) -> int:
+        """
+        Загружает в in-memory кэш все действительные токены из БД.
+        Вызывается при старте приложения, чтобы перезапуск не приводил к повторному получению токенов.
+        Возвращает число загруженных токенов.
+        """
+        valid_until = datetime.now(timezone.utc) + timedelta(seconds=60)
+        stored_tokens = await crud.get_unexpired_tokens(db, valid_until)
+        for bank_name, (token, issued_at, expires_in) in stored_tokens.items():
+            self._cache_token(bank_name, token, issued_at, expires_in)
+        _token_refresh_stats["warm_start_loaded"] += len(stored_tokens)
+        return len(stored_tokens)
+
+    async def _load_token_from_db(self, db: AsyncSession, bank_name: str) -> str | None:
+        """
+        Второй уровень кэша: ищет действительный токен банка в БД и кладет его в in-memory кэш.
+        """
+        valid_until = datetime.now(timezone.utc) + timedelta(seconds=60)
+        async with session_lock(db):
+            stored_token = (await crud.get_unexpired_tokens(db, valid_until, bank_name=bank_name)).get(bank_name)
+        if stored_token is None:
+            return None
+        token, issued_at, expires_in = stored_token
+        self._cache_token(bank_name, token, issued_at, expires_in)
+        return token
 
-        crud.save_token(
-            db=db,
-            bank_name=bank_name,
-            token=token_data.access_token,
-            expires_in=token_data.expires_in
-        )
+    def _cache_token(self, bank_name: str, token: str, issued_at: datetime, expires_in: int):
+        """
+        Кладет токен в in-memory кэш. Токен считается истекшим за 60 секунд до фактического срока.
+        """
+        expiry_time = issued_at + timedelta(seconds=expires_in - 60)
+        _token_cache[bank_name] = (token, expiry_time)
+        _token_lifetimes[bank_name] = (issued_at, expires_in)
 
-        expiry_time = datetime.now(timezone.utc) + timedelta(seconds=token_data.expires_in - 60)
-        _token_cache[bank_name] = (token_data.access_token, expiry_time)
+    def get_token_lifetime(self, bank_name: str) -> tuple[datetime, int] | None:
+        """
+        Возвращает время выдачи и время жизни (в секундах) текущего токена банка, если он известен.
+        """
+        return _token_lifetimes.get(bank_name)
 
-        return token_data.access_token
+    async def _refresh_token_single_flight(self, db: AsyncSession, bank_name: str) -> TokenResponse:
+        """
+        Обновляет токен банка так, чтобы одновременно выполнялся только один запрос.
+        Все остальные вызовы ожидают ту же задачу и получают тот же токен (или ту же ошибку).
+
+        Запрос выполняется в отдельной задаче: отмена вызова, начавшего обновление,
+        не отменяет его для остальных ожидающих.
+        """
+        task = _token_refresh_in_flight.get(bank_name)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh_token(db, bank_name))
+            _token_refresh_in_flight[bank_name] = task
+            task.add_done_callback(functools.partial(_forget_token_refresh, bank_name))
+        else:
+            _token_refresh_stats["coalesced_waiters"] += 1
+        # shield: отмена одного ожидающего не должна отменять общее обновление
+        return await asyncio.shield(task)
 
-    async def _get_jwks(self, bank_api_url: str) -> Dict[str, Any]:
+    async def _refresh_token(self, db: AsyncSession, bank_name: str) -> TokenResponse:
         """
-        Получает и кэширует JWKS от банка.
+        Получает новый токен от банка и учитывает обновление в статистике.
+        Задача может пережить запрос, начавший ее, поэтому токен сохраняется в своей сессии БД.
         """
-        if bank_api_url in _jwks_cache:
-            return _jwks_cache[bank_api_url]
+        started = time.perf_counter()
+        try:
+            async with task_session(db) as refresh_db:
+                token_data = await self._fetch_and_cache_new_token(refresh_db, bank_name)
+        except Exception:
+            _token_refresh_stats["failed_refreshes"] += 1
+            raise
+        latency_ms = (time.perf_counter() - started) * 1000
+        _token_refresh_stats["refreshes"] += 1
+        _token_refresh_stats["last_refresh_latency_ms"] = latency_ms
+        _token_refresh_stats["max_refresh_latency_ms"] = max(_token_refresh_stats["max_refresh_latency_ms"], latency_ms)
+        _token_refresh_stats["total_refresh_latency_ms"] += latency_ms
+        return token_data
 
-        jwks_url = f"{bank_api_url}/.well-known/jwks.json"
+    def get_refresh_stats(self) -> Dict[str, float]:
+        """
+        Возвращает счетчики обновлений токенов: число обновлений, ошибок,
+        объединенных ожидающих запросов и задержки обновления.
+        """
+        stats = dict(_token_refresh_stats)
+        stats["avg_refresh_latency_ms"] = stats["total_refresh_latency_ms"] / stats["refreshes"] if stats["refreshes"] else 0.0
+        return stats
+
+    async def _fetch_and_cache_new_token(self, db: AsyncSession, bank_name: str) -> TokenResponse:
+        """
+        Получает новый токен от банка, используя соответствующий клиент, и кэширует его.
+        """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(jwks_url)
-                response.raise_for_status()
-                jwks = response.json()
-                _jwks_cache[bank_api_url] = jwks
-                return jwks
+            bank_client = get_bank_client(bank_name)
+            token_data = await bank_client.get_bank_token()
+
         except httpx.HTTPStatusError as e:
-            raise JWKSFetchError(f"Failed to fetch JWKS from {jwks_url}. Status: {e.response.status_code}")
+            raise TokenFetchError(bank_name, f"HTTP error {e.response.status_code}: {e.response.text}")
         except Exception as e:
-            raise JWKSFetchError(f"An unexpected error occurred while fetching JWKS from {jwks_url}: {e}")
+            raise TokenFetchError(bank_name, f"An unexpected error occurred: {str(e)}")
+
+        issued_at = datetime.now(timezone.utc)
+        async with session_lock(db):
+            await crud.save_token(
+                db=db,
+                bank_name=bank_name,
+                token=token_data.access_token,
+                expires_in=token_data.expires_in,
+                issued_at=issued_at
+            )
+        self._cache_token(bank_name, token_data.access_token, issued_at, token_data.expires_in)
+
+        return token_data
 
     async def verify_jwt(self, token: str, bank_api_url: str) -> dict:
         """
         Проверяет подпись и срок действия JWT токена.
+        Ключ берется из `JWKSStore` по `kid` из заголовка токена.
+        Результат успешной проверки кэшируется до истечения `exp` токена.
         """
+        cached_payload = _verified_jwt_cache.get(token, bank_api_url)
+        if cached_payload is not None:
+            return cached_payload
+
         try:
-            jwks = await self._get_jwks(bank_api_url)
             unverified_header = jwt.get_unverified_header(token)
-            rsa_key = {}
-            for key in jwks["keys"]:
-                if key["kid"] == unverified_header["kid"]:
-                    rsa_key = {
-                        "kty": key["kty"],
-                        "kid": key["kid"],
-                        "use": key["use"],
-                        "n": key["n"],
-                        "e": key["e"]
-                    }
-            if not rsa_key:
-                raise JWTVerificationError("Unable to find appropriate key in JWKS")
+            key = await _jwks_store.get_key(bank_api_url, unverified_header["kid"])
 
             payload = jwt.decode(
                 token,
-                rsa_key,
+                key,
                 algorithms=["RS256"],
                 options={"verify_aud": False} # Аудиторию можно будет добавить в будущем
             )
+            _verified_jwt_cache.put(token, bank_api_url, payload)
             return payload
+        except JWTVerificationError:
+            raise
         except JWTError as e:
             raise JWTVerificationError(f"JWT validation failed: {e}")
         except Exception as e:
             raise JWTVerificationError(f"An unexpected error occurred during JWT verification: {e}")
 
+    def get_jwks_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает статистику кэша JWKS: попадания, загрузки и повторные загрузки при ротации ключей.
+        """
+        return _jwks_store.stats()
+
+    def get_jwt_cache_stats(self) -> Dict[str, int]:
+        """
+        Возвращает статистику кэша проверенных JWT: попадания, промахи и вытеснения.
+        """
+        return _verified_jwt_cache.stats()
+
+    async def aclose(self):
+        """
+        Закрывает HTTP-клиент хранилища JWKS.
+        """
+        await _jwks_store.aclose()
+
     async def clear_cache(self, bank_name: str):
         """
         Очищает кэш токенов для указанного банка.
         """
         if bank_name in _token_cache:
             del _token_cache[bank_name]
+        _token_lifetimes.pop(bank_name, None)
 
 def get_auth_manager() -> BaseAuthManager:
     """
@@ -2,7 +2,7 @@ import httpx
 from datetime import datetime, timedelta, timezone
 
 from app.banks.base_client import BaseBankClient
-from app.core.config import settings
+from app.core.config import settings, BankTransportProfile
 from app.auth_manager.schemas import TokenResponse
 
 
@@ -11,6 +11,7 @@ from app.banks.services.payments.abank import ABankPaymentsService
 from app.banks.services.products.abank import ABankProductsService
 from app.banks.services.cards.abank import ABankCardsService
 from app.banks.services.products.base import BaseProductsService
+from app.banks.coalescing import coalesced
 
 
 class ABankClient(BaseBankClient):
@@ -18,8 +19,8 @@ class ABankClient(BaseBankClient):
     Клиент для взаимодействия с API ABank.
     Реализует специфические методы для получения токенов и создания согласий.
     """
-    def __init__(self, client_id: str, client_secret: str, api_url: str):
-        super().__init__(client_id, client_secret, api_url)
+    def __init__(self, client_id: str, client_secret: str, api_url: str, transport_profile: BankTransportProfile | None = None):
+        super().__init__(client_id, client_secret, api_url, transport_profile)
         self._accounts_service = ABankAccountsService(self)
         self._payments_service = ABankPaymentsService(self)
         self._products_service = ABankProductsService(self)
@@ -94,6 +95,7 @@ class ABankClient(BaseBankClient):
         """
         return self._cards_service
 
+    @coalesced
     async def get_cards(self, access_token: str, user_id: str, consent_id: str) -> list[dict]:
         """
         Получает список карт клиента из ABank.
@@ -115,6 +117,7 @@ class ABankClient(BaseBankClient):
              return response_data["cards"]
         raise ValueError(f"Неожиданная структура ответа от ABank при получении карт: {response_data}")
 
+    @coalesced
     async def get_card_details(self, access_token: str, user_id: str, consent_id: str, card_id: str) -> dict:
         """
         Получает детальную информацию о карте из ABank.
@@ -153,6 +156,7 @@ class ABankClient(BaseBankClient):
         response.raise_for_status()
         return response.json()["consent_id"]
 
+    @coalesced
     async def get_product_agreement_consent(self, access_token: str, consent_id: str, user_id: str) -> dict:
         """
         Получает информацию о согласии на управление договорами по его ID.
@@ -210,6 +214,7 @@ class ABankClient(BaseBankClient):
         response.raise_for_status()
         return response.json()["consent_id"]
 
+    @coalesced
     async def get_payment_consent(self, access_token: str, consent_id: str, user_id: str) -> dict:
         """
         Получает информацию о платежном согласии по его ID из ABank.
@@ -250,6 +255,7 @@ class ABankClient(BaseBankClient):
         except Exception:
             return {"status": "success", "message": "Payment consent revoked successfully (non-json response)"}
 
+    @coalesced
     async def get_consent(self, access_token: str, consent_id: str, user_id: str) -> dict:
         """
         Получает информацию о согласии по его ID из ABank.
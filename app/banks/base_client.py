@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
+from typing import Any
+import httpcore
 import httpx
 
-from app.core.config import settings
+from app.core.config import settings, BankTransportProfile
 from app.auth_manager.schemas import TokenResponse
+from app.banks.resilience import CircuitBreaker, ResilientHTTPTransport
+from app.banks.coalescing import RequestCoalescer
 
 from app.banks.services.accounts.base import BaseAccountsService
 from app.banks.services.payments.base import BasePaymentsService
@@ -16,24 +20,115 @@ class BaseBankClient(ABC):
     Предоставляет общую структуру для взаимодействия с API различных банков,
     включая инициализацию HTTP-клиента и базовые методы для получения токенов и создания согласий.
     """
-    def __init__(self, client_id: str, client_secret: str, api_url: str):
+    def __init__(self, client_id: str, client_secret: str, api_url: str, transport_profile: BankTransportProfile | None = None):
         self.client_id = client_id
         self.client_secret = client_secret
         self.api_url = api_url
+        self.transport_profile = transport_profile or BankTransportProfile()
+        # Счетчики для статистики пула соединений
+        self._requests_sent = 0
+        self._connections_opened = 0
+        self._circuit_breaker = CircuitBreaker(
+            failure_threshold=self.transport_profile.breaker_failure_threshold,
+            reset_timeout=self.transport_profile.breaker_reset_timeout,
+            half_open_max_calls=self.transport_profile.breaker_half_open_max_calls,
+        )
+        # Объединение одинаковых одновременных запросов чтения (см. `app.banks.coalescing`)
+        self.request_coalescer = RequestCoalescer()
         self._async_client = self._create_http_client()
 
     def _create_http_client(self) -> httpx.AsyncClient:
         """
         Фабричный метод для создания HTTP-клиента.
+        Транспорт (HTTP/2, лимиты пула, keep-alive, локальный адрес) и таймауты
+        строятся из профиля `transport_profile` конкретного банка.
+        Транспорт повторяет идемпотентные запросы и защищен circuit breaker-ом банка (см. `resilience.py`).
         Позволяет в будущем легко подменять реализацию для поддержки mTLS, GOST и т.д.
         """
+        profile = self.transport_profile
+        cert = None
         if settings.CLIENT_CERT_PATH and settings.CLIENT_KEY_PATH:
             print(f"DEBUG: Инициализация httpx.AsyncClient с mTLS. Cert: {settings.CLIENT_CERT_PATH}, Key: {settings.CLIENT_KEY_PATH}")
             cert = (settings.CLIENT_CERT_PATH, settings.CLIENT_KEY_PATH)
-            return httpx.AsyncClient(cert=cert)
         else:
             print("DEBUG: Инициализация httpx.AsyncClient без mTLS.")
-            return httpx.AsyncClient()
+
+        transport = ResilientHTTPTransport(
+            circuit_breaker=self._circuit_breaker,
+            retry_attempts=profile.retry_attempts,
+            retry_base_delay=profile.retry_base_delay,
+            retry_max_delay=profile.retry_max_delay,
+            cert=cert,
+            http2=profile.http2,
+            limits=httpx.Limits(
+                max_connections=profile.max_connections,
+                max_keepalive_connections=profile.max_keepalive_connections,
+                keepalive_expiry=profile.keepalive_expiry,
+            ),
+            local_address=profile.local_address,
+        )
+        timeout = httpx.Timeout(
+            connect=profile.connect_timeout,
+            read=profile.read_timeout,
+            write=profile.write_timeout,
+            pool=profile.pool_timeout,
+        )
+        return httpx.AsyncClient(transport=transport, timeout=timeout, event_hooks={"request": [self._on_request]})
+
+    async def _on_request(self, request: httpx.Request):
+        """
+        Хук httpx, вызываемый перед отправкой каждого запроса.
+        Подписывается на trace-события httpcore, чтобы считать реально открытые соединения.
+        """
+        self._requests_sent += 1
+        request.extensions["trace"] = self._trace_connection
+
+    async def _trace_connection(self, event_name: str, info: dict):
+        """
+        Обработчик trace-событий httpcore. Каждое новое TCP-соединение означает
+        отдельный TCP+TLS хэндшейк.
+        """
+        if event_name == "connection.connect_tcp.complete":
+            self._connections_opened += 1
+
+    def pool_stats(self) -> dict[str, Any]:
+        """
+        Возвращает статистику пула соединений клиента:
+        число idle/active соединений, отправленных запросов, открытых соединений
+        и сэкономленных хэндшейков.
+        """
+        transport = getattr(self._async_client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        connections = pool.connections if isinstance(pool, httpcore.AsyncConnectionPool) else []
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+            "requests_sent": self._requests_sent,
+            "connections_opened": self._connections_opened,
+            "handshakes_avoided": max(self._requests_sent - self._connections_opened, 0),
+        }
+
+    def circuit_breaker_stats(self) -> dict[str, Any]:
+        """
+        Возвращает состояние circuit breaker-а банка и число повторов запросов.
+        """
+        transport = getattr(self._async_client, "_transport", None)
+        if isinstance(transport, ResilientHTTPTransport):
+            return transport.stats()
+        return self._circuit_breaker.stats()
+
+    def coalescing_stats(self) -> dict[str, Any]:
+        """
+        Возвращает число запросов чтения, отправленных в банк и объединенных с уже идущими.
+        """
+        return self.request_coalescer.stats()
+
+    async def aclose(self):
+        """
+        Закрывает асинхронный HTTP-клиент и все соединения его пула.
+        """
+        await self._async_client.aclose()
 
     @abstractmethod
     async def get_bank_token(self) -> TokenResponse:
@@ -148,4 +243,4 @@ class BaseBankClient(ABC):
         Выход из асинхронного контекстного менеджера.
         Закрывает асинхронный HTTP-клиент.
         """
-        await self._async_client.aclose()
+        await self.aclose()
@@ -0,0 +1,78 @@
+"""
+Объединение одинаковых одновременных запросов чтения к API банка (request coalescing).
+
+При загрузке дашборда несколько виджетов одновременно запрашивают одни и те же данные,
+например список счетов одного пользователя по одному согласию. Вместо нескольких одинаковых
+запросов к банку выполняется один, и все ожидающие получают один и тот же разобранный результат.
+
+Объединяются только идемпотентные операции чтения, помеченные декоратором `coalesced`.
+Результат общий для всех ожидающих, поэтому вызывающий код не должен его изменять.
+"""
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class RequestCoalescer:
+    """
+    Single-flight для запросов одного клиента банка: на один ключ выполняется
+    не более одного запроса одновременно.
+
+    Запрос выполняется в отдельной задаче. Отмена одного из ожидающих (например, по таймауту
+    раздела агрегатора) не отменяет запрос для остальных.
+    """
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._stats: Dict[str, int] = {
+            "upstream_calls": 0, # Запросы, действительно отправленные в банк
+            "coalesced_calls": 0, # Запросы, дождавшиеся уже идущего запроса вместо своего (сэкономлено)
+        }
+
+    async def run(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет `fetch` или присоединяется к уже идущему запросу с тем же ключом.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self._stats["upstream_calls"] += 1
+            task = asyncio.ensure_future(fetch())
+            self._in_flight[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+        else:
+            self._stats["coalesced_calls"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Ошибка уже передана ожидающим; если все они были отменены, помечаем ее обработанной
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает число отправленных и сэкономленных запросов.
+        """
+        return {**self._stats, "in_flight": len(self._in_flight)}
+
+
+def coalesced(method):
+    """
+    Декоратор метода чтения клиента банка или его сервиса: одновременные вызовы
+    с одинаковыми аргументами объединяются в один запрос к банку.
+
+    Объект, у которого вызывается метод, должен иметь атрибут `request_coalescer`
+    (см. `BaseBankClient` и `BaseService`). Вызовы с нехэшируемыми аргументами не объединяются.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        coalescer = getattr(self, "request_coalescer", None)
+        key = (method.__qualname__, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            coalescer = None
+        if not isinstance(coalescer, RequestCoalescer):
+            return await method(self, *args, **kwargs)
+        return await coalescer.run(key, lambda: method(self, *args, **kwargs))
+    return wrapper
@@ -0,0 +1,192 @@
+"""
+Устойчивость запросов к API банков: повторы с экспоненциальной задержкой и circuit breaker.
+
+Без этого слоя недоступный банк превращается в медленные таймауты для каждого пользователя,
+а мультибанковые агрегации (`MCPService.get_all_accounts`) ждут самый медленный отказавший банк.
+Circuit breaker после серии ошибок сразу отвечает `503` без обращения к банку,
+а затем периодически пропускает пробный запрос (half-open), чтобы заметить восстановление.
+"""
+import asyncio
+import math
+import random
+import time
+from typing import Any, Dict
+
+import httpx
+
+# Повторять можно только идемпотентные запросы: повтор POST может создать платеж дважды
+_IDEMPOTENT_METHODS = {"GET", "HEAD"}
+# Ответы, после которых имеет смысл повторить запрос
+_RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker одного банка.
+
+    - `closed`: запросы проходят, считаются подряд идущие ошибки.
+    - `open`: после `failure_threshold` ошибок подряд запросы отклоняются без обращения к банку.
+    - `half_open`: через `reset_timeout` секунд пропускается до `half_open_max_calls` пробных запросов.
+      Успех пробы закрывает breaker, ошибка снова открывает его.
+
+    Ошибкой считаются сетевые ошибки, таймауты и ответы 5xx. Ответы 4xx — ошибки клиента,
+    а не признак недоступности банка.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._stats: Dict[str, int] = {
+            "successes": 0,
+            "failures": 0,
+            "rejected": 0, # Запросы, отклоненные без обращения к банку
+            "times_opened": 0,
+        }
+
+    def allow_request(self) -> bool:
+        """
+        Решает, можно ли отправить запрос в банк. В состоянии half-open резервирует место пробного запроса.
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                self._stats["rejected"] += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+
+        if self.state == self.HALF_OPEN:
+            if self._half_open_in_flight >= self.half_open_max_calls:
+                self._stats["rejected"] += 1
+                return False
+            self._half_open_in_flight += 1
+        return True
+
+    def record_success(self):
+        """
+        Учитывает успешный ответ банка.
+        """
+        self._stats["successes"] += 1
+        self._consecutive_failures = 0
+        if self.state == self.HALF_OPEN:
+            self.state = self.CLOSED
+            self._half_open_in_flight = 0
+
+    def record_failure(self):
+        """
+        Учитывает ошибку банка и при необходимости открывает breaker.
+        """
+        self._stats["failures"] += 1
+        self._consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._half_open_in_flight = 0
+            self._stats["times_opened"] += 1
+
+    def release(self):
+        """
+        Освобождает место пробного запроса, если запрос был отменен и его исход неизвестен.
+        """
+        if self.state == self.HALF_OPEN and self._half_open_in_flight > 0:
+            self._half_open_in_flight -= 1
+
+    def retry_after(self) -> float:
+        """
+        Возвращает число секунд до перехода в half-open.
+        """
+        if self.state != self.OPEN:
+            return 0.0
+        return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает состояние breaker-а и его счетчики.
+        """
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "retry_after": round(self.retry_after(), 3),
+            **self._stats,
+        }
+
+
+class ResilientHTTPTransport(httpx.AsyncHTTPTransport):
+    """
+    HTTP-транспорт клиента банка с повторами идемпотентных запросов и circuit breaker-ом.
+
+    Работает на уровне транспорта, поэтому сервисы банков (`app/banks/services/**`)
+    не меняются: при открытом breaker-е они получают ответ `503` с заголовком `Retry-After`,
+    и их `raise_for_status()` завершается сразу, без ожидания таймаута.
+    """
+    def __init__(
+        self,
+        circuit_breaker: CircuitBreaker,
+        retry_attempts: int = 3,
+        retry_base_delay: float = 0.1,
+        retry_max_delay: float = 2.0,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.circuit_breaker = circuit_breaker
+        self.retry_attempts = max(retry_attempts, 1)
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._retries = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempts = self.retry_attempts if request.method in _IDEMPOTENT_METHODS else 1
+        for attempt in range(1, attempts + 1):
+            if not self.circuit_breaker.allow_request():
+                return self._circuit_open_response(request)
+            try:
+                response = await super().handle_async_request(request)
+            except httpx.TransportError:
+                self.circuit_breaker.record_failure()
+                if attempt == attempts:
+                    raise
+            except BaseException:
+                self.circuit_breaker.release()
+                raise
+            else:
+                if response.status_code >= 500:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success()
+                if attempt == attempts or response.status_code not in _RETRYABLE_STATUS_CODES:
+                    return response
+                await response.aclose()
+
+            self._retries += 1
+            await asyncio.sleep(self._retry_delay(attempt))
+
+    def _retry_delay(self, attempt: int) -> float:
+        """
+        Экспоненциальная задержка повтора с разбросом ("full jitter").
+        """
+        delay = min(self.retry_base_delay * 2 ** (attempt - 1), self.retry_max_delay)
+        return random.uniform(delay / 2, delay)
+
+    def _circuit_open_response(self, request: httpx.Request) -> httpx.Response:
+        """
+        Ответ, которым завершается запрос при открытом breaker-е.
+        """
+        return httpx.Response(
+            503,
+            headers={"Retry-After": str(math.ceil(self.circuit_breaker.retry_after())), "X-Circuit-Breaker": self.circuit_breaker.state},
+            json={"detail": f"Банк временно недоступен ({request.url.host}): запросы приостановлены circuit breaker-ом."},
+            request=request,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает состояние circuit breaker-а и число выполненных повторов.
+        """
+        return {**self.circuit_breaker.stats(), "retries": self._retries}
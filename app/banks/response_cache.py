@@ -0,0 +1,201 @@
+"""
+Кэш ответов банков на запросы чтения (счета, балансы, карты).
+
+UI опрашивает бэкенд каждые несколько секунд, и без кэша каждый опрос превращается в запросы
+к API банков, хотя данные за это время почти никогда не меняются. Кэш хранит ответы
+с TTL, заданным для каждой операции, а после истечения TTL еще `stale_ttl` секунд отдает
+устаревший ответ и обновляет его в фоне (stale-while-revalidate), поэтому пользователь
+не ждет банк даже при промахе по TTL.
+
+Записи после операций изменения (открытие и закрытие счета, платеж) удаляются явно
+через `invalidate`.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+from app.core.config import ResponseCacheProfile, settings
+
+# Ключ записи: (bank_name, user_id, consent_id, operation, args)
+CacheKey = Tuple[str, str | None, str | None, str, Tuple[Any, ...]]
+
+# Заголовок ответа API со статусом обращения к кэшу
+CACHE_STATUS_HEADER = "X-Cache"
+
+# Операции, ответы которых кэшируются, и поля профиля с их TTL
+CACHED_OPERATIONS = {
+    "accounts": "accounts_ttl",
+    "account_details": "account_details_ttl",
+    "balances": "balances_ttl",
+    "cards": "cards_ttl",
+    "card_details": "card_details_ttl",
+}
+
+
+class BankResponseCache:
+    """
+    Ограниченный по размеру LRU-кэш ответов банков с TTL и stale-while-revalidate.
+
+    Статусы обращения (передаются клиенту в заголовке `X-Cache`):
+    - `HIT`: ответ из кэша в пределах TTL;
+    - `STALE`: устаревший ответ из кэша, в фоне запущено обновление;
+    - `MISS`: ответ получен от банка и сохранен;
+    - `BYPASS`: кэш выключен, ответ получен от банка.
+    """
+    HIT = "HIT"
+    STALE = "STALE"
+    MISS = "MISS"
+    BYPASS = "BYPASS"
+
+    def __init__(self, ttls: Dict[str, float], max_entries: int = 5000, stale_ttl: float = 120.0, enabled: bool = True):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self.enabled = enabled
+        # {key: (value, expires_at)}, порядок — от давно использованных к недавним
+        self._entries: OrderedDict[CacheKey, tuple[Any, float]] = OrderedDict()
+        # Фоновые обновления устаревших записей {key: task}
+        self._refreshing: Dict[CacheKey, asyncio.Task] = {}
+        # Счетчик инвалидаций: ответ, запрошенный до инвалидации, не должен попасть в кэш после нее
+        self._invalidation_epoch = 0
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "evictions": 0, # Вытеснения по LRU при переполнении
+            "invalidations": 0, # Записи, удаленные после операций изменения
+            "background_refreshes": 0,
+            "refresh_errors": 0,
+        }
+
+    @classmethod
+    def from_profile(cls, profile: ResponseCacheProfile) -> "BankResponseCache":
+        """
+        Создает кэш с TTL операций из профиля настроек.
+        """
+        ttls = {operation: getattr(profile, field) for operation, field in CACHED_OPERATIONS.items()}
+        return cls(ttls, max_entries=profile.max_entries, stale_ttl=profile.stale_ttl, enabled=profile.enabled)
+
+    async def get_or_fetch(
+        self,
+        bank_name: str,
+        user_id: str | None,
+        consent_id: str | None,
+        operation: str,
+        args: Tuple[Any, ...],
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> tuple[Any, str]:
+        """
+        Возвращает ответ операции и статус обращения к кэшу.
+
+        - `operation`: Название операции из `CACHED_OPERATIONS`.
+        - `args`: Аргументы операции, отличающие ответы (например, `account_id`).
+        - `fetch`: Корутина-функция, запрашивающая ответ у банка. Для фонового обновления
+          она вызывается вне запроса, поэтому не должна использовать сессию БД запроса.
+        """
+        ttl = self.ttls.get(operation)
+        if not self.enabled or not ttl:
+            return await fetch(), self.BYPASS
+
+        key: CacheKey = (bank_name, user_id, consent_id, operation, tuple(args))
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            value, expires_at = entry
+            if now < expires_at:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return value, self.HIT
+            if now < expires_at + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self._stats["stale_hits"] += 1
+                self._schedule_refresh(key, ttl, fetch)
+                return value, self.STALE
+            del self._entries[key]
+
+        self._stats["misses"] += 1
+        epoch = self._invalidation_epoch
+        value = await fetch()
+        self._store(key, value, ttl, epoch)
+        return value, self.MISS
+
+    def _store(self, key: CacheKey, value: Any, ttl: float, epoch: int):
+        if epoch != self._invalidation_epoch:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _schedule_refresh(self, key: CacheKey, ttl: float, fetch: Callable[[], Awaitable[Any]]):
+        """
+        Запускает фоновое обновление записи, если оно еще не идет.
+        """
+        if key in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh(key, ttl, fetch))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    async def _refresh(self, key: CacheKey, ttl: float, fetch: Callable[[], Awaitable[Any]]):
+        epoch = self._invalidation_epoch
+        try:
+            value = await fetch()
+        except Exception:
+            # Устаревшая запись остается до конца stale_ttl, следующий запрос повторит обновление
+            self._stats["refresh_errors"] += 1
+            return
+        self._stats["background_refreshes"] += 1
+        self._store(key, value, ttl, epoch)
+
+    def invalidate(self, bank_name: str, user_id: str | None = None, operations: Iterable[str] | None = None) -> int:
+        """
+        Удаляет записи банка после операции изменения.
+
+        - `user_id`: Если не указан, удаляются записи всех пользователей банка.
+        - `operations`: Если не указаны, удаляются записи всех операций.
+
+        Возвращает число удаленных записей.
+        """
+        operations = set(operations) if operations is not None else None
+        self._invalidation_epoch += 1
+        stale_keys = [
+            key for key in self._entries
+            if key[0] == bank_name
+            and (user_id is None or key[1] == user_id)
+            and (operations is None or key[3] in operations)
+        ]
+        for key in stale_keys:
+            del self._entries[key]
+        self._stats["invalidations"] += len(stale_keys)
+        return len(stale_keys)
+
+    def clear(self):
+        """
+        Очищает кэш и отменяет фоновые обновления.
+        """
+        for task in self._refreshing.values():
+            # Задачи цикла событий, который уже закрыт (например, в тестах), отменять не нужно
+            if not task.get_loop().is_closed():
+                task.cancel()
+        self._refreshing.clear()
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает счетчики попаданий, промахов, вытеснений и текущий размер кэша.
+        """
+        return {**self._stats, "size": len(self._entries), "max_size": self.max_entries, "enabled": self.enabled}
+
+
+# Кэш ответов банков, общий для всех запросов к приложению
+bank_response_cache = BankResponseCache.from_profile(settings.RESPONSE_CACHE)
+
+
+def get_bank_response_cache() -> BankResponseCache:
+    """
+    Зависимость FastAPI для получения кэша ответов банков.
+    """
+    return bank_response_cache
@@ -2,7 +2,7 @@ import httpx
 from datetime import datetime, timedelta, timezone
 
 from app.banks.base_client import BaseBankClient
-from app.core.config import settings
+from app.core.config import settings, BankTransportProfile
 from app.auth_manager.schemas import TokenResponse
 
 
@@ -11,6 +11,7 @@ from app.banks.services.payments.sbank import SBankPaymentsService
 from app.banks.services.products.sbank import SBankProductsService
 from app.banks.services.cards.sbank import SBankCardsService
 from app.banks.services.products.base import BaseProductsService
+from app.banks.coalescing import coalesced
 
 
 class SBankClient(BaseBankClient):
@@ -18,8 +19,8 @@ class SBankClient(BaseBankClient):
     Клиент для взаимодействия с API SBank.
     Реализует специфические методы для получения токенов и создания согласий.
     """
-    def __init__(self, client_id: str, client_secret: str, api_url: str):
-        super().__init__(client_id, client_secret, api_url)
+    def __init__(self, client_id: str, client_secret: str, api_url: str, transport_profile: BankTransportProfile | None = None):
+        super().__init__(client_id, client_secret, api_url, transport_profile)
         self._accounts_service = SBankAccountsService(self)
         self._payments_service = SBankPaymentsService(self)
         self._products_service = SBankProductsService(self)
@@ -98,6 +99,7 @@ class SBankClient(BaseBankClient):
         """
         return self._cards_service
 
+    @coalesced
     async def get_cards(self, access_token: str, user_id: str, consent_id: str) -> list[dict]:
         """
         Получает список карт клиента из SBank.
@@ -120,6 +122,7 @@ class SBankClient(BaseBankClient):
              return response_data["cards"]
         raise ValueError(f"Неожиданная структура ответа от SBank при получении карт: {response_data}")
 
+    @coalesced
     async def get_card_details(self, access_token: str, user_id: str, consent_id: str, card_id: str) -> dict:
         """
         Получает детальную информацию о карте из SBank.
@@ -166,6 +169,7 @@ class SBankClient(BaseBankClient):
             return consent_data.get("request_id") # или выбросить исключение
         return consent_id
 
+    @coalesced
     async def get_product_agreement_consent(self, access_token: str, consent_id: str, user_id: str) -> dict:
         """
         Получает информацию о согласии на управление договорами по его ID.
@@ -223,6 +227,7 @@ class SBankClient(BaseBankClient):
         response.raise_for_status()
         return response.json()["consent_id"]
 
+    @coalesced
     async def get_payment_consent(self, access_token: str, consent_id: str, user_id: str) -> dict:
         """
         Получает информацию о платежном согласии по его ID из SBank.
@@ -263,6 +268,7 @@ class SBankClient(BaseBankClient):
         except Exception:
             return {"status": "success", "message": "Payment consent revoked successfully (non-json response)"}
 
+    @coalesced
     async def get_consent(self, access_token: str, consent_id: str, user_id: str) -> dict:
         """
         Получает информацию о согласии по его ID из SBank.
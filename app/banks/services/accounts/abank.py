@@ -1,8 +1,11 @@
+from datetime import datetime
+
 import httpx
 import json
 
 from app.banks.services.accounts.base import BaseAccountsService
 from app.core.config import settings
+from app.banks.coalescing import coalesced
 
 
 class ABankAccountsService(BaseAccountsService):
@@ -12,6 +15,7 @@ class ABankAccountsService(BaseAccountsService):
     информации о счетах, балансах и транзакциях.
     """
 
+    @coalesced
     async def get_accounts(self, access_token: str, consent_id: str, user_id: str) -> list[dict]:
         """
         Получает список счетов пользователя из ABank.
@@ -33,6 +37,7 @@ class ABankAccountsService(BaseAccountsService):
             raise ValueError(f"Неожиданная структура ответа от ABank при получении счетов: {response_data}")
         return response_data["data"]["account"]
 
+    @coalesced
     async def get_account_balances(self, access_token: str, consent_id: str, user_id: str, account_id: str) -> dict:
         """
         Получает балансы для конкретного счета из ABank.
@@ -54,11 +59,16 @@ class ABankAccountsService(BaseAccountsService):
             raise ValueError(f"Неожиданная структура ответа от ABank при получении балансов: {response_data}")
         return response_data["data"]["balance"]
 
-    async def get_account_transactions(self, access_token: str, consent_id: str, user_id: str, account_id: str) -> list[dict]:
+    @coalesced
+    async def get_account_transactions(self, access_token: str, consent_id: str, user_id: str, account_id: str, from_booking_date: datetime | None = None) -> list[dict]:
         """
         Получает историю транзакций для конкретного счета из ABank.
         Требует `access_token` и `consent_id` с разрешением `ReadTransactionsDetail`.
+        Если указан `from_booking_date`, запрашиваются только транзакции, проведенные не раньше этого момента.
         """
+        params = {"client_id": user_id}
+        if from_booking_date is not None:
+            params["from_booking_date_time"] = from_booking_date.isoformat()
         response = await self._client._async_client.get(
             f"{self._client.api_url}/accounts/{account_id}/transactions",
             headers={
@@ -66,7 +76,7 @@ class ABankAccountsService(BaseAccountsService):
                 "X-Requesting-Bank": settings.CLIENT_ID,
                 "X-Consent-Id": consent_id
             },
-            params={"client_id": user_id}
+            params=params
         )
         response.raise_for_status()
         response_data = response.json()
@@ -75,6 +85,7 @@ class ABankAccountsService(BaseAccountsService):
             raise ValueError(f"Неожиданная структура ответа от ABank при получении транзакций: {response_data}")
         return response_data["data"]["transaction"]
 
+    @coalesced
     async def get_account_details(self, access_token: str, consent_id: str, user_id: str, account_id: str) -> dict:
         """
         Получает детальную информацию о конкретном счете из ABank.
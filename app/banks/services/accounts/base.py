@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from datetime import datetime
 
 from app.banks.services.base_service import BaseService
 
@@ -25,9 +26,10 @@ class BaseAccountsService(BaseService, ABC):
         pass
 
     @abstractmethod
-    async def get_account_transactions(self, access_token: str, consent_id: str, user_id: str, account_id: str) -> list[dict]:
+    async def get_account_transactions(self, access_token: str, consent_id: str, user_id: str, account_id: str, from_booking_date: datetime | None = None) -> list[dict]:
         """
         Получает историю транзакций для конкретного счета.
+        `from_booking_date` ограничивает выборку транзакциями, проведенными не раньше указанного момента.
         """
         pass
 
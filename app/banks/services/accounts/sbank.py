@@ -1,7 +1,10 @@
+from datetime import datetime
+
 import httpx
 
 from app.banks.services.accounts.base import BaseAccountsService
 from app.core.config import settings
+from app.banks.coalescing import coalesced
 
 
 class SBankAccountsService(BaseAccountsService):
@@ -11,6 +14,7 @@ class SBankAccountsService(BaseAccountsService):
     информации о счетах, балансах и транзакциях.
     """
 
+    @coalesced
     async def get_accounts(self, access_token: str, consent_id: str, user_id: str) -> list[dict]:
         """
         Получает список счетов пользователя из SBank.
@@ -32,6 +36,7 @@ class SBankAccountsService(BaseAccountsService):
             raise ValueError(f"Неожиданная структура ответа от SBank при получении счетов: {response_data}")
         return response_data["data"]["account"]
 
+    @coalesced
     async def get_account_balances(self, access_token: str, consent_id: str, user_id: str, account_id: str) -> dict:
         """
         Получает балансы для конкретного счета из SBank.
@@ -53,11 +58,16 @@ class SBankAccountsService(BaseAccountsService):
             raise ValueError(f"Неожиданная структура ответа от SBank при получении балансов: {response_data}")
         return response_data["data"]["balance"]
 
-    async def get_account_transactions(self, access_token: str, consent_id: str, user_id: str, account_id: str) -> list[dict]:
+    @coalesced
+    async def get_account_transactions(self, access_token: str, consent_id: str, user_id: str, account_id: str, from_booking_date: datetime | None = None) -> list[dict]:
         """
         Получает историю транзакций для конкретного счета из SBank.
         Требует `access_token` и `consent_id` с разрешением `ReadTransactionsDetail`.
+        Если указан `from_booking_date`, запрашиваются только транзакции, проведенные не раньше этого момента.
         """
+        params = {"client_id": user_id}
+        if from_booking_date is not None:
+            params["from_booking_date_time"] = from_booking_date.isoformat()
         response = await self.client.get(
             f"{self.api_url}/accounts/{account_id}/transactions",
             headers={
@@ -65,7 +75,7 @@ class SBankAccountsService(BaseAccountsService):
                 "X-Requesting-Bank": settings.CLIENT_ID,
                 "X-Consent-Id": consent_id
             },
-            params={"client_id": user_id}
+            params=params
         )
         response.raise_for_status()
         response_data = response.json()
@@ -74,6 +84,7 @@ class SBankAccountsService(BaseAccountsService):
             raise ValueError(f"Неожиданная структура ответа от SBank при получении транзакций: {response_data}")
         return response_data["data"]["transaction"]
 
+    @coalesced
     async def get_account_details(self, access_token: str, consent_id: str, user_id: str, account_id: str) -> dict:
         """
         Получает детальную информацию о конкретном счете из SBank.
@@ -1,5 +1,8 @@
+from datetime import datetime
+
 from app.banks.services.accounts.base import BaseAccountsService
 from app.core.config import settings
+from app.banks.coalescing import coalesced
 
 
 class VBankAccountsService(BaseAccountsService):
@@ -12,6 +15,7 @@ class VBankAccountsService(BaseAccountsService):
     def __init__(self, client): # client будет экземпляром VBankClient
         self._client = client
 
+    @coalesced
     async def get_accounts(self, access_token: str, consent_id: str, user_id: str) -> list[dict]:
         """
         Получает список счетов пользователя из VBank.
@@ -33,6 +37,7 @@ class VBankAccountsService(BaseAccountsService):
             raise ValueError(f"Неожиданная структура ответа от VBank при получении счетов: {response_data}")
         return response_data["data"]["account"]
 
+    @coalesced
     async def get_account_balances(self, access_token: str, consent_id: str, user_id: str, account_id: str) -> dict:
         """
         Получает балансы для конкретного счета из VBank.
@@ -55,11 +60,16 @@ class VBankAccountsService(BaseAccountsService):
             raise ValueError(f"Неожиданная структура ответа от VBank при получении балансов: {response_data}")
         return response_data["data"]["balance"]
 
-    async def get_account_transactions(self, access_token: str, consent_id: str, user_id: str, account_id: str) -> list[dict]:
+    @coalesced
+    async def get_account_transactions(self, access_token: str, consent_id: str, user_id: str, account_id: str, from_booking_date: datetime | None = None) -> list[dict]:
         """
         Получает историю транзакций для конкретного счета из VBank.
         Требует `access_token` и `consent_id` с разрешением `ReadTransactionsDetail`.
+        Если указан `from_booking_date`, запрашиваются только транзакции, проведенные не раньше этого момента.
         """
+        params = {"client_id": user_id}
+        if from_booking_date is not None:
+            params["from_booking_date_time"] = from_booking_date.isoformat()
         response = await self._client._async_client.get(
             f"{self._client.api_url}/accounts/{account_id}/transactions",
             headers={
@@ -67,7 +77,7 @@ class VBankAccountsService(BaseAccountsService):
                 "X-Requesting-Bank": settings.CLIENT_ID,
                 "X-Consent-Id": consent_id
             },
-            params={"client_id": user_id}
+            params=params
         )
         response.raise_for_status()
         response_data = response.json()
@@ -94,6 +104,7 @@ class VBankAccountsService(BaseAccountsService):
         response.raise_for_status()
         return response.json()
 
+    @coalesced
     async def get_account_details(self, access_token: str, consent_id: str, user_id: str, account_id: str) -> dict:
         """
         Получает детальную информацию о конкретном счете из VBank.
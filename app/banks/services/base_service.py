@@ -26,6 +26,13 @@ class BaseService(ABC):
         """
         return self._client.api_url
 
+    @property
+    def request_coalescer(self):
+        """
+        Возвращает объединитель одинаковых запросов основного клиента банка (см. `app.banks.coalescing`).
+        """
+        return getattr(self._client, "request_coalescer", None)
+
     @property
     def main_client(self):
         """
@@ -3,6 +3,7 @@ from typing import Optional
 
 from app.banks.services.payments.base import BasePaymentsService, PaymentInitiationRequest, VRPPaymentRequest, VRPConsentRequest
 from app.core.config import settings
+from app.banks.coalescing import coalesced
 
 
 class ABankPaymentsService(BasePaymentsService):
@@ -40,6 +41,7 @@ class ABankPaymentsService(BasePaymentsService):
         response.raise_for_status()
         return response.json()
 
+    @coalesced
     async def get_payment_status(self, access_token: str, payment_id: str, client_id: str) -> dict:
         """
         Получает статус ранее созданного платежа из ABank.
@@ -4,12 +4,14 @@ from typing import List
 from app.banks.services.products.base import BaseProductsService
 from app.schemas.product import Product, ProductAgreement, ProductAgreementCreateRequest
 from app.core.config import settings
+from app.banks.coalescing import coalesced
 
 class SBankProductsService(BaseProductsService):
     """
     Сервис для работы с продуктами в SBank.
     """
 
+    @coalesced
     async def get_products(self, access_token: str) -> List[Product]:
         response = await self.client.get(
             f"{self.api_url}/products",
@@ -18,6 +20,7 @@ class SBankProductsService(BaseProductsService):
         response.raise_for_status()
         return [Product(**p) for p in response.json().get("data", [])]
 
+    @coalesced
     async def get_product_details(self, access_token: str, product_id: str) -> Product:
         response = await self.client.get(
             f"{self.api_url}/products/{product_id}",
@@ -26,6 +29,7 @@ class SBankProductsService(BaseProductsService):
         response.raise_for_status()
         return Product(**response.json().get("data", {}))
 
+    @coalesced
     async def get_product_agreements(self, access_token: str, consent_id: str, user_id: str) -> List[ProductAgreement]:
         response = await self.client.get(
             f"{self.api_url}/product-agreements",
@@ -52,6 +56,7 @@ class SBankProductsService(BaseProductsService):
         response.raise_for_status()
         return ProductAgreement(**response.json().get("data", {}))
 
+    @coalesced
     async def get_product_agreement_details(self, access_token: str, consent_id: str, user_id: str, agreement_id: str) -> ProductAgreement:
         response = await self.client.get(
             f"{self.api_url}/product-agreements/{agreement_id}",
@@ -4,12 +4,14 @@ from typing import List
 from app.banks.services.products.base import BaseProductsService
 from app.schemas.product import Product, ProductAgreement, ProductAgreementCreateRequest
 from app.core.config import settings
+from app.banks.coalescing import coalesced
 
 class VBankProductsService(BaseProductsService):
     """
     Сервис для работы с продуктами в VBank.
     """
 
+    @coalesced
     async def get_products(self, access_token: str) -> List[Product]:
         response = await self.client.get(
             f"{self.api_url}/products",
@@ -29,6 +31,7 @@ class VBankProductsService(BaseProductsService):
 
         return [Product(**p) for p in products_list if isinstance(p, dict)]
 
+    @coalesced
     async def get_product_details(self, access_token: str, product_id: str) -> Product:
         response = await self.client.get(
             f"{self.api_url}/products/{product_id}",
@@ -37,6 +40,7 @@ class VBankProductsService(BaseProductsService):
         response.raise_for_status()
         return Product(**response.json().get("data", {}))
 
+    @coalesced
     async def get_product_agreements(self, access_token: str, consent_id: str, user_id: str) -> List[ProductAgreement]:
         response = await self.client.get(
             f"{self.api_url}/product-agreements",
@@ -63,6 +67,7 @@ class VBankProductsService(BaseProductsService):
         response.raise_for_status()
         return ProductAgreement(**response.json().get("data", {}))
 
+    @coalesced
     async def get_product_agreement_details(self, access_token: str, consent_id: str, user_id: str, agreement_id: str) -> ProductAgreement:
         response = await self.client.get(
             f"{self.api_url}/product-agreements/{agreement_id}",
@@ -2,13 +2,14 @@ import httpx
 from datetime import datetime, timedelta, timezone
 
 from app.banks.base_client import BaseBankClient
-from app.core.config import settings
+from app.core.config import settings, BankTransportProfile
 from app.auth_manager.schemas import TokenResponse
 from app.banks.services.accounts.vbank import VBankAccountsService
 from app.banks.services.payments.vbank import VBankPaymentsService
 from app.banks.services.products.vbank import VBankProductsService
 from app.banks.services.cards.vbank import VBankCardsService
 from app.banks.services.products.base import BaseProductsService
+from app.banks.coalescing import coalesced
 
 
 class VBankClient(BaseBankClient):
@@ -17,8 +18,8 @@ class VBankClient(BaseBankClient):
     Реализует специфические методы для получения токенов, создания согласий
     и предоставляет доступ к сервисам счетов и платежей VBank.
     """
-    def __init__(self, client_id: str, client_secret: str, api_url: str):
-        super().__init__(client_id, client_secret, api_url)
+    def __init__(self, client_id: str, client_secret: str, api_url: str, transport_profile: BankTransportProfile | None = None):
+        super().__init__(client_id, client_secret, api_url, transport_profile)
         # Инициализация специфичных для VBank сервисов
         self._accounts_service = VBankAccountsService(self)
         self._payments_service = VBankPaymentsService(self)
@@ -91,6 +92,7 @@ class VBankClient(BaseBankClient):
         response.raise_for_status()
         return response.json()["consent_id"]
 
+    @coalesced
     async def get_consent(self, access_token: str, consent_id: str, user_id: str) -> dict:
         """
         Получает информацию о согласии по его ID из VBank.
@@ -106,6 +108,7 @@ class VBankClient(BaseBankClient):
         response.raise_for_status()
         return response.json()
 
+    @coalesced
     async def get_payment_consent(self, access_token: str, consent_id: str, user_id: str) -> dict:
         """
         Получает информацию о платежном согласии по его ID из VBank.
@@ -200,6 +203,7 @@ class VBankClient(BaseBankClient):
         """
         return self._cards_service
 
+    @coalesced
     async def get_cards(self, access_token: str, user_id: str, consent_id: str) -> list[dict]:
         """
         Получает список карт клиента из VBank.
@@ -223,6 +227,7 @@ class VBankClient(BaseBankClient):
              return response_data["cards"]
         raise ValueError(f"Неожиданная структура ответа от VBank при получении карт: {response_data}")
 
+    @coalesced
     async def get_card_details(self, access_token: str, user_id: str, consent_id: str, card_id: str) -> dict:
         """
         Получает детальную информацию о карте из VBank.
@@ -264,6 +269,7 @@ class VBankClient(BaseBankClient):
         response.raise_for_status()
         return response.json()["consent_id"]
 
+    @coalesced
     async def get_product_agreement_consent(self, access_token: str, consent_id: str, user_id: str) -> dict:
         """
         Получает информацию о согласии на управление договорами по его ID.
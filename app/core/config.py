@@ -1,5 +1,59 @@
 from pydantic_settings import BaseSettings
-from pydantic import ConfigDict
+from pydantic import BaseModel, ConfigDict
+
+
+class BankTransportProfile(BaseModel):
+    """
+    Профиль HTTP-транспорта для клиента конкретного банка.
+    Позволяет настраивать пул соединений и таймауты каждого банка независимо,
+    чтобы медленный банк не диктовал настройки остальным.
+    """
+    http2: bool = False # Использовать HTTP/2 (требует пакет h2)
+    max_connections: int = 100 # Максимальное число одновременных соединений с банком
+    max_keepalive_connections: int = 20 # Максимальное число idle-соединений в пуле
+    keepalive_expiry: float = 5.0 # Время жизни idle-соединения в секундах
+    connect_timeout: float = 5.0 # Таймаут установки соединения в секундах
+    read_timeout: float = 10.0 # Таймаут чтения ответа в секундах
+    write_timeout: float = 10.0 # Таймаут отправки запроса в секундах
+    pool_timeout: float = 5.0 # Таймаут ожидания свободного соединения в пуле в секундах
+    local_address: str | None = None # Локальный IP-адрес для исходящих соединений (например, "0.0.0.0")
+    retry_attempts: int = 3 # Число попыток идемпотентного (GET) запроса, включая первую
+    retry_base_delay: float = 0.1 # Начальная задержка повтора в секундах
+    retry_max_delay: float = 2.0 # Максимальная задержка повтора в секундах
+    breaker_failure_threshold: int = 5 # Число ошибок подряд, после которого запросы к банку приостанавливаются
+    breaker_reset_timeout: float = 30.0 # Через сколько секунд пропустить пробный запрос (half-open)
+    breaker_half_open_max_calls: int = 1 # Число одновременных пробных запросов в состоянии half-open
+
+
+class DatabaseEngineProfile(BaseModel):
+    """
+    Параметры движка БД. Размер пула и таймаут применяются к PostgreSQL и файловой SQLite,
+    `pool_recycle` и `pool_pre_ping` — только к PostgreSQL, поля `sqlite_*` — только к SQLite.
+    """
+    pool_size: int = 10 # Число постоянно открытых соединений в пуле
+    max_overflow: int = 20 # Число дополнительных соединений сверх pool_size при пиковой нагрузке
+    pool_timeout: float = 30.0 # Таймаут ожидания свободного соединения в пуле в секундах
+    pool_recycle: int = 1800 # Пересоздавать соединения старше указанного числа секунд
+    pool_pre_ping: bool = True # Проверять соединение перед выдачей из пула
+    sqlite_journal_mode: str = "WAL" # Режим журнала: WAL позволяет читать во время записи
+    sqlite_synchronous: str = "NORMAL" # В режиме WAL NORMAL безопасен и не делает fsync на каждый commit
+    sqlite_mmap_size: int = 268435456 # Размер отображаемой в память части файла БД в байтах (256 МБ)
+    sqlite_busy_timeout_ms: int = 5000 # Ожидание снятия блокировки записи в миллисекундах
+
+
+class ResponseCacheProfile(BaseModel):
+    """
+    Параметры кэша ответов банков на чтение (счета, балансы, карты).
+    TTL задается отдельно для каждой операции: балансы меняются чаще, чем список счетов.
+    """
+    enabled: bool = True # Включить кэширование ответов
+    max_entries: int = 5000 # Максимальное число записей; при переполнении вытесняются давно использованные
+    stale_ttl: float = 120.0 # Сколько секунд после истечения TTL отдавать устаревший ответ, обновляя его в фоне
+    accounts_ttl: float = 30.0 # TTL списка счетов в секундах
+    account_details_ttl: float = 60.0 # TTL деталей счета в секундах
+    balances_ttl: float = 15.0 # TTL балансов счета в секундах
+    cards_ttl: float = 60.0 # TTL списка карт в секундах
+    card_details_ttl: float = 60.0 # TTL деталей карты в секундах
 
 
 class Settings(BaseSettings):
@@ -12,6 +66,8 @@ class Settings(BaseSettings):
     CLIENT_SECRET: str # Секрет клиента для взаимодействия с API банков
     ENCRYPTION_KEY: str # Ключ для шифрования конфиденциальных данных (например, токенов)
     DATABASE_URL: str # URL для подключения к базе данных (например, SQLite или PostgreSQL)
+    # Параметры движка БД. Задаются через переменные окружения вида DB_ENGINE__POOL_SIZE=20
+    DB_ENGINE: DatabaseEngineProfile = DatabaseEngineProfile()
 
     VBANK_API_URL: str = "https://vbank.open.bankingapi.ru" # Базовый URL API VBank
     ABANK_API_URL: str = "https://abank.open.bankingapi.ru" # Базовый URL API ABank
@@ -20,10 +76,57 @@ class Settings(BaseSettings):
     CLIENT_CERT_PATH: str | None = None # Путь к файлу клиентского сертификата для mTLS
     CLIENT_KEY_PATH: str | None = None # Путь к файлу приватного ключа клиентского сертификата для mTLS
 
+    # Профили HTTP-транспорта для каждого банка.
+    # Задаются через переменные окружения вида VBANK_TRANSPORT__HTTP2=true, SBANK_TRANSPORT__READ_TIMEOUT=30
+    VBANK_TRANSPORT: BankTransportProfile = BankTransportProfile()
+    ABANK_TRANSPORT: BankTransportProfile = BankTransportProfile()
+    SBANK_TRANSPORT: BankTransportProfile = BankTransportProfile()
+
+    # Фоновое обновление токенов банков
+    TOKEN_RENEWAL_ENABLED: bool = True # Включить фоновый планировщик обновления токенов
+    TOKEN_RENEWAL_BANKS: list[str] = ["vbank", "abank", "sbank"] # Банки, токены которых обновляются заранее
+    TOKEN_RENEWAL_FRACTION: float = 0.75 # Доля expires_in, по истечении которой токен обновляется
+    TOKEN_RENEWAL_JITTER: float = 0.05 # Случайный разброс момента обновления (доля от интервала)
+    TOKEN_RENEWAL_RETRY_BASE_DELAY: float = 1.0 # Начальная задержка повтора после ошибки в секундах
+    TOKEN_RENEWAL_RETRY_MAX_DELAY: float = 60.0 # Максимальная задержка повтора в секундах
+
+    # Кэш JWKS банков
+    JWKS_DEFAULT_TTL: int = 3600 # TTL JWKS в секундах, если банк не прислал Cache-Control: max-age
+    JWKS_MIN_REFETCH_INTERVAL: int = 30 # Минимальный интервал повторной загрузки JWKS (при неизвестном kid) в секундах
+
+    # Кэш проверенных JWT
+    JWT_CACHE_MAX_SIZE: int = 10000 # Максимальное число записей в кэше
+    JWT_CACHE_MAX_TTL: int = 300 # Максимальное время жизни записи в секундах (даже если exp токена позже)
+
+    # Ограничения числа одновременных запросов MCP к банкам
+    MCP_MAX_CONCURRENT_REQUESTS: int = 32 # Общий лимит одновременных запросов ко всем банкам
+    MCP_MAX_CONCURRENT_REQUESTS_PER_BANK: int = 4 # Лимит одновременных запросов к одному банку
+
+    # Кэш ответов банков на чтение. Задается через переменные окружения вида RESPONSE_CACHE__BALANCES_TTL=5
+    RESPONSE_CACHE: ResponseCacheProfile = ResponseCacheProfile()
+
+    # Локальное хранилище транзакций
+    TRANSACTION_SYNC_MIN_INTERVAL: int = 60 # Сколько секунд после синхронизации счета транзакции читаются только из БД
+    TRANSACTION_SYNC_OVERLAP: int = 86400 # На сколько секунд раньше курсора запрашивать транзакции (поздно проведенные операции)
+    TRANSACTIONS_PAGE_SIZE: int = 100 # Размер страницы транзакций по умолчанию
+    TRANSACTIONS_MAX_PAGE_SIZE: int = 500 # Максимальный размер страницы транзакций
+
+    # Пакетный запрос данных счетов (POST /api/v1/data/batch)
+    DATA_BATCH_MAX_ITEMS: int = 100 # Максимальное число счетов в одном запросе
+
+    # Реестр согласий клиентов (MCP создает согласие, только если его нет или оно истекает)
+    CONSENT_TTL: int = 365 * 86400 # Срок действия согласия в секундах (банки выдают согласия на 365 дней)
+    CONSENT_RENEWAL_MARGIN: int = 86400 # За сколько секунд до истечения согласие создается заново
+
+    # Агрегация данных банков для UI (POST /api/v1/aggregator/all)
+    AGGREGATOR_BANKS: list[str] = ["vbank", "abank", "sbank"] # Банки, к которым обращается агрегатор по умолчанию
+    AGGREGATOR_BANK_TIMEOUT: float = 8.0 # Сколько секунд ждать все разделы одного банка
+    AGGREGATOR_SECTION_TIMEOUT: float = 5.0 # Сколько секунд ждать один раздел (счета, балансы, транзакции, ...)
+
     # Ключ для доступа к публичному AI-адаптеру
     PUBLIC_ADAPTER_API_KEY: str | None = None
 
-    model_config = ConfigDict(env_file=".env")
+    model_config = ConfigDict(env_file=".env", env_nested_delimiter="__")
 
 
 settings = Settings()
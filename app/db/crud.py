@@ -1,56 +1,328 @@
 """
-Модуль для выполнения операций CRUD (Create, Read, Update, Delete) с токенами в базе данных.
-Использует SQLAlchemy для взаимодействия с базой данных и Fernet для шифрования/дешифрования токенов.
+Модуль для выполнения операций CRUD (Create, Read, Update, Delete) с токенами, транзакциями и согласиями в базе данных.
+Использует асинхронную сессию SQLAlchemy для взаимодействия с базой данных и Fernet для шифрования/дешифрования токенов.
 """
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import models
 from app.security import encryption
 
 
-def save_token(db: Session, bank_name: str, token: str, expires_in: int):
+def as_utc(value: datetime) -> datetime:
+    """
+    Приводит дату к UTC. SQLite не хранит часовой пояс и возвращает naive-даты,
+    которые в БД всегда записаны в UTC; даты со смещением переводятся в UTC.
+    """
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+async def save_token(db: AsyncSession, bank_name: str, token: str, expires_in: int, issued_at: datetime | None = None):
     """
     Сохраняет или обновляет токен доступа для указанного банка в базе данных.
     Токен шифруется перед сохранением.
 
-    - `db`: Сессия базы данных SQLAlchemy.
+    - `db`: Асинхронная сессия базы данных SQLAlchemy.
     - `bank_name`: Название банка (например, 'vbank').
     - `token`: Токен доступа, полученный от банка.
     - `expires_in`: Время жизни токена в секундах.
+    - `issued_at`: Момент получения токена (по умолчанию — текущее время UTC).
 
+    Вместе с токеном сохраняется абсолютный момент его истечения (`expires_at`),
+    что позволяет восстановить in-memory кэш после перезапуска.
     Если токен для данного банка уже существует, он обновляется; в противном случае создается новая запись.
     """
     encrypted_token = encryption.encrypt(token)
-    db_token = db.query(models.Token).filter(models.Token.bank_name == bank_name).first()
+    issued_at = issued_at or datetime.now(timezone.utc)
+    expires_at = issued_at + timedelta(seconds=expires_in)
+    db_token = await db.scalar(select(models.Token).where(models.Token.bank_name == bank_name))
 
     if db_token:
         # Обновляем существующий токен
         db_token.encrypted_token = encrypted_token
         db_token.expires_in = expires_in
+        db_token.issued_at = issued_at
+        db_token.expires_at = expires_at
     else:
         # Вставляем новый токен
         db_token = models.Token(
             bank_name=bank_name,
             encrypted_token=encrypted_token,
-            expires_in=expires_in
+            expires_in=expires_in,
+            issued_at=issued_at,
+            expires_at=expires_at
         )
         db.add(db_token)
 
-    db.commit()
-    db.refresh(db_token)
+    await db.commit()
+    await db.refresh(db_token)
     return db_token
 
 
-def get_decrypted_token(db: Session, bank_name: str) -> str | None:
+async def get_decrypted_token(db: AsyncSession, bank_name: str) -> str | None:
     """
     Получает зашифрованный токен для указанного банка из базы данных и дешифрует его.
 
-    - `db`: Сессия базы данных SQLAlchemy.
+    - `db`: Асинхронная сессия базы данных SQLAlchemy.
     - `bank_name`: Название банка.
 
     Возвращает дешифрованный токен в виде строки или `None`, если токен не найден.
     """
-    db_token = db.query(models.Token).filter(models.Token.bank_name == bank_name).first()
+    db_token = await db.scalar(select(models.Token).where(models.Token.bank_name == bank_name))
     if db_token:
         return encryption.decrypt(db_token.encrypted_token)
     return None
+
+
+async def get_unexpired_tokens(db: AsyncSession, valid_until: datetime, bank_name: str | None = None) -> dict[str, tuple[str, datetime, int]]:
+    """
+    Получает из базы данных токены, которые еще будут действительны в момент `valid_until`, и дешифрует их.
+
+    - `db`: Асинхронная сессия базы данных SQLAlchemy.
+    - `valid_until`: Момент времени, до которого токен должен оставаться действительным.
+    - `bank_name`: Название банка. Если не указано, возвращаются токены всех банков.
+
+    Возвращает словарь `{bank_name: (token, issued_at, expires_in)}`.
+    Токены, сохраненные без абсолютного времени истечения, пропускаются.
+    """
+    query = select(models.Token).where(models.Token.expires_at > valid_until)
+    if bank_name is not None:
+        query = query.where(models.Token.bank_name == bank_name)
+
+    tokens = {}
+    for db_token in await db.scalars(query):
+        issued_at = as_utc(db_token.issued_at)
+        tokens[db_token.bank_name] = (encryption.decrypt(db_token.encrypted_token), issued_at, db_token.expires_in)
+    return tokens
+
+
+# Конструкции INSERT с поддержкой ON CONFLICT для поддерживаемых СУБД
+_UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+# Поля транзакции, обновляемые при повторном получении от банка (например, смена статуса операции)
+_TRANSACTION_UPDATE_COLUMNS = ("booking_date", "amount", "currency", "category", "search_text", "payload", "synced_at")
+# Число строк в одном INSERT: SQLite ограничивает число параметров запроса
+_UPSERT_CHUNK_SIZE = 500
+
+
+async def upsert_transactions(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """
+    Вставляет или обновляет транзакции одним запросом на пачку строк.
+
+    - `db`: Асинхронная сессия базы данных SQLAlchemy.
+    - `rows`: Значения колонок `models.Transaction` (без `id`).
+
+    Транзакция определяется парой счет + `transaction_id`, поэтому повторная синхронизация
+    тех же транзакций не создает дубликатов. Возвращает число обработанных строк.
+    Изменения не фиксируются: `commit` выполняет вызывающий код вместе с обновлением курсора.
+    """
+    if not rows:
+        return 0
+    insert = _UPSERT_INSERTS[db.get_bind().dialect.name]
+    for start in range(0, len(rows), _UPSERT_CHUNK_SIZE):
+        statement = insert(models.Transaction).values(rows[start:start + _UPSERT_CHUNK_SIZE])
+        statement = statement.on_conflict_do_update(
+            index_elements=["bank_name", "user_id", "account_id", "transaction_id"],
+            set_={column: statement.excluded[column] for column in _TRANSACTION_UPDATE_COLUMNS},
+        )
+        await db.execute(statement)
+    return len(rows)
+
+
+async def get_transactions(db: AsyncSession, bank_name: str, user_id: str, account_id: str) -> List[models.Transaction]:
+    """
+    Получает сохраненные транзакции счета, от новых к старым.
+    """
+    query = (
+        select(models.Transaction)
+        .where(
+            models.Transaction.bank_name == bank_name,
+            models.Transaction.user_id == user_id,
+            models.Transaction.account_id == account_id,
+        )
+        .order_by(models.Transaction.booking_date.desc(), models.Transaction.transaction_id.desc())
+    )
+    return list(await db.scalars(query))
+
+
+async def get_user_transactions(db: AsyncSession, user_id: str) -> List[models.Transaction]:
+    """
+    Получает сохраненные транзакции всех счетов пользователя.
+    """
+    return list(await db.scalars(select(models.Transaction).where(models.Transaction.user_id == user_id)))
+
+
+async def update_transaction_categories(db: AsyncSession, categories: Dict[int, str]) -> int:
+    """
+    Обновляет категории сохраненных транзакций и фиксирует изменения.
+
+    - `categories`: Новые категории по `models.Transaction.id`.
+
+    Возвращает число обновленных строк.
+    """
+    if not categories:
+        return 0
+    await db.execute(update(models.Transaction), [{"id": id, "category": category} for id, category in categories.items()])
+    await db.commit()
+    return len(categories)
+
+
+async def get_transactions_page(
+    db: AsyncSession,
+    bank_name: str,
+    user_id: str,
+    account_id: str,
+    limit: int,
+    after: tuple[datetime | None, str] | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    amount_min: float | None = None,
+    amount_max: float | None = None,
+    category: str | None = None,
+    text: str | None = None,
+) -> List[models.Transaction]:
+    """
+    Получает страницу сохраненных транзакций счета, от новых к старым.
+
+    - `after`: Ключ (`booking_date`, `transaction_id`) последней транзакции предыдущей страницы.
+      Страница начинается сразу после нее (keyset-пагинация), поэтому время запроса не зависит от номера страницы.
+    - `date_from`, `date_to`: Диапазон дат проведения (включительно); даты без смещения считаются UTC.
+    - `amount_min`, `amount_max`: Диапазон сумм со знаком (включительно).
+    - `category`: Точное значение категории.
+    - `text`: Подстрока описания, контрагента или категории без учета регистра.
+
+    Транзакции без даты проведения идут в конце выдачи.
+    """
+    transaction = models.Transaction
+    conditions = [
+        transaction.bank_name == bank_name,
+        transaction.user_id == user_id,
+        transaction.account_id == account_id,
+    ]
+    if after is not None:
+        after_date, after_id = after
+        if after_date is None:
+            conditions.append(and_(transaction.booking_date.is_(None), transaction.transaction_id < after_id))
+        else:
+            conditions.append(or_(
+                transaction.booking_date < after_date,
+                and_(transaction.booking_date == after_date, transaction.transaction_id < after_id),
+                transaction.booking_date.is_(None),
+            ))
+    # Даты в БД хранятся в UTC, а SQLite сравнивает их без учета смещения
+    if date_from is not None:
+        conditions.append(transaction.booking_date >= as_utc(date_from))
+    if date_to is not None:
+        conditions.append(transaction.booking_date <= as_utc(date_to))
+    if amount_min is not None:
+        conditions.append(transaction.amount >= amount_min)
+    if amount_max is not None:
+        conditions.append(transaction.amount <= amount_max)
+    if category is not None:
+        conditions.append(transaction.category == category)
+    if text:
+        pattern = text.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append(transaction.search_text.like(f"%{pattern}%", escape="\\"))
+
+    query = (
+        select(transaction)
+        .where(*conditions)
+        .order_by(transaction.booking_date.desc().nulls_last(), transaction.transaction_id.desc())
+        .limit(limit)
+    )
+    return list(await db.scalars(query))
+
+
+async def get_sync_cursor(db: AsyncSession, bank_name: str, user_id: str, account_id: str) -> models.TransactionSyncCursor | None:
+    """
+    Получает курсор синхронизации транзакций счета или `None`, если счет еще не синхронизировался.
+    """
+    return await db.scalar(
+        select(models.TransactionSyncCursor).where(
+            models.TransactionSyncCursor.bank_name == bank_name,
+            models.TransactionSyncCursor.user_id == user_id,
+            models.TransactionSyncCursor.account_id == account_id,
+        )
+    )
+
+
+async def save_sync_cursor(
+    db: AsyncSession,
+    bank_name: str,
+    user_id: str,
+    account_id: str,
+    last_booking_date: datetime | None,
+    last_transaction_id: str | None,
+    synced_at: datetime,
+) -> models.TransactionSyncCursor:
+    """
+    Сохраняет курсор синхронизации счета и фиксирует транзакцию БД
+    (вместе с транзакциями, добавленными `upsert_transactions`).
+    """
+    cursor = await get_sync_cursor(db, bank_name, user_id, account_id)
+    if cursor is None:
+        cursor = models.TransactionSyncCursor(bank_name=bank_name, user_id=user_id, account_id=account_id)
+        db.add(cursor)
+    cursor.last_booking_date = last_booking_date
+    cursor.last_transaction_id = last_transaction_id
+    cursor.synced_at = synced_at
+    await db.commit()
+    return cursor
+
+
+async def get_consent(db: AsyncSession, bank_name: str, user_id: str, kind: str) -> models.Consent | None:
+    """
+    Получает согласие клиента указанного вида из реестра или `None`, если его нет.
+    """
+    return await db.scalar(
+        select(models.Consent).where(
+            models.Consent.bank_name == bank_name,
+            models.Consent.user_id == user_id,
+            models.Consent.kind == kind,
+        )
+    )
+
+
+async def save_consent(
+    db: AsyncSession,
+    bank_name: str,
+    user_id: str,
+    kind: str,
+    consent_id: str,
+    permissions: List[str],
+    created_at: datetime,
+    expires_at: datetime | None,
+) -> models.Consent:
+    """
+    Сохраняет в реестре активное согласие клиента, заменяя прежнее согласие того же вида.
+    """
+    consent = await get_consent(db, bank_name, user_id, kind)
+    if consent is None:
+        consent = models.Consent(bank_name=bank_name, user_id=user_id, kind=kind)
+        db.add(consent)
+    consent.consent_id = consent_id
+    consent.status = "active"
+    consent.permissions = list(permissions)
+    consent.created_at = created_at
+    consent.expires_at = expires_at
+    await db.commit()
+    return consent
+
+
+async def revoke_consent(db: AsyncSession, bank_name: str, consent_id: str) -> int:
+    """
+    Помечает согласие в реестре отозванным. Возвращает число измененных записей.
+    """
+    result = await db.execute(
+        update(models.Consent)
+        .where(models.Consent.bank_name == bank_name, models.Consent.consent_id == consent_id)
+        .values(status="revoked")
+    )
+    await db.commit()
+    return result.rowcount
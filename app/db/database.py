@@ -1,29 +1,144 @@
 """
 Модуль для настройки подключения к базе данных с использованием SQLAlchemy.
-Определяет движок базы данных, фабрику сессий и базовый класс для декларативных моделей.
+Определяет асинхронный движок базы данных, фабрику сессий и базовый класс для декларативных моделей.
+
+Драйвер выбирается по схеме `DATABASE_URL`: для SQLite используется `aiosqlite`,
+для PostgreSQL — `asyncpg`. Поэтому операции с БД не блокируют цикл событий
+и не останавливают остальные корутины воркера.
 """
-from sqlalchemy import create_engine
+import asyncio
+import weakref
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.orm import sessionmaker
 
-from app.core.config import settings
+from app.core.config import settings, DatabaseEngineProfile
+from app.db.pool import MeteredAsyncQueuePool
+
+# Асинхронные драйверы для поддерживаемых СУБД
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def get_async_database_url(database_url: str) -> URL:
+    """
+    Преобразует `DATABASE_URL` в URL с асинхронным драйвером.
+    Синхронные драйверы (например, `postgresql+psycopg2`) заменяются асинхронными,
+    уже асинхронные URL возвращаются без изменений.
+    """
+    url = make_url(database_url)
+    async_driver = _ASYNC_DRIVERS.get(url.get_backend_name())
+    if async_driver is None or url.drivername in _ASYNC_DRIVERS.values():
+        return url
+    return url.set(drivername=async_driver)
+
+
+def _is_sqlite_memory(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
 
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
-# Фабрика сессий для создания объектов сессий базы данных.
-# autocommit=False и autoflush=False гарантируют, что изменения не будут автоматически сохраняться.
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _engine_options(url: URL, profile: DatabaseEngineProfile) -> Dict[str, Any]:
+    """
+    Подбирает параметры пула и подключения под СУБД.
+    In-memory SQLite оставляется со стандартным пулом SQLAlchemy (одно общее соединение).
+    """
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        return {
+            "poolclass": MeteredAsyncQueuePool,
+            "pool_size": profile.pool_size,
+            "max_overflow": profile.max_overflow,
+            "pool_timeout": profile.pool_timeout,
+            "pool_recycle": profile.pool_recycle,
+            "pool_pre_ping": profile.pool_pre_ping,
+        }
+    if backend == "sqlite" and not _is_sqlite_memory(url):
+        return {
+            "poolclass": MeteredAsyncQueuePool,
+            "pool_size": profile.pool_size,
+            "max_overflow": profile.max_overflow,
+            "pool_timeout": profile.pool_timeout,
+            # Встроенное ожидание снятия блокировки записи (аналог PRAGMA busy_timeout)
+            "connect_args": {"timeout": profile.sqlite_busy_timeout_ms / 1000},
+        }
+    return {}
+
+
+def _apply_sqlite_pragmas(engine: AsyncEngine, profile: DatabaseEngineProfile):
+    """
+    Включает WAL, `synchronous` и mmap для каждого нового соединения SQLite.
+    """
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={profile.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={profile.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(profile.sqlite_mmap_size)}")
+        cursor.close()
+
+
+def create_database_engine(database_url: str, profile: DatabaseEngineProfile) -> AsyncEngine:
+    """
+    Создает асинхронный движок с параметрами пула и PRAGMA, соответствующими СУБД.
+    """
+    url = get_async_database_url(database_url)
+    engine = create_async_engine(url, **_engine_options(url, profile))
+    if url.get_backend_name() == "sqlite":
+        _apply_sqlite_pragmas(engine, profile)
+    return engine
+
+
+engine = create_database_engine(settings.DATABASE_URL, settings.DB_ENGINE)
+# Фабрика асинхронных сессий.
+# autoflush=False гарантирует, что изменения не будут автоматически отправляться в БД,
+# а expire_on_commit=False позволяет читать атрибуты объектов после commit без повторного запроса.
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 # Базовый класс для декларативных моделей SQLAlchemy.
 Base = declarative_base()
 
+# Блокировки сессий БД {session: lock}. AsyncSession не допускает конкурентных операций,
+# а мультибанковые агрегации обращаются к БД из параллельных задач в одной сессии запроса.
+_session_locks: "weakref.WeakKeyDictionary[AsyncSession, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def session_lock(db: AsyncSession) -> asyncio.Lock:
+    """
+    Возвращает блокировку, сериализующую обращения к одной сессии БД из параллельных задач.
+    Сетевые запросы к банкам под блокировку не попадают и выполняются параллельно.
+    """
+    lock = _session_locks.get(db)
+    if lock is None:
+        lock = _session_locks[db] = asyncio.Lock()
+    return lock
+
 
-def get_db():
+def task_session(db: AsyncSession) -> AsyncSession:
     """
-    Зависимость FastAPI для получения сессии базы данных.
+    Открывает новую сессию на том же движке, что и `db`, для фоновой задачи, общей для нескольких запросов.
+    Сессию запроса закрывает `get_db` по завершении запроса, а задача может его пережить
+    (например, если запрос, начавший ее, отменен), поэтому задача работает в своей сессии.
+    """
+    return SessionLocal(bind=db.bind)
+
+
+async def get_db():
+    """
+    Зависимость FastAPI для получения асинхронной сессии базы данных.
     Создает новую сессию для каждого запроса и автоматически закрывает ее после завершения.
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def init_db():
+    """
+    Создает таблицы всех моделей. Вызывается при старте приложения.
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
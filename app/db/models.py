@@ -1,8 +1,10 @@
 """
 Модуль, определяющий модели SQLAlchemy для базы данных.
-Содержит модель `Token` для хранения зашифрованных токенов доступа банков.
+Содержит модель `Token` для хранения зашифрованных токенов доступа банков,
+локальное хранилище транзакций (`Transaction`) с курсорами синхронизации счетов (`TransactionSyncCursor`)
+и реестр согласий клиентов (`Consent`).
 """
-from sqlalchemy import Column, Integer, String, LargeBinary
+from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, Float, JSON, Index, UniqueConstraint
 
 from app.db.database import Base
 
@@ -18,3 +20,74 @@ class Token(Base):
     bank_name = Column(String, unique=True, index=True) # Название банка (уникальное)
     encrypted_token = Column(LargeBinary, nullable=False) # Зашифрованный токен доступа
     expires_in = Column(Integer, nullable=False) # Время жизни токена в секундах
+    issued_at = Column(DateTime(timezone=True), nullable=True) # Момент получения токена (UTC)
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True) # Абсолютный момент истечения токена (UTC)
+
+
+class Transaction(Base):
+    """
+    Транзакция счета, сохраненная локально после синхронизации с банком.
+    Исходный ответ банка хранится в `payload` и возвращается клиентам без изменений.
+
+    Индексы повторяют порядок постраничной выдачи (`booking_date`, `transaction_id` от новых к старым),
+    поэтому страница читается без сортировки всей истории счета.
+    """
+    __tablename__ = "transactions"
+    __table_args__ = (
+        UniqueConstraint("bank_name", "user_id", "account_id", "transaction_id", name="uq_transactions_account_transaction"),
+        Index("ix_transactions_account_booking_date", "bank_name", "user_id", "account_id", "booking_date", "transaction_id"),
+        Index("ix_transactions_account_category_booking_date", "bank_name", "user_id", "account_id", "category", "booking_date", "transaction_id"),
+    )
+
+    id = Column(Integer, primary_key=True) # Уникальный идентификатор записи
+    bank_name = Column(String, nullable=False) # Название банка
+    user_id = Column(String, nullable=False) # Идентификатор клиента банка
+    account_id = Column(String, nullable=False) # Идентификатор счета
+    transaction_id = Column(String, nullable=False) # Идентификатор транзакции в банке
+    booking_date = Column(DateTime(timezone=True), nullable=True) # Дата проведения (UTC)
+    amount = Column(Float, nullable=True) # Сумма со знаком: поступления положительные, списания отрицательные
+    currency = Column(String, nullable=True) # Валюта суммы
+    category = Column(String, nullable=True) # Категория операции, определенная `app.analytics.categorizer`
+    search_text = Column(String, nullable=True) # Описание, контрагент и категория в нижнем регистре для поиска по тексту
+    payload = Column(JSON, nullable=False) # Транзакция в формате ответа банка
+    synced_at = Column(DateTime(timezone=True), nullable=False) # Момент последнего получения транзакции от банка (UTC)
+
+
+class TransactionSyncCursor(Base):
+    """
+    Курсор синхронизации транзакций счета: последняя полученная от банка транзакция.
+    Следующая синхронизация запрашивает у банка только транзакции после курсора.
+    """
+    __tablename__ = "transaction_sync_cursors"
+    __table_args__ = (
+        UniqueConstraint("bank_name", "user_id", "account_id", name="uq_transaction_sync_cursors_account"),
+    )
+
+    id = Column(Integer, primary_key=True) # Уникальный идентификатор записи
+    bank_name = Column(String, nullable=False) # Название банка
+    user_id = Column(String, nullable=False) # Идентификатор клиента банка
+    account_id = Column(String, nullable=False) # Идентификатор счета
+    last_booking_date = Column(DateTime(timezone=True), nullable=True) # Дата проведения последней транзакции (UTC)
+    last_transaction_id = Column(String, nullable=True) # Идентификатор последней транзакции
+    synced_at = Column(DateTime(timezone=True), nullable=False) # Момент последней успешной синхронизации (UTC)
+
+
+class Consent(Base):
+    """
+    Согласие клиента, полученное от банка. Для каждой пары банк + клиент хранится
+    одно согласие каждого вида, которое MCP переиспользует, пока оно не истекло и не отозвано.
+    """
+    __tablename__ = "consents"
+    __table_args__ = (
+        UniqueConstraint("bank_name", "user_id", "kind", name="uq_consents_user_kind"),
+    )
+
+    id = Column(Integer, primary_key=True) # Уникальный идентификатор записи
+    bank_name = Column(String, nullable=False) # Название банка
+    user_id = Column(String, nullable=False) # Идентификатор клиента банка
+    kind = Column(String, nullable=False) # Вид согласия: 'accounts' (доступ к данным) или 'product_agreements'
+    consent_id = Column(String, nullable=False, index=True) # Идентификатор согласия в банке
+    status = Column(String, nullable=False) # 'active' или 'revoked'
+    permissions = Column(JSON, nullable=False) # Выданные разрешения
+    created_at = Column(DateTime(timezone=True), nullable=False) # Момент создания согласия (UTC)
+    expires_at = Column(DateTime(timezone=True), nullable=True) # Момент истечения согласия (UTC)
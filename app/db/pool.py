@@ -0,0 +1,80 @@
+"""
+Пул соединений с БД с учетом времени ожидания свободного соединения.
+
+Время ожидания checkout — основной сигнал для подбора размера пула: если оно растет
+под реальной нагрузкой, корутины стоят в очереди за соединением, а не за самой БД.
+"""
+import time
+from typing import Any, Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+class PoolMetrics:
+    """
+    Счетчики выдачи соединений из пула: число выдач, время ожидания и таймауты.
+    """
+    def __init__(self):
+        self._stats: Dict[str, float] = {
+            "checkouts": 0, # Число выданных соединений
+            "checkout_timeouts": 0, # Число запросов, не дождавшихся соединения за pool_timeout
+            "last_wait_ms": 0.0, # Время ожидания последней выдачи
+            "max_wait_ms": 0.0, # Максимальное время ожидания
+            "total_wait_ms": 0.0, # Суммарное время ожидания
+        }
+
+    def record_checkout(self, wait_seconds: float):
+        """
+        Учитывает успешную выдачу соединения.
+        """
+        wait_ms = wait_seconds * 1000
+        self._stats["checkouts"] += 1
+        self._stats["last_wait_ms"] = wait_ms
+        self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+        self._stats["total_wait_ms"] += wait_ms
+
+    def record_timeout(self):
+        """
+        Учитывает таймаут ожидания соединения.
+        """
+        self._stats["checkout_timeouts"] += 1
+
+    def stats(self, pool: Pool | None = None) -> Dict[str, Any]:
+        """
+        Возвращает счетчики ожидания и, для пулов с очередью, текущее состояние пула.
+        """
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["avg_wait_ms"] = stats["total_wait_ms"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        if isinstance(pool, QueuePool):
+            stats["pool_size"] = pool.size()
+            stats["checked_out"] = pool.checkedout()
+            stats["overflow"] = pool.overflow()
+            stats["checked_in"] = pool.checkedin()
+        return stats
+
+    def reset(self):
+        """
+        Обнуляет счетчики.
+        """
+        for key in self._stats:
+            self._stats[key] = 0
+
+
+# Счетчики пула основного движка приложения
+pool_metrics = PoolMetrics()
+
+
+class MeteredAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    `AsyncAdaptedQueuePool`, который измеряет время ожидания свободного соединения.
+    """
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - started)
+        return connection
@@ -0,0 +1,45 @@
+"""
+Ограничение числа одновременных запросов MCP к банкам.
+
+Мультибанковые операции раскладываются на запросы по каждому счету. Без ограничения
+пользователь с 30 счетами в одном банке открыл бы 30 одновременных соединений с этим банком.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class BankConcurrencyLimiter:
+    """
+    Два уровня ограничений: общий лимит на все банки и лимит на каждый банк.
+
+    Сначала занимается слот банка, затем общий слот, поэтому запросы к перегруженному банку
+    ждут в очереди своего банка и не занимают общие слоты, нужные остальным банкам.
+    """
+    def __init__(self, max_total: int = 32, max_per_bank: int = 4):
+        self.max_total = max_total
+        self.max_per_bank = max_per_bank
+        self._total: asyncio.Semaphore | None = None
+        self._per_bank: Dict[str, asyncio.Semaphore] = {}
+
+    @asynccontextmanager
+    async def slot(self, bank_name: str):
+        """
+        Занимает слот для одного запроса к банку на время блока `async with`.
+        """
+        if self._total is None:
+            self._total = asyncio.Semaphore(self.max_total)
+        bank_semaphore = self._per_bank.get(bank_name)
+        if bank_semaphore is None:
+            bank_semaphore = self._per_bank[bank_name] = asyncio.Semaphore(self.max_per_bank)
+        async with bank_semaphore:
+            async with self._total:
+                yield
+
+    def reset(self):
+        """
+        Забывает созданные семафоры.
+        Используется в тестах, где каждый тест выполняется в своем цикле событий.
+        """
+        self._total = None
+        self._per_bank.clear()
@@ -0,0 +1,150 @@
+"""
+Реестр согласий клиентов: MCP находит согласие сам, а не требует `consent_id` от вызывающего кода.
+
+Согласие каждого вида (`accounts`, `product_agreements`) для пары банк + клиент хранится в БД
+и переиспользуется, пока не истекло и не отозвано. Обычный запрос данных стоит одного чтения
+по уникальному индексу, а запрос к банку на создание согласия выполняется, только если
+согласия нет, оно отозвано или истекает в течение `CONSENT_RENEWAL_MARGIN` секунд.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth_manager.services import BaseAuthManager
+from app.banks.coalescing import RequestCoalescer
+from app.core.config import settings
+from app.db import crud
+from app.db.database import session_lock, task_session
+from app.utils.bank_clients import get_bank_client
+
+# Разрешения, запрашиваемые при автоматическом создании согласия каждого вида
+DEFAULT_CONSENT_PERMISSIONS: Dict[str, List[str]] = {
+    "accounts": [
+        "ReadAccountsDetail",
+        "ReadBalances",
+        "ReadTransactionsCredits",
+        "ReadTransactionsDebits",
+        "ReadTransactionsDetail",
+        "ReadBeneficiariesDetail",
+        "ReadStandingOrders",
+        "ReadProducts",
+        "ReadOffers",
+        "ReadStatements",
+    ],
+    "product_agreements": ["ReadProductAgreements"],
+}
+
+# Одновременные запросы одного клиента без согласия создают в банке одно согласие, а не несколько
+_creation_coalescer = RequestCoalescer()
+
+# Счетчики обращений к реестру для диагностики
+_registry_stats: Dict[str, int] = {
+    "lookups": 0, # Запросы согласия из реестра
+    "hits": 0, # Из них обслуженные действующим согласием без обращения к банку
+    "created": 0, # Согласия, созданные в банке
+    "renewed": 0, # Из них созданные взамен истекшего или отозванного
+    "registered": 0, # Согласия, созданные вызывающим кодом и добавленные в реестр
+    "register_errors": 0, # Согласия, созданные вызывающим кодом, которые не удалось добавить в реестр
+    "revoked": 0, # Согласия, помеченные отозванными
+}
+
+
+def get_consent_registry_stats() -> Dict[str, int]:
+    """
+    Возвращает счетчики обращений к реестру согласий.
+    """
+    return {**_registry_stats, "creations_in_flight": _creation_coalescer.stats()["in_flight"]}
+
+
+class ConsentRegistry:
+    """
+    Находит действующее согласие клиента в БД и создает новое в банке, только если его нет.
+    """
+    def __init__(self, db: AsyncSession, auth_manager: BaseAuthManager):
+        self.db = db
+        self.auth_manager = auth_manager
+
+    async def get_consent_id(self, bank_name: str, user_id: str, kind: str = "accounts") -> str:
+        """
+        Возвращает идентификатор действующего согласия клиента, при необходимости создавая его в банке.
+        """
+        if kind not in DEFAULT_CONSENT_PERMISSIONS:
+            raise ValueError(f"Неизвестный вид согласия: {kind}")
+        _registry_stats["lookups"] += 1
+        async with session_lock(self.db):
+            consent = await crud.get_consent(self.db, bank_name, user_id, kind)
+            if consent is not None and self._is_usable(consent.status, consent.expires_at):
+                _registry_stats["hits"] += 1
+                return consent.consent_id
+            renewing = consent is not None
+
+        consent_id = await _creation_coalescer.run(
+            (bank_name, user_id, kind), lambda: self._create(bank_name, user_id, kind)
+        )
+        if renewing:
+            _registry_stats["renewed"] += 1
+        return consent_id
+
+    async def register(self, bank_name: str, user_id: str, consent_id: str, permissions: List[str], kind: str = "accounts"):
+        """
+        Добавляет в реестр согласие, созданное вызывающим кодом (например, через `/auth/create-consent`),
+        чтобы следующие запросы MCP переиспользовали его.
+        """
+        now = datetime.now(timezone.utc)
+        async with session_lock(self.db):
+            await crud.save_consent(self.db, bank_name, user_id, kind, consent_id, permissions, now, now + timedelta(seconds=settings.CONSENT_TTL))
+        _registry_stats["registered"] += 1
+
+    async def register_safely(self, bank_name: str, user_id: str, consent_id: str, permissions: List[str], kind: str = "accounts") -> bool:
+        """
+        Как `register`, но ошибка записи в реестр не пробрасывается: согласие уже создано в банке,
+        и его идентификатор должен дойти до клиента. Без записи в реестре MCP при следующем запросе создаст новое согласие.
+        Возвращает `True`, если согласие добавлено в реестр.
+        """
+        try:
+            await self.register(bank_name, user_id, consent_id, permissions, kind)
+        except Exception:
+            _registry_stats["register_errors"] += 1
+            return False
+        return True
+
+    async def revoke(self, bank_name: str, consent_id: str) -> bool:
+        """
+        Помечает согласие отозванным: следующий запрос данных создаст новое.
+        Возвращает `False`, если согласия нет в реестре.
+        """
+        async with session_lock(self.db):
+            revoked = await crud.revoke_consent(self.db, bank_name, consent_id)
+        _registry_stats["revoked"] += revoked
+        return revoked > 0
+
+    @staticmethod
+    def _is_usable(status: str, expires_at: datetime | None) -> bool:
+        if status != "active":
+            return False
+        if expires_at is None:
+            return True
+        renew_at = crud.as_utc(expires_at) - timedelta(seconds=settings.CONSENT_RENEWAL_MARGIN)
+        return datetime.now(timezone.utc) < renew_at
+
+    async def _create(self, bank_name: str, user_id: str, kind: str) -> str:
+        """
+        Создает согласие в банке и сохраняет его в реестре.
+
+        Создание общее для одновременных запросов и выполняется в отдельной задаче (см. `RequestCoalescer`),
+        поэтому работает в своей сессии БД, а не в сессии запроса, начавшего его.
+        """
+        permissions = DEFAULT_CONSENT_PERMISSIONS[kind]
+        async with task_session(self.db) as db:
+            access_token = await self.auth_manager.get_access_token(db, bank_name)
+            bank_client = get_bank_client(bank_name)
+            if kind == "product_agreements":
+                consent_id = await bank_client.create_product_agreement_consent(access_token, permissions, user_id)
+            else:
+                consent_id = await bank_client.create_consent(access_token, permissions, user_id)
+
+            now = datetime.now(timezone.utc)
+            await crud.save_consent(db, bank_name, user_id, kind, consent_id, permissions, now, now + timedelta(seconds=settings.CONSENT_TTL))
+        _registry_stats["created"] += 1
+        return consent_id
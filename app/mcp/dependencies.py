@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 from app.db.database import get_db
 from app.mcp.services import MCPService
@@ -6,7 +6,7 @@ from app.auth_manager.dependencies import get_auth_manager
 from app.auth_manager.services import BaseAuthManager
 
 def get_mcp_service(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ) -> MCPService:
     """
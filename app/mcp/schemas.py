@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Any
+from typing import List, Literal, Optional, Any, Dict
 
 class MultiBankAccountsRequest(BaseModel):
     """
@@ -17,6 +17,25 @@ class BankOperationResponse(BaseModel):
     message: Optional[str] = Field(None, description="Сообщение об операции")
     data: Optional[Any] = Field(None, description="Данные, возвращенные банком")
     error: Optional[str] = Field(None, description="Сообщение об ошибке, если операция не удалась")
+    cache_status: Optional[str] = Field(None, description="Статус кэша ответов банка (HIT, STALE, MISS, BYPASS) для кэшируемых операций")
+
+class AccountOperationError(BaseModel):
+    """
+    Ошибка операции с конкретным счетом в мультисчетной операции.
+    """
+    bank_name: str = Field(..., description="Название банка")
+    account_id: str = Field(..., description="Идентификатор счета")
+    message: str = Field(..., description="Описание ошибки")
+    error: Optional[str] = Field(None, description="Код ошибки (HTTP-статус или тип ошибки)")
+
+class MultiAccountTransactionsResponse(BaseModel):
+    """
+    Транзакции всех запрошенных счетов, объединенные в один список от новых к старым.
+    Каждая транзакция дополнена полями `bank_name` и `account_id`.
+    Счета, по которым не удалось получить транзакции, перечислены в `errors`.
+    """
+    transactions: List[Dict[str, Any]] = Field(default_factory=list, description="Транзакции, отсортированные по дате (новые первыми)")
+    errors: List[AccountOperationError] = Field(default_factory=list, description="Ошибки по отдельным счетам")
 
 class MultiBankConsentRequest(BaseModel):
     """
@@ -28,3 +47,15 @@ class MultiBankConsentRequest(BaseModel):
     debtor_account: Optional[str] = Field(None, description="Идентификатор счета дебитора (для платежных согласий)")
     amount: Optional[str] = Field(None, description="Сумма платежа (для платежных согласий)")
     currency: Optional[str] = Field("RUB", description="Валюта платежа (для платежных согласий)")
+
+class AccountDataRequest(BaseModel):
+    """
+    Элемент пакетного запроса данных: операции чтения одного счета.
+    """
+    bank_name: str = Field(..., description="Название банка")
+    account_id: str = Field(..., description="Идентификатор счета")
+    operations: List[Literal["details", "balances", "transactions"]] = Field(
+        default_factory=lambda: ["balances", "transactions"],
+        min_length=1,
+        description="Операции чтения счета",
+    )
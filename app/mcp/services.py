@@ -1,47 +1,100 @@
-from typing import List, Optional, Any
-from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import List, Optional, Any, Dict
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends # Добавлен импорт Depends
 from app.db.database import get_db
 from app.utils.bank_clients import get_bank_client
-from app.mcp.schemas import BankOperationResponse
+from app.banks.response_cache import bank_response_cache
+from app.mcp.schemas import BankOperationResponse, AccountOperationError, MultiAccountTransactionsResponse, AccountDataRequest
+from app.mcp.concurrency import BankConcurrencyLimiter
+from app.mcp.transaction_store import TransactionStore
+from app.mcp.consent_registry import ConsentRegistry
 from app.core.config import settings
 from app.auth_manager.services import BaseAuthManager, get_auth_manager
 from app.auth_manager.exceptions import TokenFetchError
 import asyncio
 import httpx
 
+# Ограничитель одновременных запросов к банкам, общий для всех запросов к приложению
+bank_concurrency_limiter = BankConcurrencyLimiter(
+    max_total=settings.MCP_MAX_CONCURRENT_REQUESTS,
+    max_per_bank=settings.MCP_MAX_CONCURRENT_REQUESTS_PER_BANK,
+)
+
+
+def _transaction_date(transaction: Dict[str, Any]) -> datetime:
+    """
+    Возвращает дату транзакции для сортировки. Транзакции без даты оказываются в конце списка.
+    """
+    value = transaction.get("bookingDateTime") or transaction.get("valueDateTime") or transaction.get("date")
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
 class MCPService:
     """
     Сервис для координации мультибанковых операций.
     Абстрагирует взаимодействие с отдельными банками и предоставляет унифицированный интерфейс.
     """
-    def __init__(self, db: Session, auth_manager: BaseAuthManager):
+    def __init__(self, db: AsyncSession, auth_manager: BaseAuthManager):
         self.db = db
         self.auth_manager = auth_manager
 
-    async def _execute_bank_operation(self, bank_name: str, user_id: str, operation_func) -> BankOperationResponse:
+    async def _execute_bank_operation(
+        self,
+        bank_name: str,
+        user_id: str,
+        operation_func,
+        cache_operation: Optional[str] = None,
+        consent_id: Optional[str] = None,
+        cache_args: tuple = (),
+    ) -> BankOperationResponse:
         """
         Вспомогательный метод для выполнения операции с конкретным банком.
         Обрабатывает получение токена, вызов операции и обработку ошибок.
+        Вызов банка выполняется в слоте `bank_concurrency_limiter`.
+        Если указана `cache_operation`, ответ берется из `bank_response_cache` (см. `BankResponseCache`).
         """
         try:
             access_token = await self.auth_manager.get_access_token(self.db, bank_name)
             bank_client = get_bank_client(bank_name)
-            
-            result = await operation_func(bank_client, access_token)
+
+            async def call_bank():
+                async with bank_concurrency_limiter.slot(bank_name):
+                    return await operation_func(bank_client, access_token)
+
+            cache_status = None
+            if cache_operation is None:
+                result = await call_bank()
+            else:
+                result, cache_status = await bank_response_cache.get_or_fetch(
+                    bank_name, user_id, consent_id, cache_operation, cache_args, call_bank
+                )
             return BankOperationResponse(
                 bank_name=bank_name,
                 status="success",
-                data=result
+                data=result,
+                cache_status=cache_status
             )
-        except TokenFetchError as e:
+        except Exception as e:
+            return self._error_response(bank_name, e)
+
+    @staticmethod
+    def _error_response(bank_name: str, e: Exception) -> BankOperationResponse:
+        """
+        Преобразует исключение операции с банком в неуспешный `BankOperationResponse`.
+        """
+        if isinstance(e, TokenFetchError):
             return BankOperationResponse(
                 bank_name=bank_name,
                 status="failed",
                 message=f"Не удалось получить токен доступа для банка {bank_name}: {e.details}",
                 error="TOKEN_FETCH_ERROR"
             )
-        except httpx.HTTPStatusError as e:
+        if isinstance(e, httpx.HTTPStatusError):
             try:
                 error_detail = e.response.json()
             except ValueError:
@@ -52,55 +105,211 @@ class MCPService:
                 message=f"Ошибка HTTP от банка {bank_name}: {error_detail}",
                 error=str(e.response.status_code)
             )
+        return BankOperationResponse(
+            bank_name=bank_name,
+            status="failed",
+            message=f"Непредвиденная ошибка при работе с банком {bank_name}: {e}",
+            error=str(e)
+        )
+
+    async def _resolve_consent(self, bank_name: str, user_id: str, consent_id: Optional[str], kind: str = "accounts") -> str:
+        """
+        Возвращает переданный `consent_id` или действующее согласие клиента вида `kind` из реестра (см. `ConsentRegistry`).
+        """
+        if consent_id:
+            return consent_id
+        return await ConsentRegistry(self.db, self.auth_manager).get_consent_id(bank_name, user_id, kind)
+
+    async def _execute_with_consent(
+        self,
+        bank_name: str,
+        user_id: str,
+        consent_id: Optional[str],
+        operation_factory,
+        kind: str = "accounts",
+        **cache_options,
+    ) -> BankOperationResponse:
+        """
+        Выполняет операцию с банком, которой нужно согласие клиента.
+        `operation_factory` получает `consent_id` и возвращает функцию операции для `_execute_bank_operation`.
+
+        Если согласие не передано, согласие вида `kind` берется из реестра. Когда банк отклоняет согласие из реестра
+        (401/403, например, клиент отозвал его в банке), оно помечается отозванным,
+        и следующий запрос создаст новое.
+        """
+        try:
+            resolved_consent_id = await self._resolve_consent(bank_name, user_id, consent_id, kind)
         except Exception as e:
-            return BankOperationResponse(
-                bank_name=bank_name,
-                status="failed",
-                message=f"Непредвиденная ошибка при работе с банком {bank_name}: {e}",
-                error=str(e)
-            )
+            return self._error_response(bank_name, e)
+        response = await self._execute_bank_operation(
+            bank_name,
+            user_id,
+            operation_factory(resolved_consent_id),
+            consent_id=resolved_consent_id,
+            **cache_options
+        )
+        if not consent_id and response.error in ("401", "403"):
+            await ConsentRegistry(self.db, self.auth_manager).revoke(bank_name, resolved_consent_id)
+        return response
 
     async def get_all_accounts(self, bank_names: List[str], user_id: str, consent_id: Optional[str] = None) -> List[BankOperationResponse]:
         """
         Получает счета из указанных банков для заданного пользователя.
-        Требует `consent_id`, если он не будет получен автоматически в будущем.
-        """
-        tasks = []
-        for bank_name in bank_names:
-            # В будущем MCP должен будет сам находить или создавать consent_id.
-            # Пока что мы требуем его передачи.
-            if not consent_id:
-                # Создаем задачу, которая сразу вернет ошибку, если consent_id не предоставлен.
-                async def create_error_task():
-                    return BankOperationResponse(
-                        bank_name=bank_name,
-                        status="failed",
-                        message=f"Для получения счетов из банка {bank_name} требуется consent_id.",
-                        error="CONSENT_ID_REQUIRED"
-                    )
-                tasks.append(create_error_task())
-                continue
-
-            tasks.append(self._execute_bank_operation(
+        Если `consent_id` не передан, согласие каждого банка берется из реестра или создается.
+        """
+        return await asyncio.gather(*[
+            self._execute_with_consent(
                 bank_name,
                 user_id,
-                lambda client, token: client.accounts.get_accounts(token, consent_id, user_id)
-            ))
-        results = await asyncio.gather(*tasks)
+                consent_id,
+                lambda bank_consent_id: lambda client, token: client.accounts.get_accounts(token, bank_consent_id, user_id),
+                cache_operation="accounts"
+            )
+            for bank_name in bank_names
+        ])
+
+    async def get_account_balances(self, bank_name: str, user_id: str, consent_id: Optional[str], account_id: str) -> BankOperationResponse:
+        """
+        Получает балансы счета в указанном банке.
+        """
+        return await self._execute_with_consent(
+            bank_name,
+            user_id,
+            consent_id,
+            lambda bank_consent_id: lambda client, token: client.accounts.get_account_balances(token, bank_consent_id, user_id, account_id),
+            cache_operation="balances",
+            cache_args=(account_id,)
+        )
+
+    async def get_account_details(self, bank_name: str, user_id: str, consent_id: Optional[str], account_id: str) -> BankOperationResponse:
+        """
+        Получает детальную информацию о счете в указанном банке.
+        """
+        return await self._execute_with_consent(
+            bank_name,
+            user_id,
+            consent_id,
+            lambda bank_consent_id: lambda client, token: client.accounts.get_account_details(token, bank_consent_id, user_id, account_id),
+            cache_operation="account_details",
+            cache_args=(account_id,)
+        )
+
+    async def get_cards(self, bank_name: str, user_id: str, consent_id: Optional[str]) -> BankOperationResponse:
+        """
+        Получает карты пользователя в указанном банке.
+        """
+        return await self._execute_with_consent(
+            bank_name,
+            user_id,
+            consent_id,
+            lambda bank_consent_id: lambda client, token: client.get_cards(token, user_id, bank_consent_id),
+            cache_operation="cards"
+        )
+
+    async def get_product_agreements(self, bank_name: str, user_id: str, consent_id: Optional[str]) -> BankOperationResponse:
+        """
+        Получает договоры пользователя по продуктам в указанном банке.
+        """
+        return await self._execute_with_consent(
+            bank_name,
+            user_id,
+            consent_id,
+            lambda bank_consent_id: lambda client, token: client.products.get_product_agreements(token, bank_consent_id, user_id),
+            kind="product_agreements"
+        )
+
+    async def get_all_transactions(self, accounts: List[Any], user_id: str, consent_id: str | Dict[str, str] | None = None) -> MultiAccountTransactionsResponse:
+        """
+        Агрегирует транзакции со всех счетов всех банков.
+
+        - `accounts`: Счета в виде словарей или объектов с полями `bank_name` и `account_id`
+          (например, `app.schemas.account.Account`).
+        - `consent_id`: Согласие на чтение транзакций, общее или по банкам (`{bank_name: consent_id}`).
+          Для банков без согласия оно берется из реестра.
+
+        Запросы по счетам выполняются параллельно, но не более `MCP_MAX_CONCURRENT_REQUESTS`
+        одновременно и не более `MCP_MAX_CONCURRENT_REQUESTS_PER_BANK` к одному банку.
+        Ошибка по одному счету не прерывает остальные и возвращается в `errors`.
+        """
+        account_refs = [self._account_ref(account) for account in accounts]
+        results = await asyncio.gather(
+            *[
+                self.get_transactions_for_account(
+                    bank_name,
+                    user_id,
+                    consent_id.get(bank_name) if isinstance(consent_id, dict) else consent_id,
+                    account_id,
+                )
+                for bank_name, account_id in account_refs
+            ],
+            return_exceptions=True,
+        )
+
+        transactions: List[Dict[str, Any]] = []
+        errors: List[AccountOperationError] = []
+        for (bank_name, account_id), result in zip(account_refs, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                failed = self._error_response(bank_name, result)
+                errors.append(AccountOperationError(bank_name=bank_name, account_id=account_id, message=failed.message, error=failed.error))
+                continue
+            transactions.extend({**transaction, "bank_name": bank_name, "account_id": account_id} for transaction in result)
+
+        transactions.sort(key=_transaction_date, reverse=True)
+        return MultiAccountTransactionsResponse(transactions=transactions, errors=errors)
+
+    async def get_accounts_data(
+        self,
+        requests: List[AccountDataRequest],
+        user_id: str,
+        consents: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Dict[str, BankOperationResponse]]:
+        """
+        Выполняет операции чтения по многим счетам за один вызов (пакетный запрос UI).
+
+        - `requests`: Счета и операции над ними (`details`, `balances`, `transactions`).
+        - `consents`: Согласия по банкам (`{bank_name: consent_id}`); для остальных банков согласие берется из реестра.
+
+        Все операции выполняются параллельно в пределах лимитов `bank_concurrency_limiter`,
+        с общими токенами, клиентами банков и кэшем ответов. Повторяющиеся счета и операции выполняются один раз.
+        Возвращает результаты по ключу `"{bank_name}:{account_id}"`, затем по операции;
+        ошибка одной операции не влияет на остальные.
+        """
+        consents = consents or {}
+        planned: Dict[tuple[str, str, str], Any] = {}
+        for request in requests:
+            bank_name = request.bank_name.lower()
+            for operation in request.operations:
+                planned.setdefault((bank_name, request.account_id, operation), None)
+
+        async def run(bank_name: str, account_id: str, operation: str) -> BankOperationResponse:
+            consent_id = consents.get(bank_name)
+            if operation == "details":
+                return await self.get_account_details(bank_name, user_id, consent_id, account_id)
+            if operation == "balances":
+                return await self.get_account_balances(bank_name, user_id, consent_id, account_id)
+            try:
+                transactions = await self.get_transactions_for_account(bank_name, user_id, consent_id, account_id)
+            except Exception as e:
+                return self._error_response(bank_name, e)
+            return BankOperationResponse(bank_name=bank_name, status="success", data=transactions)
+
+        responses = await asyncio.gather(*[run(*key) for key in planned])
+
+        results: Dict[str, Dict[str, BankOperationResponse]] = {}
+        for (bank_name, account_id, operation), response in zip(planned, responses):
+            results.setdefault(f"{bank_name}:{account_id}", {})[operation] = response
         return results
 
-    async def get_all_transactions(self, accounts: List[Any], user_id: str, consent_id: str) -> List[Any]:
+    @staticmethod
+    def _account_ref(account: Any) -> tuple[str, str]:
         """
-        Агрегирует транзакции со всех счетов.
-        В будущем будет делать параллельные запросы к банкам.
-        Пока что является заглушкой.
+        Извлекает пару (bank_name, account_id) из словаря или объекта счета.
         """
-        all_transactions = []
-        for account in accounts:
-            # Здесь будет логика вызова self.get_transactions_for_account
-            # all_transactions.extend(await self.get_transactions_for_account(...))
-            pass
-        return all_transactions
+        if isinstance(account, dict):
+            return account["bank_name"], str(account.get("account_id") or account.get("accountId"))
+        return account.bank_name, str(account.account_id)
 
     async def get_all_loans(self, bank_names: List[str], user_id: str, consent_id: str) -> List[Any]:
         """
@@ -114,42 +323,39 @@ class MCPService:
         """
         return []
 
-    async def get_transactions_for_account(self, bank_name: str, user_id: str, consent_id: str, account_id: str) -> List[Any]:
+    async def get_transactions_for_account(self, bank_name: str, user_id: str, consent_id: Optional[str], account_id: str) -> List[Any]:
         """
-        Заглушка для получения транзакций для конкретного счета.
-        В реальной реализации будет вызывать соответствующий метод клиента банка.
+        Получает транзакции конкретного счета из локального хранилища,
+        предварительно запросив у банка новые транзакции (см. `TransactionStore`).
+        В отличие от `_execute_bank_operation`, ошибки не преобразуются в ответ, а пробрасываются,
+        чтобы вызывающий код мог сопоставить их со счетом.
         """
-        # Здесь должна быть реальная логика вызова клиента банка
-        # Например:
-        # access_token = await self.auth_manager.get_access_token(self.db, bank_name)
-        # bank_client = get_bank_client(bank_name)
-        # transactions = await bank_client.data.get_transactions(access_token, consent_id, user_id, account_id)
-        # return transactions
-        
-        # Для целей тестирования и пока нет реальной реализации
-        # возвращаем пустой список или моковые данные
-        return []
+        consent_id = await self._resolve_consent(bank_name, user_id, consent_id)
+        store = TransactionStore(self.db, self.auth_manager, limiter=bank_concurrency_limiter)
+        return await store.get_account_transactions(bank_name, user_id, consent_id, account_id)
 
     async def create_bank_consent(self, bank_name: str, permissions: List[str], user_id: str, debtor_account: Optional[str] = None, amount: Optional[str] = None, currency: str = "RUB") -> BankOperationResponse:
         """
         Создает согласие для указанного банка.
+        Согласие на доступ к данным добавляется в реестр и переиспользуется следующими запросами MCP.
         """
-        return await self._execute_bank_operation(
+        is_payment = "CreateDomesticSinglePayment" in permissions and debtor_account and amount
+        response = await self._execute_bank_operation(
             bank_name,
             user_id,
             lambda client, token: client.create_payment_consent(token, permissions, user_id, settings.CLIENT_ID, debtor_account, amount, currency) 
-                if "CreateDomesticSinglePayment" in permissions and debtor_account and amount 
+                if is_payment
                 else client.create_consent(token, permissions, user_id)
         )
+        if response.status == "success" and not is_payment:
+            await ConsentRegistry(self.db, self.auth_manager).register_safely(bank_name, user_id, response.data, permissions)
+        return response
 
 def get_mcp_service(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth_manager: BaseAuthManager = Depends(get_auth_manager)
 ) -> MCPService:
     """
     Зависимость для предоставления экземпляра MCPService.
     """
     return MCPService(db=db, auth_manager=auth_manager)
-
-def _raise_consent_error(bank_name: str):
-    raise ValueError(f"Для получения счетов из банка {bank_name} требуется consent_id. MCP должен управлять согласиями.")
\ No newline at end of file
@@ -0,0 +1,290 @@
+"""
+Локальное хранилище транзакций счетов с инкрементальной синхронизацией.
+
+Банки возвращают историю транзакций счета целиком, и это самый тяжелый запрос к их API.
+Хранилище запоминает для каждого счета (банк, пользователь, счет) курсор — последнюю полученную
+транзакцию — и при следующей синхронизации запрашивает у банка только транзакции после курсора.
+Полученная дельта сохраняется в БД одним bulk upsert, а чтение выполняется из локальной таблицы,
+целиком или постранично с фильтрами (`get_account_transactions_page`).
+"""
+import base64
+import binascii
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.analytics.categorizer import Categorizer, categorizer as default_categorizer
+from app.auth_manager.services import BaseAuthManager
+from app.core.config import settings
+from app.db import crud
+from app.db.database import session_lock
+from app.mcp.concurrency import BankConcurrencyLimiter
+from app.ui_connector import mappers
+from app.utils.bank_clients import get_bank_client
+
+# Счетчики синхронизаций для диагностики
+_sync_stats: Dict[str, float] = {
+    "syncs": 0, # Число синхронизаций с обращением к банку
+    "initial_syncs": 0, # Из них первых синхронизаций счета (полная история)
+    "skipped_syncs": 0, # Чтения, обслуженные из БД без обращения к банку
+    "fetched_transactions": 0, # Число транзакций, полученных от банков
+    "upserted_transactions": 0, # Число транзакций, записанных в БД
+    "last_sync_latency_ms": 0.0, # Длительность последней синхронизации
+}
+
+
+def get_transaction_sync_stats() -> Dict[str, float]:
+    """
+    Возвращает счетчики синхронизаций транзакций.
+    """
+    return dict(_sync_stats)
+
+
+def _parse_booking_date(raw: Dict[str, Any]) -> datetime | None:
+    """
+    Извлекает дату проведения транзакции в UTC или `None`, если банк ее не прислал.
+    """
+    value = raw.get("bookingDateTime") or raw.get("valueDateTime") or raw.get("date")
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    # Даты без смещения считаются UTC. Даты со смещением переводятся в UTC: SQLite хранит время без смещения
+    return parsed.astimezone(timezone.utc) if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _signed_amount(raw: Dict[str, Any]) -> tuple[float | None, str | None]:
+    """
+    Возвращает сумму транзакции со знаком и ее валюту.
+    """
+    amount = raw.get("amount")
+    currency = raw.get("currency")
+    if isinstance(amount, dict):
+        currency = amount.get("currency", currency)
+        amount = amount.get("amount")
+    try:
+        value = float(amount)
+    except (TypeError, ValueError):
+        return None, currency
+    indicator = str(raw.get("creditDebitIndicator", "")).lower()
+    if indicator == "debit":
+        value = -abs(value)
+    elif indicator == "credit":
+        value = abs(value)
+    return value, currency
+
+
+def _search_text(raw: Dict[str, Any]) -> str | None:
+    """
+    Собирает описание, контрагента и категорию транзакции в строку для поиска по тексту.
+    Приводится к нижнему регистру здесь, а не в SQL: `lower()` в SQLite не работает с кириллицей.
+    """
+    merchant = raw.get("merchantName") or (raw.get("merchantDetails") or {}).get("merchantName")
+    parts = [raw.get("transactionInformation"), merchant, raw.get("description"), raw.get("category")]
+    text = " ".join(str(part) for part in parts if part)
+    return text.lower() or None
+
+
+def encode_page_cursor(booking_date: datetime | None, transaction_id: str) -> str:
+    """
+    Кодирует ключ последней транзакции страницы в непрозрачный курсор для следующего запроса.
+    """
+    key = [booking_date.isoformat() if booking_date else None, transaction_id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_page_cursor(cursor: str) -> tuple[datetime | None, str]:
+    """
+    Декодирует курсор страницы. Вызывает `ValueError`, если курсор поврежден.
+    """
+    try:
+        booking_date, transaction_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return (crud.as_utc(datetime.fromisoformat(booking_date)) if booking_date else None), str(transaction_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Некорректный курсор страницы: {cursor}") from e
+
+
+def _transaction_id(raw: Dict[str, Any]) -> str:
+    """
+    Возвращает идентификатор транзакции. Для транзакций без идентификатора
+    используется хэш содержимого, чтобы повторная синхронизация не создавала дубликаты.
+    """
+    transaction_id = raw.get("transactionId") or raw.get("id")
+    if transaction_id:
+        return str(transaction_id)
+    return hashlib.sha256(json.dumps(raw, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class TransactionStore:
+    """
+    Синхронизирует транзакции счетов с банками и отдает их из локальной БД.
+
+    Категория транзакции определяется при синхронизации (`Categorizer`: правило пользователя,
+    категория банка, встроенные правила) и сохраняется в БД, поэтому фильтр по категории
+    совпадает с категориями, которые видит пользователь.
+    """
+    def __init__(
+        self,
+        db: AsyncSession,
+        auth_manager: BaseAuthManager,
+        limiter: BankConcurrencyLimiter | None = None,
+        categorizer: Categorizer | None = None,
+    ):
+        self.db = db
+        self.auth_manager = auth_manager
+        self.limiter = limiter
+        self.categorizer = categorizer or default_categorizer
+
+    async def get_account_transactions(self, bank_name: str, user_id: str, consent_id: str, account_id: str) -> List[Dict[str, Any]]:
+        """
+        Возвращает транзакции счета в формате ответа банка, от новых к старым.
+        Перед чтением выполняется синхронизация, если последняя была раньше `TRANSACTION_SYNC_MIN_INTERVAL` секунд назад.
+        """
+        await self.sync_account(bank_name, user_id, consent_id, account_id)
+        async with session_lock(self.db):
+            transactions = await crud.get_transactions(self.db, bank_name, user_id, account_id)
+        return [transaction.payload for transaction in transactions]
+
+    async def get_account_transactions_page(
+        self,
+        bank_name: str,
+        user_id: str,
+        consent_id: str,
+        account_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        **filters: Any,
+    ) -> tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Возвращает страницу транзакций счета в формате ответа банка и курсор следующей страницы
+        (`None`, если страница последняя).
+
+        - `cursor`: Курсор из предыдущего ответа; без него возвращается первая страница.
+        - `filters`: Фильтры `crud.get_transactions_page` (`date_from`, `date_to`, `amount_min`, `amount_max`, `category`, `text`).
+
+        Синхронизация с банком выполняется только при запросе первой страницы: следующие страницы
+        читаются из того же состояния БД, что и первая.
+        """
+        after = decode_page_cursor(cursor) if cursor else None
+        if after is None:
+            await self.sync_account(bank_name, user_id, consent_id, account_id)
+        async with session_lock(self.db):
+            # Лишняя строка показывает, есть ли следующая страница
+            transactions = await crud.get_transactions_page(self.db, bank_name, user_id, account_id, limit + 1, after=after, **filters)
+        next_cursor = None
+        if len(transactions) > limit:
+            transactions = transactions[:limit]
+            last = transactions[-1]
+            next_cursor = encode_page_cursor(crud.as_utc(last.booking_date) if last.booking_date else None, last.transaction_id)
+        return [transaction.payload for transaction in transactions], next_cursor
+
+    async def sync_account(self, bank_name: str, user_id: str, consent_id: str, account_id: str, force: bool = False) -> int:
+        """
+        Запрашивает у банка транзакции счета после курсора и сохраняет их в БД.
+
+        Первая синхронизация загружает всю историю. Последующие запрашивают транзакции,
+        начиная с даты курсора минус `TRANSACTION_SYNC_OVERLAP` секунд: банки могут провести операцию
+        задним числом, а повторно полученные транзакции просто обновляются.
+        Возвращает число записанных транзакций (0, если синхронизация не потребовалась).
+        """
+        now = datetime.now(timezone.utc)
+        async with session_lock(self.db):
+            cursor = await crud.get_sync_cursor(self.db, bank_name, user_id, account_id)
+            last_booking_date = crud.as_utc(cursor.last_booking_date) if cursor and cursor.last_booking_date else None
+            last_transaction_id = cursor.last_transaction_id if cursor else None
+            last_synced_at = crud.as_utc(cursor.synced_at) if cursor else None
+
+        if not force and last_synced_at is not None and (now - last_synced_at).total_seconds() < settings.TRANSACTION_SYNC_MIN_INTERVAL:
+            _sync_stats["skipped_syncs"] += 1
+            return 0
+
+        from_booking_date = last_booking_date - timedelta(seconds=settings.TRANSACTION_SYNC_OVERLAP) if last_booking_date else None
+        started_at = time.perf_counter()
+        raw_transactions = await self._fetch(bank_name, user_id, consent_id, account_id, from_booking_date)
+
+        received = []
+        for raw in raw_transactions:
+            booking_date = _parse_booking_date(raw)
+            # Банк мог проигнорировать фильтр по дате: старые транзакции уже есть в БД
+            if from_booking_date is not None and booking_date is not None and booking_date < from_booking_date:
+                continue
+            received.append((raw, booking_date))
+        categories = self._categorize(user_id, [raw for raw, _ in received])
+
+        rows = []
+        for (raw, booking_date), category in zip(received, categories):
+            amount, currency = _signed_amount(raw)
+            rows.append({
+                "bank_name": bank_name,
+                "user_id": user_id,
+                "account_id": account_id,
+                "transaction_id": _transaction_id(raw),
+                "booking_date": booking_date,
+                "amount": amount,
+                "currency": currency,
+                "category": category,
+                "search_text": _search_text(raw),
+                "payload": raw,
+                "synced_at": now,
+            })
+
+        for row in rows:
+            if row["booking_date"] is None:
+                continue
+            if last_booking_date is None or (row["booking_date"], row["transaction_id"]) > (last_booking_date, last_transaction_id or ""):
+                last_booking_date, last_transaction_id = row["booking_date"], row["transaction_id"]
+
+        async with session_lock(self.db):
+            upserted = await crud.upsert_transactions(self.db, rows)
+            await crud.save_sync_cursor(self.db, bank_name, user_id, account_id, last_booking_date, last_transaction_id, now)
+
+        _sync_stats["syncs"] += 1
+        if cursor is None:
+            _sync_stats["initial_syncs"] += 1
+        _sync_stats["fetched_transactions"] += len(raw_transactions)
+        _sync_stats["upserted_transactions"] += upserted
+        _sync_stats["last_sync_latency_ms"] = (time.perf_counter() - started_at) * 1000
+        return upserted
+
+    async def recategorize(self, user_id: str) -> int:
+        """
+        Пересчитывает категории сохраненных транзакций пользователя (например, после изменения его правил
+        категорий). Возвращает число транзакций, категория которых изменилась.
+        """
+        async with session_lock(self.db):
+            transactions = await crud.get_user_transactions(self.db, user_id)
+        categories = self._categorize(user_id, [transaction.payload for transaction in transactions])
+        changed = {
+            transaction.id: category
+            for transaction, category in zip(transactions, categories)
+            if transaction.category != category
+        }
+        async with session_lock(self.db):
+            return await crud.update_transaction_categories(self.db, changed)
+
+    def _categorize(self, user_id: str, raw_transactions: List[Dict[str, Any]]) -> List[str]:
+        """
+        Определяет категории транзакций в формате банка так же, как раздел транзакций UI.
+        """
+        if not raw_transactions:
+            return []
+        return list(self.categorizer.categorize_many(
+            [mappers.transaction_description(raw) for raw in raw_transactions],
+            user_id,
+            [raw.get("category") for raw in raw_transactions],
+        ))
+
+    async def _fetch(self, bank_name: str, user_id: str, consent_id: str, account_id: str, from_booking_date: datetime | None) -> List[Dict[str, Any]]:
+        """
+        Запрашивает транзакции счета у банка, при наличии ограничителя — в его слоте.
+        """
+        access_token = await self.auth_manager.get_access_token(self.db, bank_name)
+        bank_client = get_bank_client(bank_name)
+        if self.limiter is None:
+            return await bank_client.accounts.get_account_transactions(access_token, consent_id, user_id, account_id, from_booking_date=from_booking_date)
+        async with self.limiter.slot(bank_name):
+            return await bank_client.accounts.get_account_transactions(access_token, consent_id, user_id, account_id, from_booking_date=from_booking_date)
@@ -0,0 +1,183 @@
+"""
+Преобразование ответов API банков (формат Open Banking) в схемы UI.
+
+Банки возвращают суммы строками во вложенных объектах (`{"amount": "100.00", "currency": "RUB"}`),
+а направление операции — отдельным полем `creditDebitIndicator`. UI ожидает плоские
+объекты из `ui/types.ts` со знаковыми суммами.
+"""
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from app.schemas.product import ProductAgreement
+from . import schemas
+
+# Отображаемое название и цвет бренда каждого банка
+BANK_BRANDS: Dict[str, tuple[str, str]] = {
+    "vbank": ("VBank", "#0033A0"),
+    "abank": ("ABank", "#EF3124"),
+    "sbank": ("SBank", "#228B22"),
+}
+
+# Порядок предпочтения типов балансов: доступный остаток важнее учтенного
+_BALANCE_TYPES_PRIORITY = ["interimavailable", "closingavailable", "expected", "interimbooked", "closingbooked"]
+
+
+def bank_display_name(bank_name: str) -> str:
+    return BANK_BRANDS.get(bank_name, (bank_name, ""))[0]
+
+
+def bank_brand_color(bank_name: str) -> str:
+    return BANK_BRANDS.get(bank_name, ("", "#6b7280"))[1]
+
+
+def parse_amount(value: Any) -> float:
+    """
+    Извлекает число из суммы банка: `{"amount": "1000.00"}`, строки или числа.
+    """
+    if isinstance(value, dict):
+        value = value.get("amount", value.get("Amount", 0))
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def signed_amount(raw: Dict[str, Any]) -> float:
+    """
+    Возвращает сумму со знаком: поступления положительные, списания отрицательные.
+    """
+    amount = parse_amount(raw.get("amount"))
+    indicator = str(raw.get("creditDebitIndicator", "")).lower()
+    if indicator == "debit":
+        return -abs(amount)
+    if indicator == "credit":
+        return abs(amount)
+    return amount
+
+
+def merchant_name(raw: Dict[str, Any]) -> Optional[str]:
+    """
+    Возвращает название контрагента транзакции, если банк его прислал.
+    """
+    return raw.get("merchantName") or (raw.get("merchantDetails") or {}).get("merchantName")
+
+
+def transaction_description(raw: Dict[str, Any]) -> str:
+    """
+    Возвращает описание транзакции для отображения.
+    """
+    return raw.get("transactionInformation") or merchant_name(raw) or raw.get("description") or "Операция"
+
+
+def transaction_date(raw: Dict[str, Any]) -> str:
+    """
+    Возвращает дату транзакции в формате банка (ISO 8601) или пустую строку.
+    """
+    return str(raw.get("bookingDateTime") or raw.get("valueDateTime") or raw.get("date") or "")
+
+
+def pick_balance(balances: List[Dict[str, Any]]) -> Optional[float]:
+    """
+    Выбирает из списка балансов счета наиболее подходящий для отображения.
+    """
+    if not balances:
+        return None
+    by_type = {str(balance.get("type", "")).lower(): balance for balance in balances}
+    for balance_type in _BALANCE_TYPES_PRIORITY:
+        if balance_type in by_type:
+            return signed_amount(by_type[balance_type])
+    return signed_amount(balances[0])
+
+
+def _account_type(raw: Dict[str, Any]) -> str:
+    kind = f"{raw.get('accountSubType', '')} {raw.get('accountType', '')}".lower()
+    if "saving" in kind or "deposit" in kind:
+        return "savings"
+    if "credit" in kind or "loan" in kind:
+        return "credit"
+    return "debit"
+
+
+def _last4(value: Any) -> str:
+    digits = "".join(ch for ch in str(value or "") if ch.isalnum())
+    return digits[-4:] if digits else "0000"
+
+
+def map_account(bank_name: str, raw: Dict[str, Any], balances: List[Dict[str, Any]]) -> schemas.Account:
+    """
+    Преобразует счет банка и его балансы в `Account` для UI.
+    """
+    account_id = str(raw.get("accountId") or raw.get("id"))
+    identifications = raw.get("account") or []
+    identification = identifications[0] if isinstance(identifications, list) and identifications else {}
+    name = raw.get("nickname") or identification.get("name") or raw.get("accountSubType") or "Счет"
+    balance = pick_balance(balances)
+    return schemas.Account(
+        id=account_id,
+        name=name,
+        bankName=bank_display_name(bank_name),
+        last4=_last4(identification.get("identification") or account_id),
+        balance=balance if balance is not None else 0.0,
+        type=_account_type(raw),
+        brandColor=bank_brand_color(bank_name),
+    )
+
+
+def transaction_id(raw: Dict[str, Any]) -> str:
+    """
+    Возвращает идентификатор транзакции банка. Для транзакций без идентификатора используется
+    хэш содержимого (как в `app.mcp.transaction_store`), а не строка "None", общая для всех таких транзакций.
+    """
+    value = raw.get("transactionId") or raw.get("id")
+    if value:
+        return str(value)
+    return hashlib.sha256(json.dumps(raw, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def map_transaction(bank_name: str, account_id: str, raw: Dict[str, Any], category: Optional[str] = None) -> schemas.Transaction:
+    """
+    Преобразует транзакцию банка в `Transaction` для UI.
+    - `category`: Категория, определенная приложением (см. `app.analytics.categorizer`). Если не указана,
+      берется категория банка или значение по умолчанию.
+    """
+    amount = signed_amount(raw)
+    return schemas.Transaction(
+        id=transaction_id(raw),
+        date=transaction_date(raw),
+        description=transaction_description(raw),
+        amount=amount,
+        type="income" if amount > 0 else "expense",
+        category=category or raw.get("category") or "Прочее",
+        accountId=account_id,
+        bankName=bank_display_name(bank_name),
+    )
+
+
+def map_card(bank_name: str, raw: Dict[str, Any]) -> schemas.Card:
+    """
+    Преобразует карту банка в `Card` для UI.
+    """
+    return schemas.Card(
+        id=str(raw.get("cardId") or raw.get("id")),
+        accountId=raw.get("accountId"),
+        bankName=bank_display_name(bank_name),
+        last4=_last4(raw.get("panMasked") or raw.get("maskedPan") or raw.get("cardNumber")),
+        status=str(raw.get("status") or "unknown"),
+        type=str(raw.get("cardType") or raw.get("type") or "debit").lower(),
+    )
+
+
+def map_agreement(bank_name: str, agreement: ProductAgreement | Dict[str, Any]) -> schemas.ProductAgreementSummary:
+    """
+    Преобразует договор по продукту банка в `ProductAgreementSummary` для UI.
+    """
+    if isinstance(agreement, ProductAgreement):
+        agreement = agreement.model_dump(by_alias=True)
+    return schemas.ProductAgreementSummary(
+        id=str(agreement.get("agreementId")),
+        productId=str(agreement.get("productId")),
+        bankName=bank_display_name(bank_name),
+        status=str(agreement.get("status")),
+        openDate=str(agreement.get("openDate")),
+    )
@@ -7,7 +7,7 @@ TypeScript из `ui/types.ts`, чтобы обеспечить полную со
 между бэкендом и фронтендом.
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Literal
+from typing import Any, List, Optional, Dict, Literal
 
 # --- Базовые модели, соответствующие ui/types.ts ---
 
@@ -27,6 +27,8 @@ class Transaction(BaseModel):
     amount: float
     type: Literal['income', 'expense']
     category: str
+    account_id: Optional[str] = Field(None, alias="accountId")
+    bank_name: Optional[str] = Field(None, alias="bankName")
 
 class FinancialGoal(BaseModel):
     id: str
@@ -68,7 +70,7 @@ class Subscription(BaseModel):
     id: str
     name: str
     amount: float
-    billing_cycle: Literal['monthly', 'yearly'] = Field(..., alias="billingCycle")
+    billing_cycle: Literal['weekly', 'monthly', 'yearly'] = Field(..., alias="billingCycle")
     next_payment_date: str = Field(..., alias="nextPaymentDate")
     linked_account_id: str = Field(..., alias="linkedAccountId")
     status: Literal['active', 'blocked']
@@ -166,6 +168,34 @@ class FinancialHealth(BaseModel):
     rewards: List[Reward]
 
 
+class Card(BaseModel):
+    id: str
+    account_id: Optional[str] = Field(None, alias="accountId")
+    bank_name: str = Field(..., alias="bankName")
+    last4: str
+    status: str
+    type: str
+
+class ProductAgreementSummary(BaseModel):
+    id: str
+    product_id: str = Field(..., alias="productId")
+    bank_name: str = Field(..., alias="bankName")
+    status: str
+    open_date: str = Field(..., alias="openDate")
+
+class DataSourceStatus(BaseModel):
+    """
+    Состояние одного раздела данных одного банка в агрегированном ответе.
+    Позволяет UI показать, какие данные свежие, а какие не удалось получить.
+    """
+    bank_name: str = Field(..., alias="bankName")
+    section: Literal['accounts', 'balances', 'transactions', 'cards', 'agreements']
+    status: Literal['ok', 'partial', 'error', 'timeout', 'skipped']
+    fetched_at: Optional[str] = Field(None, alias="fetchedAt") # Момент получения данных (ISO 8601)
+    latency_ms: Optional[float] = Field(None, alias="latencyMs")
+    error: Optional[str] = None
+
+
 # --- Главная агрегирующая модель ---
 
 class FinancialData(BaseModel):
@@ -189,4 +219,25 @@ class FinancialData(BaseModel):
     recommended_card_offers: List[RecommendedCardOffer] = Field(..., alias="recommendedCardOffers")
     trust_issues: List[TrustIssue] = Field(..., alias="trustIssues")
     budget_plan: BudgetPlan = Field(..., alias="budgetPlan")
-    financial_health: FinancialHealth = Field(..., alias="financialHealth")
\ No newline at end of file
+    financial_health: FinancialHealth = Field(..., alias="financialHealth")
+    cards: List[Card] = []
+    product_agreements: List[ProductAgreementSummary] = Field([], alias="productAgreements")
+    # Свежесть и ошибки данных по каждому банку и разделу
+    sources: List[DataSourceStatus] = []
+    is_partial: bool = Field(False, alias="isPartial") # True, если часть данных банков не получена
+
+
+class AggregatorStreamEvent(BaseModel):
+    """
+    Событие потокового ответа агрегатора (`POST /api/v1/aggregator/stream`).
+
+    - `section`: данные одного раздела одного банка, отправляются сразу после ответа банка.
+      `data` содержит `Account[]` (с балансами), `Transaction[]`, `Card[]` или `ProductAgreementSummary[]`,
+      `sources` — состояние разделов, из которых собраны данные (для счетов это `accounts` и `balances`).
+    - `complete`: последнее событие, `data` содержит итоговый `FinancialData`, как в ответе `/aggregator/all`.
+    """
+    event: Literal['section', 'complete']
+    bank_name: Optional[str] = Field(None, alias="bankName")
+    section: Optional[Literal['accounts', 'transactions', 'cards', 'agreements']] = None
+    sources: List[DataSourceStatus] = []
+    data: Optional[Any] = None
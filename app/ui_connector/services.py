@@ -6,16 +6,81 @@
 агрегирует их ответы, выполняет необходимую бизнес-логику и
 возвращает данные в формате, удобном для UI.
 
-В текущей реализации сервис использует моковые данные для имитации
-полноценного ответа, что позволяет фронтенду разрабатываться и тестироваться
-независимо от полной реализации всех внутренних сервисов.
+Счета, балансы, транзакции, карты и договоры собираются из банков через `MCPService`
+параллельно: банки опрашиваются одновременно, а у каждого раздела и каждого банка
+есть свой таймаут. Поэтому общее время ответа ограничено самым медленным банком,
+которого мы готовы ждать, а не суммой времени всех банков. Разделы, которые не удалось
+получить, отмечаются в `FinancialData.sources`, а ответ помечается как частичный.
+
+Потоковый вариант (`stream_aggregated_financial_data`) отдает каждый раздел банка,
+как только он получен, поэтому первый байт ответа не зависит от самого медленного банка.
+
+Бюджет (`budgetPlan`), оценка финансового здоровья (`financialHealth`), подписки (`subscriptions`)
+и рекомендуемые карты (`recommendedCardOffers`) рассчитываются по полученным транзакциям (`app.analytics`),
+а ставки кэшбэка (`cashbackCategories`) — по картам и счетам пользователя. Категория транзакции, которую банк не прислал,
+определяется по описанию (`app.analytics.categorizer`).
+Разделы, для которых еще нет источника данных (цели, предложения и т.д.),
+пока заполняются демонстрационными данными (`_demo_sections`).
 """
-from fastapi import Depends
-from typing import Any
+import asyncio
+import time
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import Depends
 
+from app.analytics.budget import budget_engine
+from app.analytics.cashback import cashback_optimizer
+from app.analytics.categorizer import categorizer
+from app.analytics.health import health_engine
+from app.analytics.subscriptions import subscription_detector
+from app.core.config import settings
 from app.mcp.services import MCPService, get_mcp_service
-from . import schemas
+from . import mappers, schemas
+
+# Разделы данных, которые запрашиваются у каждого банка
+BANK_SECTIONS = ("accounts", "balances", "transactions", "cards", "agreements")
+
+# Функция публикации готового раздела банка (см. `UIService.stream_aggregated_financial_data`)
+SectionPublisher = Callable[[schemas.AggregatorStreamEvent], None]
+
+
+@dataclass
+class _BankSnapshot:
+    """
+    Данные одного банка, собранные за один запрос агрегатора.
+    """
+    bank_name: str
+    accounts: List[schemas.Account] = field(default_factory=list)
+    transactions: List[schemas.Transaction] = field(default_factory=list)
+    cards: List[schemas.Card] = field(default_factory=list)
+    agreements: List[schemas.ProductAgreementSummary] = field(default_factory=list)
+    sources: List[schemas.DataSourceStatus] = field(default_factory=list)
+
+    def section_event(self, section: str, data: List[Any], *source_sections: str) -> schemas.AggregatorStreamEvent:
+        """
+        Формирует событие потокового ответа с данными раздела и состоянием разделов `source_sections`.
+        """
+        source_sections = source_sections or (section,)
+        return schemas.AggregatorStreamEvent(
+            event="section",
+            bankName=self.bank_name,
+            section=section,
+            sources=[source for source in self.sources if source.section in source_sections],
+            data=data,
+        )
+
+    def mark(self, section: str, status: str, error: Optional[str] = None, latency_ms: Optional[float] = None):
+        self.sources.append(schemas.DataSourceStatus(
+            bankName=self.bank_name,
+            section=section,
+            status=status,
+            fetchedAt=datetime.now(timezone.utc).isoformat() if status in ("ok", "partial") else None,
+            latencyMs=round(latency_ms, 1) if latency_ms is not None else None,
+            error=error,
+        ))
+
 
 class UIService:
     def __init__(
@@ -23,120 +88,337 @@ class UIService:
         mcp_service: MCPService = Depends(get_mcp_service),
     ):
         self.mcp_service = mcp_service
+        self.categorizer = categorizer
+        self.budget_engine = budget_engine
+        self.health_engine = health_engine
+        self.subscription_detector = subscription_detector
+        self.cashback_optimizer = cashback_optimizer
+        self.bank_timeout = settings.AGGREGATOR_BANK_TIMEOUT
+        self.section_timeout = settings.AGGREGATOR_SECTION_TIMEOUT
 
-    async def get_aggregated_financial_data(self) -> schemas.FinancialData:
+    async def get_aggregated_financial_data(
+        self,
+        user_id: str,
+        consents: Dict[str, str],
+        bank_names: Optional[List[str]] = None,
+    ) -> schemas.FinancialData:
         """
         Собирает, агрегирует и форматирует все данные для UI.
 
-        ВНИМАНИЕ: В данный момент метод возвращает статичные моковые данные,
-        аналогичные тем, что используются в `ui/services/financialService.ts`.
-        Это сделано для ускорения разработки и тестирования UI.
-        В будущем здесь будет реализована логика сбора реальных данных
-        через `MCPService`.
+        - `user_id`: Идентификатор пользователя в банках.
+        - `consents`: Согласия на доступ к данным `{bank_name: consent_id}`.
+          Для банков без согласия оно берется из реестра согласий или создается.
+        - `bank_names`: Банки для опроса (по умолчанию `AGGREGATOR_BANKS`).
+        """
+        bank_names = bank_names or settings.AGGREGATOR_BANKS
+        snapshots = await asyncio.gather(
+            *[self._collect_bank(bank_name, user_id, consents.get(bank_name)) for bank_name in bank_names]
+        )
+        return self._build_financial_data(user_id, snapshots)
+
+    async def stream_aggregated_financial_data(
+        self,
+        user_id: str,
+        consents: Dict[str, str],
+        bank_names: Optional[List[str]] = None,
+    ) -> AsyncIterator[schemas.AggregatorStreamEvent]:
+        """
+        Потоковый вариант `get_aggregated_financial_data`.
+
+        Отдает событие `section` для каждого раздела каждого банка в порядке готовности
+        и последним — событие `complete` с итоговым `FinancialData`.
+        Если клиент прервал чтение потока, опрос банков отменяется.
+        """
+        bank_names = bank_names or settings.AGGREGATOR_BANKS
+        events: asyncio.Queue[Optional[schemas.AggregatorStreamEvent]] = asyncio.Queue()
+        collect = asyncio.gather(
+            *[self._collect_bank(bank_name, user_id, consents.get(bank_name), events.put_nowait) for bank_name in bank_names]
+        )
+        collect.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+            snapshots = await collect
+        finally:
+            collect.cancel()
+        yield schemas.AggregatorStreamEvent(event="complete", data=self._build_financial_data(user_id, snapshots))
+
+    async def _collect_bank(
+        self,
+        bank_name: str,
+        user_id: str,
+        consent_id: Optional[str],
+        publish: Optional[SectionPublisher] = None,
+    ) -> _BankSnapshot:
+        """
+        Собирает все разделы одного банка. Карты и договоры запрашиваются одновременно со счетами,
+        балансы и транзакции — одновременно друг с другом, как только известен список счетов.
+        Все разделы банка укладываются в общий бюджет `bank_timeout`.
+
+        Если передан `publish`, каждый раздел публикуется сразу после получения:
+        счета — вместе с балансами, транзакции — независимо от балансов.
+        Без `consent_id` согласия берет из реестра `MCPService` (см. `ConsentRegistry`).
+        """
+        snapshot = _BankSnapshot(bank_name=bank_name)
+        publish = publish or (lambda event: None)
+        deadline = asyncio.get_running_loop().time() + self.bank_timeout
+
+        async def collect_cards():
+            cards = await self._run_section(snapshot, "cards", deadline, lambda: self._fetch_cards(bank_name, user_id, consent_id))
+            snapshot.cards = [mappers.map_card(bank_name, card) for card in cards or []]
+            publish(snapshot.section_event("cards", snapshot.cards))
+
+        async def collect_agreements():
+            agreements = await self._run_section(snapshot, "agreements", deadline, lambda: self._fetch_agreements(bank_name, user_id, consent_id))
+            snapshot.agreements = [mappers.map_agreement(bank_name, agreement) for agreement in agreements or []]
+            publish(snapshot.section_event("agreements", snapshot.agreements))
+
+        async def collect_accounts():
+            raw_accounts = await self._run_section(
+                snapshot, "accounts", deadline, lambda: self._fetch_accounts(bank_name, user_id, consent_id)
+            )
+            if not raw_accounts:
+                reason = "ACCOUNTS_UNAVAILABLE" if raw_accounts is None else None
+                for section in ("balances", "transactions"):
+                    snapshot.mark(section, "skipped" if reason else "ok", error=reason)
+                publish(snapshot.section_event("accounts", [], "accounts", "balances"))
+                publish(snapshot.section_event("transactions", []))
+                return
+
+            account_ids = [str(account.get("accountId") or account.get("id")) for account in raw_accounts]
+
+            async def collect_balances():
+                balances = await self._run_section(
+                    snapshot, "balances", deadline, lambda: self._fetch_balances(bank_name, user_id, consent_id, account_ids)
+                ) or {}
+                snapshot.accounts = [
+                    mappers.map_account(bank_name, account, balances.get(account_id, []))
+                    for account_id, account in zip(account_ids, raw_accounts)
+                ]
+                publish(snapshot.section_event("accounts", snapshot.accounts, "accounts", "balances"))
+
+            async def collect_transactions():
+                transactions = await self._run_section(
+                    snapshot, "transactions", deadline, lambda: self._fetch_transactions(bank_name, user_id, consent_id, account_ids)
+                )
+                transactions = transactions or []
+                categories = self.categorizer.categorize_many(
+                    [mappers.transaction_description(transaction) for transaction in transactions],
+                    user_id,
+                    [transaction.get("category") for transaction in transactions],
+                )
+                snapshot.transactions = [
+                    mappers.map_transaction(bank_name, transaction["account_id"], transaction, category)
+                    for transaction, category in zip(transactions, categories)
+                ]
+                publish(snapshot.section_event("transactions", snapshot.transactions))
+
+            await asyncio.gather(collect_balances(), collect_transactions())
+
+        await asyncio.gather(collect_cards(), collect_agreements(), collect_accounts())
+        return snapshot
+
+    async def _run_section(
+        self,
+        snapshot: _BankSnapshot,
+        section: str,
+        deadline: float,
+        fetch: Callable[[], Awaitable[tuple[Any, List[str]]]],
+    ) -> Any:
+        """
+        Выполняет загрузку раздела с таймаутом min(section_timeout, остаток бюджета банка)
+        и отмечает результат в `sources`. Возвращает данные раздела или None, если их нет.
+
+        `fetch` возвращает пару (данные, ошибки). Ошибки при наличии данных означают
+        частичный результат (например, не удалось получить транзакции одного из счетов).
+        """
+        timeout = min(self.section_timeout, deadline - asyncio.get_running_loop().time())
+        started = time.perf_counter()
+        if timeout <= 0:
+            snapshot.mark(section, "timeout", error="Исчерпано время ожидания банка")
+            return None
+        try:
+            data, errors = await asyncio.wait_for(fetch(), timeout)
+        except TimeoutError:
+            snapshot.mark(section, "timeout", error=f"Нет ответа за {timeout:.1f} с", latency_ms=(time.perf_counter() - started) * 1000)
+            return None
+        except Exception as e:
+            snapshot.mark(section, "error", error=str(e), latency_ms=(time.perf_counter() - started) * 1000)
+            return None
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        if not errors:
+            snapshot.mark(section, "ok", latency_ms=latency_ms)
+            return data
+        if data:
+            snapshot.mark(section, "partial", error="; ".join(errors), latency_ms=latency_ms)
+            return data
+        snapshot.mark(section, "error", error="; ".join(errors), latency_ms=latency_ms)
+        return None
+
+    async def _fetch_accounts(self, bank_name: str, user_id: str, consent_id: Optional[str]) -> tuple[List[Dict[str, Any]], List[str]]:
+        response = (await self.mcp_service.get_all_accounts([bank_name], user_id, consent_id))[0]
+        if response.status != "success":
+            return [], [response.message or response.error or "Не удалось получить счета"]
+        return response.data or [], []
+
+    async def _fetch_balances(self, bank_name: str, user_id: str, consent_id: Optional[str], account_ids: List[str]) -> tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+        responses = await asyncio.gather(
+            *[self.mcp_service.get_account_balances(bank_name, user_id, consent_id, account_id) for account_id in account_ids]
+        )
+        balances, errors = {}, []
+        for account_id, response in zip(account_ids, responses):
+            if response.status == "success":
+                balances[account_id] = response.data or []
+            else:
+                errors.append(f"{account_id}: {response.message or response.error}")
+        return balances, errors
+
+    async def _fetch_transactions(self, bank_name: str, user_id: str, consent_id: Optional[str], account_ids: List[str]) -> tuple[List[Dict[str, Any]], List[str]]:
+        response = await self.mcp_service.get_all_transactions(
+            [{"bank_name": bank_name, "account_id": account_id} for account_id in account_ids], user_id, consent_id
+        )
+        return response.transactions, [f"{error.account_id}: {error.message}" for error in response.errors]
+
+    async def _fetch_cards(self, bank_name: str, user_id: str, consent_id: Optional[str]) -> tuple[List[Dict[str, Any]], List[str]]:
+        response = await self.mcp_service.get_cards(bank_name, user_id, consent_id)
+        if response.status != "success":
+            return [], [response.message or response.error or "Не удалось получить карты"]
+        return response.data or [], []
+
+    async def _fetch_agreements(self, bank_name: str, user_id: str, consent_id: Optional[str]) -> tuple[List[Any], List[str]]:
+        response = await self.mcp_service.get_product_agreements(bank_name, user_id, consent_id)
+        if response.status != "success":
+            return [], [response.message or response.error or "Не удалось получить договоры"]
+        return response.data or [], []
+
+    def _build_financial_data(self, user_id: str, snapshots: List[_BankSnapshot]) -> schemas.FinancialData:
         """
-        
-        # --- Начало блока моковых данных ---
-        
-        accounts_data = [
-            {'id': 'acc_tbank_debit', 'name': 'ABank Black', 'bankName': 'ABank', 'last4': '1111', 'balance': 28340.70, 'type': 'debit', 'brandColor': '#EF3124'},
-            {'id': 'acc_sber_debit', 'name': 'SBank Карта', 'bankName': 'SBank', 'last4': '2222', 'balance': 41200.90, 'type': 'debit', 'brandColor': '#228B22'},
-            {'id': 'acc_alfa_debit', 'name': 'A-Карта', 'bankName': 'ABank', 'last4': '7777', 'balance': 15800.00, 'type': 'debit', 'brandColor': '#EF3124'},
-            {'id': 'acc_tbank_credit', 'name': 'Fly Airlines', 'bankName': 'ABank', 'last4': '3333', 'balance': -25000.00, 'type': 'credit', 'brandColor': '#00BFFF'},
-            {'id': 'acc_vtb_savings', 'name': 'Сейф', 'bankName': 'VBank', 'last4': '4444', 'balance': 540100.00, 'type': 'savings', 'brandColor': '#0033A0'},
-            {'id': 'acc_sber_savings', 'name': 'Накопительный', 'bankName': 'SBank', 'last4': '5555', 'balance': 210000.00, 'type': 'savings', 'brandColor': '#005522'},
-        ]
-        
-        transactions_data = [
-            {'id': 't1', 'date': (datetime.now() - timedelta(days=1)).isoformat(), 'description': 'Зарплата', 'amount': 120000, 'type': 'income', 'category': 'Зарплата'},
-            {'id': 't2', 'date': (datetime.now() - timedelta(days=2)).isoformat(), 'description': 'Perekrestok', 'amount': -3450.50, 'type': 'expense', 'category': 'Супермаркеты'},
-            {'id': 't3', 'date': (datetime.now() - timedelta(days=2)).isoformat(), 'description': 'Yandex.Go', 'amount': -450.00, 'type': 'expense', 'category': 'Такси'},
-            {'id': 't4', 'date': (datetime.now() - timedelta(days=3)).isoformat(), 'description': 'Yandex.Plus', 'amount': -299.00, 'type': 'expense', 'category': 'Подписки'},
-            {'id': 't5', 'date': (datetime.now() - timedelta(days=4)).isoformat(), 'description': 'Ресторан "Огонек"', 'amount': -5600.00, 'type': 'expense', 'category': 'Рестораны'},
-        ]
-
-        goals_data = [
-            {'id': 'g1', 'name': 'Отпуск в Таиланде', 'currentAmount': 210000, 'targetAmount': 350000},
-            {'id': 'g2', 'name': 'Новый ноутбук', 'currentAmount': 45000, 'targetAmount': 150000},
-        ]
-        
-        mock_data = {
-            "netWorth": sum(acc['balance'] for acc in accounts_data),
-            "accounts": accounts_data,
-            "transactions": transactions_data,
-            "goals": goals_data,
-            "nightSafe": {
-                "enabled": True,
-                "includedAccountIds": ['acc_tbank_debit', 'acc_sber_debit', 'acc_alfa_debit'],
-                "targetAccountId": 'acc_vtb_savings',
-                "stats": {"yesterday": 120.54, "month": 3450.12, "total": 15230.88},
+        Объединяет данные банков в единый `FinancialData`.
+        Аналитические разделы рассчитываются по транзакциям пользователя (см. `app.analytics`),
+        если они получены хотя бы от одного банка.
+        """
+        accounts = [account for snapshot in snapshots for account in snapshot.accounts]
+        transactions = sorted(
+            (transaction for snapshot in snapshots for transaction in snapshot.transactions),
+            key=lambda transaction: transaction.date,
+            reverse=True,
+        )
+        sources = [source for snapshot in snapshots for source in snapshot.sources]
+        debit_ids = [account.id for account in accounts if account.type == "debit"]
+        savings_ids = [account.id for account in accounts if account.type == "savings"]
+
+        cards = [card for snapshot in snapshots for card in snapshot.cards]
+        agreements = [agreement for snapshot in snapshots for agreement in snapshot.agreements]
+
+        sections = _demo_sections()
+        self.cashback_optimizer.update_user(user_id, accounts, cards, agreements)
+        cashback_categories = self.cashback_optimizer.cashback_categories(user_id)
+        if cashback_categories:
+            sections["cashbackCategories"] = cashback_categories
+        if transactions:
+            self.budget_engine.update(user_id, transactions)
+            sections["budgetPlan"] = self.budget_engine.plan(user_id)
+            self.health_engine.update(user_id, transactions)
+            # Кредиты банков пока не загружаются (раздел `loans` демонстрационный), поэтому не учитываются
+            sections["financialHealth"] = self.health_engine.score(user_id, accounts, loans=())
+            self.subscription_detector.update(user_id, transactions)
+            sections["subscriptions"] = self.subscription_detector.subscriptions(user_id)
+            sections["recommendedCardOffers"] = self.cashback_optimizer.recommend(user_id, transactions)
+
+        return schemas.FinancialData(
+            netWorth=sum(account.balance for account in accounts),
+            accounts=accounts,
+            transactions=transactions,
+            nightSafe={
+                "enabled": bool(debit_ids and savings_ids),
+                "includedAccountIds": debit_ids,
+                "targetAccountId": savings_ids[0] if savings_ids else "",
+                "stats": {"yesterday": 0.0, "month": 0.0, "total": 0.0},
             },
-            "smartPay": {
-                "enabled": True,
-                "includedAccountIds": ['acc_tbank_debit', 'acc_sber_debit', 'acc_alfa_debit', 'acc_tbank_credit'],
+            smartPay={
+                "enabled": bool(debit_ids),
+                "includedAccountIds": [account.id for account in accounts if account.type in ("debit", "credit")],
             },
-            "cashbackCategories": [
-                {"bankName": 'ABank', "categories": {'Рестораны': 5, 'АЗС': 3, 'Путешествия': 2, 'Супермаркеты': 3, 'Подписки': 10, 'Книги': 5, 'Такси': 5}},
-                {"bankName": 'SBank', "categories": {'Супермаркеты': 2, 'Рестораны': 1, 'АЗС': 1, 'Доставка': 5}},
-            ],
-            "specialOffers": [
-                {'id': 'so1', 'partnerName': 'Ozon', 'bankName': 'ABank', 'description': 'Кэшбэк 10% на все покупки электроники в приложении Ozon', 'expiryDate': (datetime.now() + timedelta(days=15)).isoformat(), 'brandColor': '#4f46e5'},
-                {'id': 'so2', 'partnerName': 'M.Video', 'bankName': 'SBank', 'description': 'Скидка 2000₽ при покупке от 20000₽ по SBank Карте', 'expiryDate': (datetime.now() + timedelta(days=10)).isoformat(), 'brandColor': '#ef4444'},
-            ],
-            "exchangeRates": [
-                {'bankName': 'ABank', 'from': 'RUB', 'to': 'USD', 'buy': 90.5, 'sell': 92.8, 'promotion': 'Лучший курс в приложении'},
-                {'bankName': 'SBank', 'from': 'RUB', 'to': 'USD', 'buy': 89.9, 'sell': 94.1},
-                {'bankName': 'VBank', 'from': 'RUB', 'to': 'USD', 'buy': 90.1, 'sell': 93.5},
-            ],
-            "subscriptions": [
-                {'id': 'sub1', 'name': 'Yandex.Plus', 'amount': 299, 'billingCycle': 'monthly', 'nextPaymentDate': (datetime.now() + timedelta(days=2)).isoformat(), 'linkedAccountId': 'acc_tbank_debit', 'status': 'active'},
-                {'id': 'sub2', 'name': 'IVI', 'amount': 399, 'billingCycle': 'monthly', 'nextPaymentDate': datetime.now().isoformat(), 'linkedAccountId': 'acc_sber_debit', 'status': 'active'},
-            ],
-            "loans": [
-                {'id': 'loan1', 'name': 'Автокредит', 'bankName': 'SBank', 'remainingAmount': 850000, 'interestRate': 8.5, 'monthlyPayment': 25000, 'nextPaymentDate': (datetime.now() + timedelta(days=12)).isoformat(), 'linkedAccountId': 'acc_sber_debit'},
-                {'id': 'loan2', 'name': 'Ипотека', 'bankName': 'VBank', 'remainingAmount': 4500000, 'interestRate': 9.2, 'monthlyPayment': 42000, 'nextPaymentDate': (datetime.now() + timedelta(days=18)).isoformat(), 'linkedAccountId': 'acc_tbank_debit'},
-            ],
-            "refinancingOffers": [
-                {'id': 'ref1', 'bankName': 'ABank', 'newInterestRate': 8.5, 'description': 'Лучшее предложение по рефинансированию ипотеки', 'maxAmount': 10000000, 'brandColor': '#EF3124'},
-            ],
-            "marketplaceSubscriptions": [
-                 {'id': 'ms1', 'name': 'Яндекс Плюс', 'logoUrl': '', 'cost': 299, 'billingCycle': 'monthly', 'benefits': ['Кинопоиск', 'Яндекс.Музыка', 'Баллы Плюса'], 'relatedMerchants': ['Yandex.Go', 'KinoPoisk'], 'cashbackCategory': 'Подписки'},
+            cards=cards,
+            productAgreements=agreements,
+            sources=sources,
+            isPartial=any(source.status != "ok" for source in sources),
+            **sections,
+        )
+
+
+def _demo_sections() -> Dict[str, Any]:
+    """
+    Демонстрационные данные для разделов, у которых пока нет источника в банках,
+    аналогичные тем, что используются в `ui/services/financialService.ts`.
+    """
+    goals_data = [
+        {'id': 'g1', 'name': 'Отпуск в Таиланде', 'currentAmount': 210000, 'targetAmount': 350000},
+        {'id': 'g2', 'name': 'Новый ноутбук', 'currentAmount': 45000, 'targetAmount': 150000},
+    ]
+
+    return {
+        "goals": goals_data,
+        "cashbackCategories": [
+            {"bankName": 'ABank', "categories": {'Рестораны': 5, 'АЗС': 3, 'Путешествия': 2, 'Супермаркеты': 3, 'Подписки': 10, 'Книги': 5, 'Такси': 5}},
+            {"bankName": 'SBank', "categories": {'Супермаркеты': 2, 'Рестораны': 1, 'АЗС': 1, 'Доставка': 5}},
+        ],
+        "specialOffers": [
+            {'id': 'so1', 'partnerName': 'Ozon', 'bankName': 'ABank', 'description': 'Кэшбэк 10% на все покупки электроники в приложении Ozon', 'expiryDate': (datetime.now() + timedelta(days=15)).isoformat(), 'brandColor': '#4f46e5'},
+            {'id': 'so2', 'partnerName': 'M.Video', 'bankName': 'SBank', 'description': 'Скидка 2000₽ при покупке от 20000₽ по SBank Карте', 'expiryDate': (datetime.now() + timedelta(days=10)).isoformat(), 'brandColor': '#ef4444'},
+        ],
+        "exchangeRates": [
+            {'bankName': 'ABank', 'from': 'RUB', 'to': 'USD', 'buy': 90.5, 'sell': 92.8, 'promotion': 'Лучший курс в приложении'},
+            {'bankName': 'SBank', 'from': 'RUB', 'to': 'USD', 'buy': 89.9, 'sell': 94.1},
+            {'bankName': 'VBank', 'from': 'RUB', 'to': 'USD', 'buy': 90.1, 'sell': 93.5},
+        ],
+        "subscriptions": [
+            {'id': 'sub1', 'name': 'Yandex.Plus', 'amount': 299, 'billingCycle': 'monthly', 'nextPaymentDate': (datetime.now() + timedelta(days=2)).isoformat(), 'linkedAccountId': 'acc_tbank_debit', 'status': 'active'},
+            {'id': 'sub2', 'name': 'IVI', 'amount': 399, 'billingCycle': 'monthly', 'nextPaymentDate': datetime.now().isoformat(), 'linkedAccountId': 'acc_sber_debit', 'status': 'active'},
+        ],
+        "loans": [
+            {'id': 'loan1', 'name': 'Автокредит', 'bankName': 'SBank', 'remainingAmount': 850000, 'interestRate': 8.5, 'monthlyPayment': 25000, 'nextPaymentDate': (datetime.now() + timedelta(days=12)).isoformat(), 'linkedAccountId': 'acc_sber_debit'},
+            {'id': 'loan2', 'name': 'Ипотека', 'bankName': 'VBank', 'remainingAmount': 4500000, 'interestRate': 9.2, 'monthlyPayment': 42000, 'nextPaymentDate': (datetime.now() + timedelta(days=18)).isoformat(), 'linkedAccountId': 'acc_tbank_debit'},
+        ],
+        "refinancingOffers": [
+            {'id': 'ref1', 'bankName': 'ABank', 'newInterestRate': 8.5, 'description': 'Лучшее предложение по рефинансированию ипотеки', 'maxAmount': 10000000, 'brandColor': '#EF3124'},
+        ],
+        "marketplaceSubscriptions": [
+             {'id': 'ms1', 'name': 'Яндекс Плюс', 'logoUrl': '', 'cost': 299, 'billingCycle': 'monthly', 'benefits': ['Кинопоиск', 'Яндекс.Музыка', 'Баллы Плюса'], 'relatedMerchants': ['Yandex.Go', 'KinoPoisk'], 'cashbackCategory': 'Подписки'},
+        ],
+        "recommendedCardOffers": [
+            {'id': 'rec_card_1', 'name': 'ABank Premium', 'bankName': 'ABank', 'brandColor': '#333333', 'benefits': ['Повышенный кэшбэк в ресторанах'], 'isCredit': False, 'cashbackRates': {'Рестораны': 10}},
+        ],
+        "trustIssues": [
+            {'id': 'ti1', 'bankName': 'SBank', 'accountId': 'acc_sber_savings', 'type': 'low_interest', 'severity': 'high', 'title': 'Низкая ставка по накопительному счету', 'description': 'Ваш счет в SBank имеет ставку 7%. В VBank ставка 12%.', 'recommendation': 'Переведите средства в VBank.'},
+        ],
+        "budgetPlan": {
+            'totalMonthlyIncome': 240000, 'safeDailySpend': 3200, 'daysRemainingInMonth': 12,
+            'envelopes': [
+                {'id': 'env1', 'name': 'Обязательные платежи', 'type': 'essentials', 'allocatedAmount': 120000, 'spentAmount': 95000, 'forecastedAmount': 118000, 'color': '#3b82f6'},
+                {'id': 'env2', 'name': 'Развлечения и Хотелки', 'type': 'wants', 'allocatedAmount': 72000, 'spentAmount': 55000, 'forecastedAmount': 75000, 'color': '#a855f7'},
+                {'id': 'env3', 'name': 'Накопления и Инвестиции', 'type': 'savings', 'allocatedAmount': 48000, 'spentAmount': 48000, 'forecastedAmount': 48000, 'color': '#22c55e'}
             ],
-            "recommendedCardOffers": [
-                {'id': 'rec_card_1', 'name': 'ABank Premium', 'bankName': 'ABank', 'brandColor': '#333333', 'benefits': ['Повышенный кэшбэк в ресторанах'], 'isCredit': False, 'cashbackRates': {'Рестораны': 10}},
+            'insights': ["Ваши расходы на 'Развлечения' превышают норму.","Вы отлично справляетесь с накоплениями!"]
+        },
+        "financialHealth": {
+            'totalScore': 78,
+            'components': [
+                {'id': 'comp_spending', 'category': 'spending', 'label': 'Контроль трат', 'score': 24, 'maxScore': 30, 'status': 'good', 'advice': 'Вы держитесь в рамках бюджета.'},
+                {'id': 'comp_debt', 'category': 'debt', 'label': 'Кредитная нагрузка', 'score': 20, 'maxScore': 30, 'status': 'fair', 'advice': 'Платежи по кредитам составляют 25% от дохода.'},
             ],
-            "trustIssues": [
-                {'id': 'ti1', 'bankName': 'SBank', 'accountId': 'acc_sber_savings', 'type': 'low_interest', 'severity': 'high', 'title': 'Низкая ставка по накопительному счету', 'description': 'Ваш счет в SBank имеет ставку 7%. В VBank ставка 12%.', 'recommendation': 'Переведите средства в VBank.'},
+            'badges': [
+                {'id': 'b1', 'name': 'Зарплатник', 'description': 'Регулярные поступления', 'iconName': 'briefcase', 'unlocked': True},
+                {'id': 'b2', 'name': 'Сберегатель', 'description': 'Накопительный счет растет', 'iconName': 'piggy', 'unlocked': True},
             ],
-            "budgetPlan": {
-                'totalMonthlyIncome': 240000, 'safeDailySpend': 3200, 'daysRemainingInMonth': 12,
-                'envelopes': [
-                    {'id': 'env1', 'name': 'Обязательные платежи', 'type': 'essentials', 'allocatedAmount': 120000, 'spentAmount': 95000, 'forecastedAmount': 118000, 'color': '#3b82f6'},
-                    {'id': 'env2', 'name': 'Развлечения и Хотелки', 'type': 'wants', 'allocatedAmount': 72000, 'spentAmount': 55000, 'forecastedAmount': 75000, 'color': '#a855f7'},
-                    {'id': 'env3', 'name': 'Накопления и Инвестиции', 'type': 'savings', 'allocatedAmount': 48000, 'spentAmount': 48000, 'forecastedAmount': 48000, 'color': '#22c55e'}
-                ],
-                'insights': ["Ваши расходы на 'Развлечения' превышают норму.","Вы отлично справляетесь с накоплениями!"]
-            },
-            "financialHealth": {
-                'totalScore': 78,
-                'components': [
-                    {'id': 'comp_spending', 'category': 'spending', 'label': 'Контроль трат', 'score': 24, 'maxScore': 30, 'status': 'good', 'advice': 'Вы держитесь в рамках бюджета.'},
-                    {'id': 'comp_debt', 'category': 'debt', 'label': 'Кредитная нагрузка', 'score': 20, 'maxScore': 30, 'status': 'fair', 'advice': 'Платежи по кредитам составляют 25% от дохода.'},
-                ],
-                'badges': [
-                    {'id': 'b1', 'name': 'Зарплатник', 'description': 'Регулярные поступления', 'iconName': 'briefcase', 'unlocked': True},
-                    {'id': 'b2', 'name': 'Сберегатель', 'description': 'Накопительный счет растет', 'iconName': 'piggy', 'unlocked': True},
-                ],
-                'rewards': [
-                     {'id': 'r1', 'title': 'Повышенный кэшбэк', 'description': '+1% на все покупки', 'requiredScore': 70, 'isLocked': False},
-                     {'id': 'r2', 'title': 'Скидка на кредит', 'description': '-0.5% к ставке', 'requiredScore': 85, 'isLocked': True},
-                ]
-            }
+            'rewards': [
+                 {'id': 'r1', 'title': 'Повышенный кэшбэк', 'description': '+1% на все покупки', 'requiredScore': 70, 'isLocked': False},
+                 {'id': 'r2', 'title': 'Скидка на кредит', 'description': '-0.5% к ставке', 'requiredScore': 85, 'isLocked': True},
+            ]
         }
-        
-        # --- Конец блока моковых данных ---
-        
-        # Валидируем и возвращаем данные в соответствии со схемой
-        return schemas.FinancialData(**mock_data)
+    }
+
 
 def get_ui_service(service: UIService = Depends(UIService)) -> UIService:
-    return service
\ No newline at end of file
+    return service
@@ -1,21 +1,97 @@
-import httpx
+from typing import Any, Dict
+
 from fastapi import HTTPException
 
 from app.core.config import settings
+from app.banks.base_client import BaseBankClient
 from app.banks.vbank_client import VBankClient
 from app.banks.abank_client import ABankClient
 from app.banks.sbank_client import SBankClient
 
 
-def get_bank_client(bank_name: str):
+def _create_bank_client(bank_name: str) -> BaseBankClient:
     """
-    Вспомогательная функция для получения экземпляра клиента банка по его имени.
+    Создает новый экземпляр клиента банка по его имени.
     """
     if bank_name == "vbank":
-        return VBankClient(client_id=settings.CLIENT_ID, client_secret=settings.CLIENT_SECRET, api_url=settings.VBANK_API_URL)
+        return VBankClient(client_id=settings.CLIENT_ID, client_secret=settings.CLIENT_SECRET, api_url=settings.VBANK_API_URL, transport_profile=settings.VBANK_TRANSPORT)
     elif bank_name == "abank":
-        return ABankClient(client_id=settings.CLIENT_ID, client_secret=settings.CLIENT_SECRET, api_url=settings.ABANK_API_URL)
+        return ABankClient(client_id=settings.CLIENT_ID, client_secret=settings.CLIENT_SECRET, api_url=settings.ABANK_API_URL, transport_profile=settings.ABANK_TRANSPORT)
     elif bank_name == "sbank":
-        return SBankClient(client_id=settings.CLIENT_ID, client_secret=settings.CLIENT_SECRET, api_url=settings.SBANK_API_URL)
+        return SBankClient(client_id=settings.CLIENT_ID, client_secret=settings.CLIENT_SECRET, api_url=settings.SBANK_API_URL, transport_profile=settings.SBANK_TRANSPORT)
     else:
         raise HTTPException(status_code=400, detail="Неподдерживаемый банк.")
+
+
+class BankClientRegistry:
+    """
+    Реестр долгоживущих клиентов банков.
+    Хранит по одному клиенту на банк, поэтому все запросы к банку используют
+    общий пул соединений `httpx.AsyncClient` вместо нового TCP+TLS хэндшейка на каждый вызов.
+    Жизненным циклом реестра управляет lifespan приложения (см. `main.py`).
+    """
+    def __init__(self):
+        self._clients: Dict[str, BaseBankClient] = {}
+
+    def get(self, bank_name: str) -> BaseBankClient:
+        """
+        Возвращает клиент банка, создавая его при первом обращении.
+        """
+        client = self._clients.get(bank_name)
+        if client is None:
+            client = _create_bank_client(bank_name)
+            self._clients[bank_name] = client
+        return client
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Возвращает статистику пулов соединений для всех созданных клиентов.
+        """
+        return {bank_name: client.pool_stats() for bank_name, client in self._clients.items()}
+
+    def circuit_breakers(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Возвращает состояние circuit breaker-ов для всех созданных клиентов.
+        """
+        return {bank_name: client.circuit_breaker_stats() for bank_name, client in self._clients.items()}
+
+    def coalescing(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Возвращает статистику объединения одинаковых запросов для всех созданных клиентов.
+        """
+        return {bank_name: client.coalescing_stats() for bank_name, client in self._clients.items()}
+
+    async def aclose(self):
+        """
+        Закрывает все клиенты и их пулы соединений. Вызывается при завершении работы приложения.
+        """
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    def reset(self):
+        """
+        Забывает созданные клиенты без их закрытия.
+        Используется в тестах, где `httpx.AsyncClient` подменяется моком для каждого теста.
+        """
+        self._clients.clear()
+
+
+# Экземпляр реестра создается один раз на процесс и переиспользуется всеми запросами
+bank_client_registry = BankClientRegistry()
+
+
+def get_bank_client_registry() -> BankClientRegistry:
+    """
+    Зависимость FastAPI для получения реестра клиентов банков.
+    """
+    return bank_client_registry
+
+
+def get_bank_client(bank_name: str) -> BaseBankClient:
+    """
+    Вспомогательная функция (и зависимость FastAPI) для получения клиента банка по его имени.
+    Возвращает долгоживущий клиент из реестра с общим пулом соединений.
+    """
+    return bank_client_registry.get(bank_name)
@@ -1,8 +1,11 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
-from app.db.database import Base, engine
+from app.db.database import SessionLocal, engine, init_db
 from app.api.v1 import api_router
+from app.core.config import settings
+from app.utils.bank_clients import bank_client_registry
+from app.auth_manager.dependencies import get_auth_manager, get_token_renewal_scheduler
 
 app = FastAPI()
 
@@ -10,10 +13,21 @@ app = FastAPI()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Событие запуска
-    Base.metadata.create_all(bind=engine)
+    await init_db()
     print("База данных инициализирована.")
+    # Восстанавливаем кэш токенов из БД, чтобы перезапуск не приводил к повторному получению токенов
+    async with SessionLocal() as db:
+        loaded_tokens = await get_auth_manager().warm_start(db)
+        print(f"Загружено токенов из БД: {loaded_tokens}.")
+    token_renewal_scheduler = get_token_renewal_scheduler()
+    if settings.TOKEN_RENEWAL_ENABLED:
+        token_renewal_scheduler.start()
     yield
-    # Событие завершения (если нужно)
+    # Событие завершения: останавливаем фоновые задачи и закрываем пулы соединений клиентов банков
+    await token_renewal_scheduler.stop()
+    await get_auth_manager().aclose()
+    await bank_client_registry.aclose()
+    await engine.dispose()
     print("Приложение завершает работу.")
 
 app = FastAPI(lifespan=lifespan)
@@ -1,11 +1,27 @@
+import os
+
+# Фоновое обновление токенов в тестах не нужно: оно обращалось бы к реальным банкам
+os.environ.setdefault("TOKEN_RENEWAL_ENABLED", "false")
+
+import asyncio
+
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 
 from app.db.database import Base, get_db
 from app.auth_manager.services import BaseAuthManager
 from app.auth_manager.dependencies import get_auth_manager
+from app.utils.bank_clients import bank_client_registry
+from app.mcp.services import bank_concurrency_limiter
+from app.banks.response_cache import bank_response_cache
+from app.analytics.budget import budget_engine
+from app.analytics.cashback import cashback_optimizer
+from app.analytics.categorizer import categorizer
+from app.analytics.health import health_engine
+from app.analytics.subscriptions import subscription_detector
 from main import app
 
 # --- Mock Auth Manager ---
@@ -17,7 +33,7 @@ class MockAuthManager(BaseAuthManager):
     """
     MOCK_TOKEN = "mock_access_token_for_tests"
 
-    async def get_access_token(self, db: Session, bank_name: str) -> str:
+    async def get_access_token(self, db: AsyncSession, bank_name: str) -> str:
         print(f"\nDEBUG: MockAuthManager.get_access_token called for bank: {bank_name}")
         return self.MOCK_TOKEN
 
@@ -25,42 +41,87 @@ class MockAuthManager(BaseAuthManager):
         # Для тестов, где не требуется валидация JWT, можно вернуть пустой dict
         return {"sub": "mock_user"}
 
+# --- Bank Client Registry Fixture ---
+
+@pytest.fixture(autouse=True)
+def reset_bank_client_registry():
+    """
+    Сбрасывает реестр клиентов банков перед каждым тестом.
+    Многие тесты подменяют `httpx.AsyncClient` моком на время одного теста,
+    поэтому долгоживущие клиенты не должны переживать тест.
+    Семафоры ограничителя запросов привязываются к циклу событий теста и тоже сбрасываются,
+    а кэш ответов банков и накопленные суммы аналитики очищаются, чтобы данные моков одного теста не попали в другой.
+    """
+    bank_client_registry.reset()
+    bank_concurrency_limiter.reset()
+    bank_response_cache.clear()
+    budget_engine.clear()
+    health_engine.clear()
+    subscription_detector.clear()
+    categorizer.clear()
+    cashback_optimizer.clear()
+    yield
+    bank_client_registry.reset()
+    bank_concurrency_limiter.reset()
+    bank_response_cache.clear()
+    budget_engine.clear()
+    health_engine.clear()
+    subscription_detector.clear()
+    categorizer.clear()
+    cashback_optimizer.clear()
+
 # --- Database Fixtures ---
 
-# Используем in-memory SQLite для тестов
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+# Используем файловую SQLite через aiosqlite.
+# NullPool: тесты и запросы TestClient выполняются в разных циклах событий,
+# поэтому соединения не должны переиспользоваться между ними.
+SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+TestingSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async def _create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
 
-@pytest.fixture(scope="module", name="session")
-def session_fixture():
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    try:
+
+async def _drop_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+
+
+@pytest.fixture(scope="module", name="database")
+def database_fixture():
+    """
+    Создает таблицы тестовой БД на время модуля.
+    """
+    asyncio.run(_create_tables())
+    yield
+    asyncio.run(_drop_tables())
+
+
+@pytest_asyncio.fixture(name="session")
+async def session_fixture(database):
+    """
+    Асинхронная сессия тестовой БД для одного теста.
+    """
+    async with TestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
-        Base.metadata.drop_all(bind=engine)
 
 # --- Test Client Fixture ---
 
 @pytest.fixture(scope="module", name="client")
-def client_fixture(session: TestingSessionLocal):
+def client_fixture(database):
     """
     Основная фикстура для тестов API.
     - Создает тестовый клиент FastAPI.
     - Переопределяет зависимость get_db для использования тестовой БД.
     - Переопределяет зависимость get_auth_manager для использования MockAuthManager.
     """
-    def get_test_db():
-        try:
-            yield session
-        finally:
-            # Не закрываем сессию здесь, т.к. она управляется фикстурой 'session'
-            pass
+    async def get_test_db():
+        async with TestingSessionLocal() as db:
+            yield db
 
     def get_mock_auth_manager():
         return MockAuthManager()
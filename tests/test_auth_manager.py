@@ -0,0 +1,386 @@
+import asyncio
+import time
+import httpx
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from app.db import crud
+from app.auth_manager import services
+from app.auth_manager.services import OAuth2AuthManager
+from app.auth_manager.scheduler import TokenRenewalScheduler
+from app.auth_manager.schemas import TokenResponse
+from app.auth_manager.jwks import JWKSStore
+from app.auth_manager.jwt_cache import VerifiedJWTCache
+from app.auth_manager.exceptions import TokenFetchError, JWTVerificationError
+
+# --- Fixtures ---
+
+@pytest.fixture(autouse=True)
+def clear_auth_caches():
+    """Очищает модульные кэши AuthManager до и после каждого теста."""
+    services._token_cache.clear()
+    services._token_refresh_in_flight.clear()
+    services._token_lifetimes.clear()
+    services._verified_jwt_cache.clear()
+    yield
+    services._token_cache.clear()
+    services._token_refresh_in_flight.clear()
+    services._token_lifetimes.clear()
+
+@pytest.fixture
+def mock_db_session():
+    """Фикстура для мокирования сессии базы данных."""
+    return MagicMock(spec=AsyncSession)
+
+@pytest.fixture
+def slow_bank_client():
+    """Клиент банка, который отдает токен с небольшой задержкой."""
+    async def get_bank_token():
+        await asyncio.sleep(0.05)
+        return TokenResponse(access_token="fresh_token", expires_in=3600)
+
+    mock_client = MagicMock()
+    mock_client.get_bank_token = AsyncMock(side_effect=get_bank_token)
+    return mock_client
+
+# --- Tests ---
+
+@pytest.mark.asyncio
+async def test_concurrent_refresh_is_single_flight(mock_db_session, slow_bank_client):
+    """
+    Конкурентные запросы токена при пустом кэше порождают один запрос к банку.
+    """
+    auth_manager = OAuth2AuthManager()
+    coalesced_before = auth_manager.get_refresh_stats()["coalesced_waiters"]
+
+    with patch("app.auth_manager.services.get_bank_client", return_value=slow_bank_client), \
+         patch("app.auth_manager.services.crud.save_token") as mock_save_token:
+        tokens = await asyncio.gather(*[auth_manager.get_access_token(mock_db_session, "vbank") for _ in range(10)])
+
+    assert tokens == ["fresh_token"] * 10
+    slow_bank_client.get_bank_token.assert_called_once()
+    mock_save_token.assert_called_once()
+    assert auth_manager.get_refresh_stats()["coalesced_waiters"] - coalesced_before == 9
+    assert "vbank" not in services._token_refresh_in_flight
+
+@pytest.mark.asyncio
+async def test_concurrent_refresh_shares_error(mock_db_session):
+    """
+    Ошибка единственного обновления передается всем ожидающим, после чего возможна повторная попытка.
+    """
+    async def failing_get_bank_token():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("bank is down")
+
+    failing_client = MagicMock()
+    failing_client.get_bank_token = AsyncMock(side_effect=failing_get_bank_token)
+    auth_manager = OAuth2AuthManager()
+
+    with patch("app.auth_manager.services.get_bank_client", return_value=failing_client), \
+         patch("app.auth_manager.services.crud.save_token"):
+        results = await asyncio.gather(
+            *[auth_manager.get_access_token(mock_db_session, "abank") for _ in range(3)],
+            return_exceptions=True,
+        )
+
+    assert all(isinstance(result, TokenFetchError) for result in results)
+    failing_client.get_bank_token.assert_called_once()
+    assert "abank" not in services._token_refresh_in_flight
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_waiters(mock_db_session, slow_bank_client):
+    """
+    Отмена запроса, начавшего обновление токена, не отменяет обновление для остальных ожидающих
+    и не мешает сохранить токен.
+    """
+    auth_manager = OAuth2AuthManager()
+    refreshes_before = auth_manager.get_refresh_stats()["refreshes"]
+
+    with patch("app.auth_manager.services.get_bank_client", return_value=slow_bank_client), \
+         patch("app.auth_manager.services.crud.save_token") as mock_save_token:
+        leader = asyncio.create_task(auth_manager.get_access_token(mock_db_session, "sbank"))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(auth_manager.get_access_token(mock_db_session, "sbank")) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        tokens = await asyncio.gather(*waiters)
+
+    assert leader.cancelled()
+    assert tokens == ["fresh_token"] * 3
+    slow_bank_client.get_bank_token.assert_called_once()
+    assert auth_manager.get_refresh_stats()["refreshes"] - refreshes_before == 1
+    assert "sbank" not in services._token_refresh_in_flight
+    # Токен сохраняется в сессии задачи обновления, а не в сессии отмененного запроса
+    assert mock_save_token.call_args.kwargs["db"] is not mock_db_session
+
+# --- Tests for TokenRenewalScheduler ---
+
+@pytest.mark.asyncio
+async def test_scheduler_renews_token_in_background(slow_bank_client):
+    """
+    Планировщик получает токен при старте и назначает следующее обновление на долю expires_in.
+    """
+    auth_manager = OAuth2AuthManager()
+    scheduler = TokenRenewalScheduler(
+        auth_manager=auth_manager,
+        session_factory=lambda: MagicMock(spec=AsyncSession),
+        bank_names=["vbank"],
+        renewal_fraction=0.5,
+        jitter=0.0,
+    )
+
+    with patch("app.auth_manager.services.get_bank_client", return_value=slow_bank_client), \
+         patch("app.auth_manager.services.crud.save_token"):
+        scheduler.start()
+        await asyncio.sleep(0.1)
+        stats = scheduler.stats()["vbank"]
+        await scheduler.stop()
+
+    assert stats["renewals"] == 1
+    assert stats["failures"] == 0
+    issued_at, expires_in = auth_manager.get_token_lifetime("vbank")
+    assert expires_in == 3600
+    assert datetime.fromisoformat(stats["next_renewal_at"]) == issued_at + timedelta(seconds=1800)
+    assert not scheduler.running
+    # Токен уже в кэше: запрос пользователя не идет в банк
+    with patch("app.auth_manager.services.get_bank_client") as mock_get_bank_client:
+        assert await auth_manager.get_access_token(MagicMock(spec=AsyncSession), "vbank") == "fresh_token"
+        mock_get_bank_client.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_scheduler_retries_with_backoff():
+    """
+    После ошибки планировщик повторяет обновление с задержкой, не падая.
+    """
+    auth_manager = MagicMock(spec=OAuth2AuthManager)
+    lifetimes = {}
+
+    async def refresh_access_token(db, bank_name):
+        if auth_manager.refresh_access_token.await_count == 1:
+            raise TokenFetchError(bank_name, "down")
+        lifetimes[bank_name] = (datetime.now(timezone.utc), 3600)
+
+    auth_manager.get_token_lifetime.side_effect = lifetimes.get
+    auth_manager.refresh_access_token = AsyncMock(side_effect=refresh_access_token)
+    scheduler = TokenRenewalScheduler(
+        auth_manager=auth_manager,
+        session_factory=lambda: MagicMock(spec=AsyncSession),
+        bank_names=["sbank"],
+        retry_base_delay=0.01,
+        retry_max_delay=0.02,
+    )
+
+    scheduler.start()
+    await asyncio.sleep(0.1)
+    await scheduler.stop()
+
+    stats = scheduler.stats()["sbank"]
+    assert stats["failures"] == 1
+    assert stats["renewals"] == 1
+    assert stats["consecutive_failures"] == 0
+
+# --- Tests for DB warm start ---
+
+@pytest.mark.asyncio
+async def test_warm_start_loads_unexpired_tokens(session):
+    """
+    После перезапуска действительные токены берутся из БД без запросов к банку.
+    """
+    now = datetime.now(timezone.utc)
+    await crud.save_token(session, "vbank", "stored_vbank_token", expires_in=3600, issued_at=now - timedelta(minutes=10))
+    await crud.save_token(session, "abank", "expired_abank_token", expires_in=600, issued_at=now - timedelta(minutes=20))
+
+    auth_manager = OAuth2AuthManager()
+    assert await auth_manager.warm_start(session) == 1
+
+    with patch("app.auth_manager.services.get_bank_client") as mock_get_bank_client:
+        assert await auth_manager.get_access_token(session, "vbank") == "stored_vbank_token"
+        mock_get_bank_client.assert_not_called()
+    issued_at, expires_in = auth_manager.get_token_lifetime("vbank")
+    assert expires_in == 3600
+    assert abs((issued_at - (now - timedelta(minutes=10))).total_seconds()) < 1
+    assert auth_manager.get_token_lifetime("abank") is None
+
+@pytest.mark.asyncio
+async def test_db_read_through_before_network(session, slow_bank_client):
+    """
+    При промахе in-memory кэша токен берется из БД, а к банку идем только если в БД его нет.
+    """
+    await crud.save_token(session, "sbank", "stored_sbank_token", expires_in=3600)
+    auth_manager = OAuth2AuthManager()
+
+    with patch("app.auth_manager.services.get_bank_client", return_value=slow_bank_client):
+        assert await auth_manager.get_access_token(session, "sbank") == "stored_sbank_token"
+        slow_bank_client.get_bank_token.assert_not_called()
+
+        services._token_cache.clear()
+        await crud.save_token(session, "sbank", "stale_sbank_token", expires_in=30)
+        assert await auth_manager.get_access_token(session, "sbank") == "fresh_token"
+        slow_bank_client.get_bank_token.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_concurrent_banks_share_request_session(session, slow_bank_client):
+    """
+    Токены разных банков получаются параллельно в одной сессии БД запроса
+    (так делают мультибанковые агрегации) без конкурентных операций над сессией.
+    """
+    bank_names = ("bank_one", "bank_two", "bank_three")
+    auth_manager = OAuth2AuthManager()
+    with patch("app.auth_manager.services.get_bank_client", return_value=slow_bank_client):
+        tokens = await asyncio.gather(*[auth_manager.get_access_token(session, bank_name) for bank_name in bank_names])
+
+    assert tokens == ["fresh_token"] * 3
+    assert slow_bank_client.get_bank_token.call_count == 3
+    stored = await crud.get_unexpired_tokens(session, datetime.now(timezone.utc))
+    assert set(bank_names) <= set(stored)
+
+# --- Tests for JWKSStore ---
+
+BANK_API_URL = "http://mockbank.com"
+
+def _make_rsa_key(kid: str) -> tuple[str, dict]:
+    """Генерирует RSA-ключ и возвращает приватный PEM и публичный JWK."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_jwk = jwk.construct(private_pem, "RS256").public_key().to_dict()
+    public_jwk.update({"kid": kid, "use": "sig"})
+    return private_pem, public_jwk
+
+@pytest.fixture(scope="module")
+def rsa_keys():
+    """Два RSA-ключа для проверки ротации."""
+    return {"key-1": _make_rsa_key("key-1"), "key-2": _make_rsa_key("key-2")}
+
+def _jwks_store(published: dict, headers: dict | None = None, **kwargs) -> tuple[JWKSStore, list]:
+    """Создает JWKSStore с mock-транспортом, отдающим ключи из `published`."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"keys": list(published.values())}, headers=headers or {})
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return JWKSStore(http_client=http_client, **kwargs), requests
+
+@pytest.mark.asyncio
+async def test_jwks_store_caches_parsed_keys(rsa_keys):
+    """
+    Ключ загружается один раз, дальше JWT проверяется по закэшированному объекту ключа.
+    """
+    private_pem, public_jwk = rsa_keys["key-1"]
+    store, requests = _jwks_store({"key-1": public_jwk}, headers={"Cache-Control": "public, max-age=600"})
+    tokens = [jwt.encode({"sub": "bank", "jti": str(i)}, private_pem, algorithm="RS256", headers={"kid": "key-1"}) for i in range(3)]
+
+    auth_manager = OAuth2AuthManager()
+    with patch("app.auth_manager.services._jwks_store", store):
+        for token in tokens:
+            assert (await auth_manager.verify_jwt(token, BANK_API_URL))["sub"] == "bank"
+
+    assert len(requests) == 1
+    stats = store.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["keys"] == {BANK_API_URL: 1}
+    entry = store._entries[BANK_API_URL]
+    assert entry.expires_at - entry.fetched_at == pytest.approx(600)
+
+@pytest.mark.asyncio
+async def test_jwks_store_refetches_once_on_unknown_kid(rsa_keys):
+    """
+    Неизвестный kid вызывает одну повторную загрузку (ротация ключей), но не шторм запросов.
+    """
+    published = {"key-1": rsa_keys["key-1"][1]}
+    store, requests = _jwks_store(published, min_refetch_interval=0)
+    await store.get_key(BANK_API_URL, "key-1")
+
+    # Банк ротировал ключи
+    published["key-2"] = rsa_keys["key-2"][1]
+    key = await store.get_key(BANK_API_URL, "key-2")
+    assert key.to_dict()["n"] == rsa_keys["key-2"][1]["n"]
+    assert len(requests) == 2
+    assert store.stats()["unknown_kid_refetches"] == 1
+
+    # Сразу после загрузки неизвестный kid отклоняется без запроса к банку
+    store.min_refetch_interval = 30
+    with pytest.raises(JWTVerificationError):
+        await store.get_key(BANK_API_URL, "unknown")
+    assert len(requests) == 2
+
+# --- Tests for VerifiedJWTCache ---
+
+@pytest.mark.asyncio
+async def test_jwks_cancelled_leader_does_not_cancel_waiters(rsa_keys):
+    """
+    Отмена запроса, начавшего загрузку JWKS, не отменяет загрузку для остальных ожидающих.
+    """
+    requests = []
+
+    async def slow_handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"keys": [rsa_keys["key-1"][1]]})
+
+    store = JWKSStore(http_client=httpx.AsyncClient(transport=httpx.MockTransport(slow_handler)))
+    leader = asyncio.create_task(store.get_key(BANK_API_URL, "key-1"))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(store.get_key(BANK_API_URL, "key-1"))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    key = await waiter
+    assert leader.cancelled()
+    assert key.to_dict()["n"] == rsa_keys["key-1"][1]["n"]
+    assert len(requests) == 1
+    assert store._in_flight == {}
+
+@pytest.mark.asyncio
+async def test_verify_jwt_uses_result_cache(rsa_keys):
+    """
+    Повторная проверка того же токена не выполняет проверку подписи.
+    """
+    private_pem, public_jwk = rsa_keys["key-1"]
+    store, _ = _jwks_store({"key-1": public_jwk})
+    token = jwt.encode({"sub": "bank", "exp": int(time.time()) + 600}, private_pem, algorithm="RS256", headers={"kid": "key-1"})
+
+    auth_manager = OAuth2AuthManager()
+    with patch("app.auth_manager.services._jwks_store", store):
+        assert (await auth_manager.verify_jwt(token, BANK_API_URL))["sub"] == "bank"
+        with patch("app.auth_manager.services.jwt.decode") as mock_decode:
+            assert (await auth_manager.verify_jwt(token, BANK_API_URL))["sub"] == "bank"
+            mock_decode.assert_not_called()
+
+    stats = auth_manager.get_jwt_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["size"] == 1
+
+def test_jwt_cache_expiry_and_eviction():
+    """
+    Запись истекает в момент exp токена, а при переполнении вытесняется давно неиспользованная.
+    """
+    cache = VerifiedJWTCache(max_size=2)
+    now = time.time()
+    cache.put("expired", BANK_API_URL, {"exp": now - 1})
+    assert cache.get("expired", BANK_API_URL) is None
+
+    cache.put("no-exp", BANK_API_URL, {"sub": "bank"})
+    assert cache.get("no-exp", BANK_API_URL) is None
+
+    cache.put("a", BANK_API_URL, {"exp": now + 60})
+    cache.put("b", BANK_API_URL, {"exp": now + 60})
+    assert cache.get("a", BANK_API_URL) is not None
+    cache.put("c", BANK_API_URL, {"exp": now + 60})
+    assert cache.get("b", BANK_API_URL) is None
+    assert cache.get("a", BANK_API_URL) is not None
+    assert cache.get("a", "http://otherbank.com") is None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["expirations"] == 1
+    assert stats["size"] == 2
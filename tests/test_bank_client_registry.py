@@ -0,0 +1,91 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from main import app
+from app.core.config import BankTransportProfile
+from app.banks.vbank_client import VBankClient
+from app.utils.bank_clients import BankClientRegistry, get_bank_client_registry
+
+
+@pytest.fixture
+def registry():
+    """Фикстура для изолированного реестра клиентов банков."""
+    return BankClientRegistry()
+
+
+def test_registry_reuses_client(registry):
+    """
+    Реестр возвращает один и тот же долгоживущий клиент для одного банка.
+    """
+    client = registry.get("vbank")
+    assert isinstance(client, VBankClient)
+    assert registry.get("vbank") is client
+    assert registry.get("abank") is not client
+
+
+def test_registry_unsupported_bank(registry):
+    """
+    Для неизвестного банка реестр возвращает ошибку 400, как и прежде.
+    """
+    with pytest.raises(HTTPException) as exc_info:
+        registry.get("unknown")
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_registry_aclose_closes_clients(registry):
+    """
+    При закрытии реестра HTTP-клиенты закрываются, а реестр очищается.
+    """
+    client = registry.get("vbank")
+    await registry.aclose()
+    assert client._async_client.is_closed
+    assert registry.stats() == {}
+    assert registry.get("vbank") is not client
+
+
+def test_registry_stats(registry):
+    """
+    Статистика пула содержит счетчики соединений и сэкономленных хэндшейков.
+    """
+    registry.get("vbank")
+    stats = registry.stats()
+    assert set(stats) == {"vbank"}
+    assert stats["vbank"] == {
+        "idle_connections": 0,
+        "active_connections": 0,
+        "requests_sent": 0,
+        "connections_opened": 0,
+        "handshakes_avoided": 0,
+    }
+
+
+def test_api_bank_clients_stats(registry):
+    """
+    Интеграционный тест служебного эндпоинта статистики пулов.
+    """
+    registry.get("sbank")
+    app.dependency_overrides[get_bank_client_registry] = lambda: registry
+    try:
+        response = TestClient(app).get("/api/v1/admin/bank-clients/stats")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert "sbank" in response.json()["bank_clients"]
+
+
+def test_client_uses_bank_transport_profile():
+    """
+    HTTP-клиент банка строится из его профиля транспорта.
+    """
+    profile = BankTransportProfile(max_connections=7, max_keepalive_connections=3, keepalive_expiry=30.0, read_timeout=42.0)
+    client = VBankClient(client_id="id", client_secret="secret", api_url="http://mockbank.com", transport_profile=profile)
+
+    timeout = client._async_client.timeout
+    assert timeout.read == 42.0
+    assert timeout.connect == profile.connect_timeout
+    pool = client._async_client._transport._pool
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 3
+    assert pool._keepalive_expiry == 30.0
@@ -0,0 +1,113 @@
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from main import app
+from app.banks.resilience import CircuitBreaker, ResilientHTTPTransport
+from app.utils.bank_clients import BankClientRegistry, get_bank_client_registry
+
+
+def make_transport(circuit_breaker: CircuitBreaker, retry_attempts: int = 3) -> ResilientHTTPTransport:
+    return ResilientHTTPTransport(circuit_breaker=circuit_breaker, retry_attempts=retry_attempts, retry_base_delay=0, retry_max_delay=0)
+
+
+def upstream(*outcomes):
+    """
+    Подменяет сетевой транспорт последовательностью ответов/исключений.
+    """
+    return patch.object(httpx.AsyncHTTPTransport, "handle_async_request", side_effect=list(outcomes))
+
+
+@pytest.mark.asyncio
+async def test_get_is_retried_on_gateway_errors():
+    """
+    GET повторяется после 503 и сетевой ошибки, пока банк не ответит успешно.
+    """
+    transport = make_transport(CircuitBreaker(failure_threshold=10))
+    with upstream(httpx.Response(503), httpx.ConnectError("boom"), httpx.Response(200, json={"ok": True})) as mock_send:
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get("http://mockbank.com/accounts")
+
+    assert response.status_code == 200
+    assert mock_send.call_count == 3
+    assert transport.stats()["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_post_is_not_retried():
+    """
+    Неидемпотентные запросы не повторяются: повтор POST мог бы создать платеж дважды.
+    """
+    transport = make_transport(CircuitBreaker(failure_threshold=10))
+    with upstream(httpx.Response(503), httpx.Response(200)) as mock_send:
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.post("http://mockbank.com/payments", json={})
+
+    assert response.status_code == 503
+    assert mock_send.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_and_recovers_via_half_open():
+    """
+    После серии ошибок запросы отклоняются без обращения к банку,
+    а после reset_timeout пробный запрос закрывает breaker.
+    """
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+    transport = make_transport(breaker, retry_attempts=1)
+    async with httpx.AsyncClient(transport=transport) as client:
+        with upstream(httpx.ReadTimeout("slow"), httpx.Response(500)):
+            with pytest.raises(httpx.ReadTimeout):
+                await client.get("http://mockbank.com/accounts")
+            await client.get("http://mockbank.com/accounts")
+        assert breaker.state == CircuitBreaker.OPEN
+
+        with upstream() as mock_send:
+            response = await client.get("http://mockbank.com/accounts")
+        mock_send.assert_not_called()
+        assert response.status_code == 503
+        assert response.headers["X-Circuit-Breaker"] == "open"
+        assert int(response.headers["Retry-After"]) > 0
+
+        # Время ожидания истекло: пропускается один пробный запрос
+        breaker._opened_at -= 30.0
+        with upstream(httpx.Response(200)):
+            response = await client.get("http://mockbank.com/accounts")
+        assert response.status_code == 200
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    stats = breaker.stats()
+    assert stats["rejected"] == 1
+    assert stats["times_opened"] == 1
+
+
+def test_half_open_failure_reopens_breaker():
+    """
+    Ошибка пробного запроса снова открывает breaker; параллельные запросы во время пробы отклоняются.
+    """
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()["times_opened"] == 2
+
+
+def test_api_circuit_breakers_endpoint():
+    """
+    Состояние breaker-ов доступно через служебный эндпоинт.
+    """
+    registry = BankClientRegistry()
+    registry.get("vbank")
+    app.dependency_overrides[get_bank_client_registry] = lambda: registry
+    try:
+        response = TestClient(app).get("/api/v1/admin/bank-clients/circuit-breakers")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    vbank = response.json()["circuit_breakers"]["vbank"]
+    assert vbank["state"] == "closed"
+    assert vbank["retries"] == 0
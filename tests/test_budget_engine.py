@@ -0,0 +1,126 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.analytics.budget import BudgetEngine
+from app.ui_connector import mappers, schemas
+
+NOW = datetime(2025, 3, 11, 12, 0, tzinfo=timezone.utc) # 11-й день 31-дневного месяца
+
+
+def transaction(transaction_id, date, amount, category):
+    return schemas.Transaction(
+        id=transaction_id,
+        date=date,
+        description=category,
+        amount=amount,
+        type="income" if amount > 0 else "expense",
+        category=category,
+        accountId="acc-1",
+    )
+
+
+def history():
+    transactions = []
+    for month, salary in ((12, 90000), (1, 100000), (2, 110000)):
+        year = 2024 if month == 12 else 2025
+        transactions.append(transaction(f"salary-{month}", f"{year}-{month:02d}-05T09:00:00Z", salary, "Зарплата"))
+        transactions.append(transaction(f"food-{month}", f"{year}-{month:02d}-10T09:00:00Z", -30000, "Супермаркеты"))
+    transactions += [
+        transaction("m-1", "2025-03-02T10:00:00Z", -11000, "Супермаркеты"),
+        transaction("m-2", "2025-03-05T10:00:00Z", -5500, "Рестораны"),
+        transaction("m-3", "2025-03-06T10:00:00Z", -20000, "Накопления"),
+        transaction("m-4", "2025-03-07T10:00:00Z", 100000, "Зарплата"),
+    ]
+    return transactions
+
+
+def test_plan_is_computed_from_transactions():
+    """
+    Доход — среднее за три полных месяца, расходы разложены по конвертам, прогноз — по темпу трат.
+    """
+    engine = BudgetEngine()
+    assert engine.update("user-1", history()) == 10
+
+    plan = engine.plan("user-1", now=NOW)
+    assert plan.total_monthly_income == 100000
+    assert plan.days_remaining_in_month == 21
+
+    envelopes = {envelope.type: envelope for envelope in plan.envelopes}
+    assert envelopes["essentials"].allocated_amount == 50000
+    assert envelopes["essentials"].spent_amount == 11000
+    assert envelopes["essentials"].forecasted_amount == 31000 # 11000 / 11 дней * 31 день
+    assert envelopes["wants"].spent_amount == 5500
+    assert envelopes["wants"].forecasted_amount == 15500
+    assert envelopes["savings"].forecasted_amount == 20000 # Накопления не экстраполируются
+    # (50000 + 30000 - 11000 - 5500) / 21 день
+    assert plan.safe_daily_spend == 3023
+    assert plan.insights == ["Вы отлично справляетесь с накоплениями!"]
+
+
+def test_update_is_incremental_and_skips_seen_transactions():
+    engine = BudgetEngine()
+    engine.update("user-1", history())
+    assert engine.update("user-1", history()) == 0
+
+    added = engine.update("user-1", history() + [transaction("m-5", "2025-03-10T10:00:00Z", -40000, "Рестораны")])
+    assert added == 1
+
+    plan = engine.plan("user-1", now=NOW)
+    wants = next(envelope for envelope in plan.envelopes if envelope.type == "wants")
+    assert wants.spent_amount == 45500
+    assert any("Развлечения и Хотелки" in insight and "превысят план" in insight for insight in plan.insights)
+
+
+def test_update_tells_apart_same_ids_from_different_banks_and_missing_ids():
+    def payload(transaction_id, amount, information):
+        raw = {
+            "bookingDateTime": "2025-03-05T10:00:00Z",
+            "amount": {"amount": str(amount), "currency": "RUB"},
+            "creditDebitIndicator": "Debit",
+            "transactionInformation": information,
+        }
+        if transaction_id:
+            raw["transactionId"] = transaction_id
+        return raw
+
+    engine = BudgetEngine()
+    first_sync = [
+        mappers.map_transaction("vbank", "acc-1", payload("tx-1", 1000, "Перекресток"), "Супермаркеты"),
+        mappers.map_transaction("vbank", "acc-1", payload(None, 2000, "Пятерочка"), "Супермаркеты"),
+    ]
+    assert engine.update("user-1", first_sync) == 2
+
+    second_sync = first_sync + [
+        mappers.map_transaction("abank", "acc-2", payload("tx-1", 3000, "Ашан"), "Супермаркеты"),
+        mappers.map_transaction("abank", "acc-2", payload(None, 4000, "Лента"), "Супермаркеты"),
+    ]
+    assert engine.update("user-1", second_sync) == 2
+
+    plan = engine.plan("user-1", now=NOW)
+    essentials = next(envelope for envelope in plan.envelopes if envelope.type == "essentials")
+    assert essentials.spent_amount == 10000
+
+
+def test_plan_for_years_of_history_stays_fast():
+    """
+    Пять лет истории обрабатываются один раз; новые транзакции и расчет плана не зависят от длины истории.
+    """
+    start = datetime(2020, 3, 1, tzinfo=timezone.utc)
+    categories = ["Супермаркеты", "Рестораны", "Такси", "АЗС", "Накопления"]
+    transactions = [
+        transaction(f"t{i}", (start + timedelta(hours=2 * i)).isoformat(), -float(100 + i % 900), categories[i % 5])
+        for i in range(22_000)
+    ]
+    engine = BudgetEngine()
+
+    started = time.perf_counter()
+    engine.update("user-1", transactions)
+    initial = time.perf_counter() - started
+
+    started = time.perf_counter()
+    engine.update("user-1", [transaction("new", "2025-03-10T10:00:00Z", -100.0, "Рестораны")])
+    engine.plan("user-1", now=NOW)
+    incremental = time.perf_counter() - started
+
+    assert initial < 2
+    assert incremental < 0.05
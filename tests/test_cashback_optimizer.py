@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.analytics.cashback import CardProgram, CashbackOptimizer
+from app.ui_connector import schemas
+
+NOW = datetime(2025, 6, 20, 12, 0, tzinfo=timezone.utc)
+
+PROGRAMS = (
+    CardProgram("a_debit", "A Дебетовая", "ABank", {"Рестораны": 5, "Такси": 3}, 1.0),
+    CardProgram("b_debit", "B Дебетовая", "BBank", {"Супермаркеты": 4}, 0.5),
+    CardProgram("a_premium", "A Premium", "ABank", {"Рестораны": 10}, 1.5, product_id="a-premium", offered=True),
+    CardProgram("b_family", "B Семейная", "BBank", {"Супермаркеты": 8, "Аптеки": 5}, 0.5, offered=True),
+)
+
+
+def account(bank_name, account_type="debit"):
+    return schemas.Account(id=f"{bank_name}-acc", name="Счет", bankName=bank_name, last4="0000", balance=0, type=account_type, brandColor="#000")
+
+
+def expense(transaction_id, amount, category, date="2025-06-01T10:00:00Z"):
+    return schemas.Transaction(id=transaction_id, date=date, description=category, amount=-amount, type="expense", category=category)
+
+
+def test_matrix_and_best_card_index():
+    optimizer = CashbackOptimizer(PROGRAMS)
+    matrix = optimizer.matrix
+    assert matrix.categories == ["Аптеки", "Рестораны", "Супермаркеты", "Такси", "*"]
+    # Для категорий вне условий программы действует базовая ставка
+    assert matrix.rates[matrix.row("Аптеки")].tolist() == [1.0, 0.5, 1.5, 5.0]
+    assert matrix.row("Неизвестная категория") == matrix.row("*")
+
+    program, rate = optimizer.best_card("Рестораны")
+    assert (program.id, rate) == ("a_premium", 10)
+    program, rate = optimizer.best_card("Кино")
+    assert (program.id, rate) == ("a_premium", 1.5)
+
+
+def test_best_card_among_user_cards():
+    optimizer = CashbackOptimizer(PROGRAMS)
+    assert optimizer.best_card("Рестораны", "user-1") == (None, 0.0)
+
+    optimizer.update_user("user-1", accounts=[account("ABank"), account("BBank", "savings")])
+    assert [program.id for program in (optimizer.best_card(category, "user-1")[0] for category in ("Рестораны", "Супермаркеты"))] == ["a_debit", "a_debit"]
+
+    # Договор по продукту означает, что карта Premium у пользователя есть
+    agreement = schemas.ProductAgreementSummary(id="ag-1", productId="a-premium", bankName="ABank", status="Active", openDate="2025-01-01")
+    cards = [schemas.Card(id="card-1", bankName="BBank", last4="1111", status="active", type="debit")]
+    optimizer.update_user("user-1", accounts=[account("ABank")], cards=cards, agreements=[agreement])
+    assert optimizer.best_card("Рестораны", "user-1")[0].id == "a_premium"
+    assert optimizer.best_card("Супермаркеты", "user-1") == (PROGRAMS[1], 4.0)
+
+    categories = {category.bank_name: category.categories for category in optimizer.cashback_categories("user-1")}
+    assert categories == {"ABank": {"Рестораны": 10, "Такси": 3}, "BBank": {"Супермаркеты": 4}}
+
+
+def test_score_is_uplift_over_user_cards():
+    optimizer = CashbackOptimizer(PROGRAMS)
+    optimizer.update_user("user-1", accounts=[account("ABank")])
+    spend = optimizer.matrix.spend_vector({"Супермаркеты": 10000, "Рестораны": 2000, "Кино": 1000})
+
+    gains = optimizer.score("user-1", spend)
+    # B Дебетовая: (4% - 1%) * 10000; Premium: (10% - 5%) * 2000 + (1.5% - 1%) * (10000 + 1000); Семейная: (8% - 1%) * 10000
+    assert np.allclose(gains, [0, 300, 155, 700])
+
+
+def test_recommend_offers_by_historical_spend():
+    optimizer = CashbackOptimizer(PROGRAMS)
+    optimizer.update_user("user-1", accounts=[account("ABank")])
+    transactions = [
+        expense("t1", 30000, "Супермаркеты"),
+        expense("t2", 6000, "Рестораны"),
+        expense("old", 900000, "Рестораны", "2024-01-01T10:00:00Z"), # Вне периода
+    ]
+    offers = optimizer.recommend("user-1", transactions, now=NOW)
+    assert [offer.id for offer in offers] == ["b_family", "a_premium"]
+    # 30000 за 90 дней -> 10000 в месяц, прирост 7%
+    assert offers[0].benefits[-1] == "≈ 700 ₽ дополнительного кэшбэка в месяц по вашим тратам"
+    assert offers[0].cashback_rates == {"Супермаркеты": 8, "Аптеки": 5}
+
+
+def test_best_card_endpoint(client):
+    response = client.get("/api/v1/aggregator/cashback/best-card", params={"category": "Рестораны"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ownCard"] is None
+    assert body["bestCard"]["id"] == "rec_card_1"
+    assert body["bestCard"]["rate"] == 10
@@ -0,0 +1,68 @@
+import numpy as np
+
+from app.analytics.categorizer import AhoCorasick, Categorizer, CategoryRule, categorizer, synthetic_descriptions
+
+
+def test_automaton_finds_all_overlapping_patterns():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    assert sorted(automaton.search("ushers")) == [(1, 1), (2, 0), (2, 3)]
+
+
+def test_rules_respect_word_boundaries_and_priority():
+    engine = Categorizer()
+    assert engine.categorize("PYATEROCHKA 1234 MOSCOW") == "Супермаркеты"
+    assert engine.categorize("Оплата в кафе Ромашка") == "Рестораны"
+    assert engine.categorize("Зачисление заработной платы") == "Зарплата"
+    # Контрагент совпадает только целым словом: TELE2 — связь, Telegram — нет
+    assert engine.categorize("TELE2 оплата") == "Связь"
+    assert engine.categorize("Telegram Premium") == "Прочее"
+    # Контрагент важнее ключевого слова
+    assert engine.categorize("Перевод YANDEX GO") == "Такси"
+    assert engine.categorize(None) == "Прочее"
+
+
+def test_bank_category_and_user_overrides():
+    engine = Categorizer(rules=[CategoryRule("coffee", "Рестораны", "keyword")])
+    assert engine.categorize("Coffee Like 12", bank_category="Кафе") == "Кафе"
+
+    engine.set_override("user-1", "coffee like", "Кофе")
+    assert engine.categorize("COFFEE LIKE 12", "user-1", "Кафе") == "Кофе"
+    assert engine.categorize("COFFEE LIKE 12", "user-2") == "Рестораны"
+    assert engine.get_overrides("user-1") == {"coffee like": "Кофе"}
+
+    assert engine.remove_override("user-1", "Coffee Like")
+    assert engine.categorize("COFFEE LIKE 12", "user-1") == "Рестораны"
+
+
+def test_batch_categorizes_each_unique_description_once():
+    engine = Categorizer()
+    descriptions = np.array(["PYATEROCHKA 1", "PYATEROCHKA 2", "Аптека", "PYATEROCHKA 1", None], dtype=object)
+    categories = engine.categorize_many(descriptions, bank_categories=[None, "", None, None, "Переводы"])
+    assert categories.tolist() == ["Супермаркеты", "Супермаркеты", "Аптеки", "Супермаркеты", "Переводы"]
+    # Повтор в пакете не обрабатывается; номер терминала отбрасывается, и второе описание берется из памяти
+    assert engine.stats()["memo_misses"] == 2
+    assert engine.stats()["memo_hits"] == 1
+
+
+def test_memo_is_bounded():
+    engine = Categorizer(memo_size=2)
+    engine.categorize_many(["Аптека", "Кафе", "Такси"])
+    assert engine.stats()["memo_size"] == 2
+
+
+def test_benchmark_reports_rows_per_second():
+    result = Categorizer().benchmark(synthetic_descriptions(200_000))
+    assert result["rows"] == 200_000
+    assert result["rows_per_second"] > 100_000
+
+
+def test_category_override_endpoint(client):
+    response = client.put("/api/v1/data/categories/overrides", json={"user_id": "user-1", "pattern": "Coffee Like", "category": "Кофе"})
+    assert response.status_code == 200
+    assert response.json()["overrides"] == {"coffee like": "Кофе"}
+    assert categorizer.categorize("COFFEE LIKE 7", "user-1") == "Кофе"
+
+    assert client.put("/api/v1/data/categories/overrides", json={"user_id": "user-1", "pattern": "123", "category": "Кофе"}).status_code == 400
+
+    client.put("/api/v1/data/categories/overrides", json={"user_id": "user-1", "pattern": "coffee like"})
+    assert client.get("/api/v1/data/categories/overrides", params={"user_id": "user-1"}).json() == {"overrides": {}}
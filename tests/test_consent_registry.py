@@ -0,0 +1,159 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.core.config import settings
+from app.db import crud
+from app.mcp.consent_registry import ConsentRegistry, DEFAULT_CONSENT_PERMISSIONS
+from app.mcp.services import MCPService
+from app.auth_manager.services import BaseAuthManager
+from httpx import HTTPStatusError, Request, Response
+
+
+def mock_auth_manager():
+    auth_manager = MagicMock(spec=BaseAuthManager)
+    auth_manager.get_access_token = AsyncMock(return_value="mock_access_token")
+    return auth_manager
+
+
+def bank_client_creating_consents():
+    """
+    Мок клиента банка, выдающий согласия consent-1, consent-2, ...
+    """
+    client = MagicMock()
+    created = []
+
+    async def create_consent(access_token, permissions, user_id):
+        await asyncio.sleep(0.01)
+        created.append(permissions)
+        return f"consent-{len(created)}"
+
+    client.create_consent = AsyncMock(side_effect=create_consent)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_consent_is_created_once_and_reused(session):
+    """
+    Одновременные запросы без согласия создают в банке одно согласие, следующие запросы читают его из БД.
+    """
+    bank_client = bank_client_creating_consents()
+    registry = ConsentRegistry(session, mock_auth_manager())
+    with patch("app.mcp.consent_registry.get_bank_client", return_value=bank_client):
+        consent_ids = await asyncio.gather(*[registry.get_consent_id("vbank", "reuse-user") for _ in range(5)])
+        again = await registry.get_consent_id("vbank", "reuse-user")
+
+    assert set(consent_ids) == {"consent-1"}
+    assert again == "consent-1"
+    bank_client.create_consent.assert_called_once_with("mock_access_token", DEFAULT_CONSENT_PERMISSIONS["accounts"], "reuse-user")
+    consent = await crud.get_consent(session, "vbank", "reuse-user", "accounts")
+    assert consent.status == "active"
+    assert crud.as_utc(consent.expires_at) > datetime.now(timezone.utc) + timedelta(days=300)
+
+
+@pytest.mark.asyncio
+async def test_expiring_and_revoked_consents_are_recreated(session):
+    """
+    Согласие создается заново, если оно истекает в пределах CONSENT_RENEWAL_MARGIN или отозвано.
+    """
+    bank_client = bank_client_creating_consents()
+    registry = ConsentRegistry(session, mock_auth_manager())
+    now = datetime.now(timezone.utc)
+    await crud.save_consent(
+        session, "vbank", "renew-user", "accounts", "old-consent", ["ReadAccountsDetail"],
+        now - timedelta(days=365), now + timedelta(seconds=settings.CONSENT_RENEWAL_MARGIN // 2),
+    )
+
+    with patch("app.mcp.consent_registry.get_bank_client", return_value=bank_client):
+        renewed = await registry.get_consent_id("vbank", "renew-user")
+        assert renewed == "consent-1"
+
+        assert await registry.revoke("vbank", renewed)
+        recreated = await registry.get_consent_id("vbank", "renew-user")
+
+    assert recreated == "consent-2"
+    assert bank_client.create_consent.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_registered_consent_is_reused_by_mcp(session):
+    """
+    Согласие, созданное вызывающим кодом, попадает в реестр и используется MCP без обращения к банку за новым.
+    """
+    bank_client = bank_client_creating_consents()
+    bank_client.get_cards = AsyncMock(return_value=[])
+    auth_manager = mock_auth_manager()
+    await ConsentRegistry(session, auth_manager).register("vbank", "registered-user", "user-consent", ["ReadAccountsDetail"])
+
+    with patch("app.mcp.services.get_bank_client", return_value=bank_client), \
+         patch("app.mcp.consent_registry.get_bank_client", return_value=bank_client):
+        result = await MCPService(db=session, auth_manager=auth_manager).get_cards("vbank", "registered-user", None)
+
+    assert result.status == "success"
+    bank_client.create_consent.assert_not_called()
+    bank_client.get_cards.assert_called_once_with("mock_access_token", "registered-user", "user-consent")
+
+
+@pytest.mark.asyncio
+async def test_consent_rejected_by_bank_is_marked_revoked(session):
+    """
+    Если банк отклоняет согласие из реестра (403), оно помечается отозванным и следующий запрос создает новое.
+    """
+    bank_client = bank_client_creating_consents()
+    forbidden = HTTPStatusError("Forbidden", request=Request("GET", "http://bank/cards"), response=Response(403, json={"detail": "consent revoked"}))
+    bank_client.get_cards = AsyncMock(side_effect=[forbidden, []])
+    mcp_service = MCPService(db=session, auth_manager=mock_auth_manager())
+
+    with patch("app.mcp.services.get_bank_client", return_value=bank_client), \
+         patch("app.mcp.consent_registry.get_bank_client", return_value=bank_client):
+        rejected = await mcp_service.get_cards("vbank", "rejected-user", None)
+        retried = await mcp_service.get_cards("vbank", "rejected-user", None)
+
+    assert rejected.status == "failed"
+    assert rejected.error == "403"
+    assert retried.status == "success"
+    assert [call.args[2] for call in bank_client.get_cards.call_args_list] == ["consent-1", "consent-2"]
+
+
+@pytest.mark.asyncio
+async def test_product_agreements_use_product_agreement_consent(session):
+    """
+    Договоры по продуктам запрашиваются с согласием на договоры, а не с согласием на счета.
+    """
+    bank_client = bank_client_creating_consents()
+    bank_client.create_product_agreement_consent = AsyncMock(return_value="agreements-consent")
+    bank_client.products.get_product_agreements = AsyncMock(return_value=[])
+    await ConsentRegistry(session, mock_auth_manager()).register("vbank", "agreements-user", "accounts-consent", ["ReadAccountsDetail"])
+
+    with patch("app.mcp.services.get_bank_client", return_value=bank_client), \
+         patch("app.mcp.consent_registry.get_bank_client", return_value=bank_client):
+        result = await MCPService(db=session, auth_manager=mock_auth_manager()).get_product_agreements("vbank", "agreements-user", None)
+
+    assert result.status == "success"
+    bank_client.create_consent.assert_not_called()
+    bank_client.products.get_product_agreements.assert_called_once_with("mock_access_token", "agreements-consent", "agreements-user")
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_consent_creation(session):
+    """
+    Создание согласия выполняется в своей сессии БД: отмена запроса, начавшего его, не мешает остальным ожидающим.
+    """
+    bank_client = bank_client_creating_consents()
+    auth_manager = mock_auth_manager()
+    registry = ConsentRegistry(session, auth_manager)
+    with patch("app.mcp.consent_registry.get_bank_client", return_value=bank_client):
+        leader = asyncio.create_task(registry.get_consent_id("vbank", "cancel-user"))
+        while not bank_client.create_consent.called:
+            await asyncio.sleep(0.001)
+        waiter = asyncio.create_task(registry.get_consent_id("vbank", "cancel-user"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        consent_id = await waiter
+
+    assert leader.cancelled()
+    assert consent_id == "consent-1"
+    bank_client.create_consent.assert_called_once()
+    assert auth_manager.get_access_token.call_args.args[0] is not session
+    assert (await crud.get_consent(session, "vbank", "cancel-user", "accounts")).consent_id == "consent-1"
@@ -0,0 +1,88 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from httpx import HTTPStatusError, Request, Response
+
+from app.mcp.schemas import AccountDataRequest
+from app.mcp.services import MCPService
+from app.auth_manager.services import BaseAuthManager
+
+
+def batch_bank_client():
+    """
+    Мок клиента банка: балансы счета acc-bad недоступны, транзакции есть у всех счетов.
+    """
+    client = MagicMock()
+
+    async def get_account_balances(access_token, consent_id, user_id, account_id):
+        if account_id == "acc-bad":
+            raise HTTPStatusError("Not Found", request=Request("GET", "http://bank/balances"), response=Response(404, json={"detail": "not found"}))
+        return [{"type": "InterimAvailable", "amount": {"amount": "100.00"}}]
+
+    async def get_account_transactions(access_token, consent_id, user_id, account_id, from_booking_date=None):
+        return [{"transactionId": f"{account_id}-t1", "bookingDateTime": "2025-01-01T10:00:00Z"}]
+
+    client.accounts.get_account_balances = AsyncMock(side_effect=get_account_balances)
+    client.accounts.get_account_transactions = AsyncMock(side_effect=get_account_transactions)
+    client.accounts.get_account_details = AsyncMock(return_value={"accountId": "acc-1"})
+    return client
+
+
+@pytest.mark.asyncio
+async def test_accounts_data_runs_unique_operations_and_keeps_errors_per_item(session):
+    """
+    Повторяющиеся операции выполняются один раз, результаты возвращаются по счету и операции,
+    ошибка одной операции не влияет на остальные.
+    """
+    auth_manager = MagicMock(spec=BaseAuthManager)
+    auth_manager.get_access_token = AsyncMock(return_value="mock_access_token")
+    bank_client = batch_bank_client()
+    requests = [
+        AccountDataRequest(bank_name="VBank", account_id="acc-1", operations=["details", "balances", "transactions"]),
+        AccountDataRequest(bank_name="vbank", account_id="acc-1", operations=["balances"]),
+        AccountDataRequest(bank_name="vbank", account_id="acc-bad"),
+    ]
+
+    with patch("app.mcp.services.get_bank_client", return_value=bank_client), \
+         patch("app.mcp.transaction_store.get_bank_client", return_value=bank_client):
+        results = await MCPService(db=session, auth_manager=auth_manager).get_accounts_data(
+            requests, "batch-user", {"vbank": "consent-v"}
+        )
+
+    assert set(results) == {"vbank:acc-1", "vbank:acc-bad"}
+    assert set(results["vbank:acc-1"]) == {"details", "balances", "transactions"}
+    assert results["vbank:acc-1"]["balances"].status == "success"
+    assert results["vbank:acc-1"]["transactions"].data[0]["transactionId"] == "acc-1-t1"
+    assert results["vbank:acc-bad"]["balances"].status == "failed"
+    assert results["vbank:acc-bad"]["balances"].error == "404"
+    assert results["vbank:acc-bad"]["transactions"].status == "success"
+    assert bank_client.accounts.get_account_balances.await_count == 2
+
+
+def test_api_batch_endpoint(client):
+    """
+    Эндпоинт пакетного запроса возвращает карту результатов и число неуспешных операций.
+    """
+    bank_client = batch_bank_client()
+    with patch("app.mcp.services.get_bank_client", return_value=bank_client), \
+         patch("app.mcp.transaction_store.get_bank_client", return_value=bank_client):
+        response = client.post(
+            "/api/v1/data/batch",
+            json={
+                "user_id": "batch-api-user",
+                "consents": {"vbank": "consent-v"},
+                "items": [
+                    {"bank_name": "vbank", "account_id": "acc-2", "operations": ["balances", "transactions"]},
+                    {"bank_name": "vbank", "account_id": "acc-bad", "operations": ["balances"]},
+                ],
+            },
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["failed"] == 1
+    assert data["results"]["vbank:acc-2"]["balances"]["status"] == "success"
+    assert data["results"]["vbank:acc-2"]["transactions"]["data"][0]["transactionId"] == "acc-2-t1"
+    assert data["results"]["vbank:acc-bad"]["balances"]["error"] == "404"
+
+    assert client.post("/api/v1/data/batch", json={"user_id": "batch-api-user", "items": []}).status_code == 422
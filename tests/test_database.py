@@ -0,0 +1,54 @@
+import pytest
+
+from app.core.config import DatabaseEngineProfile
+from app.db.database import get_async_database_url, create_database_engine, _engine_options
+from app.db.pool import MeteredAsyncQueuePool, pool_metrics
+
+
+def test_async_database_url_selects_driver():
+    """
+    Драйвер асинхронного движка выбирается по схеме DATABASE_URL.
+    """
+    assert get_async_database_url("sqlite:///./app.db").drivername == "sqlite+aiosqlite"
+    assert get_async_database_url("postgresql://user:pass@db/app").drivername == "postgresql+asyncpg"
+    assert get_async_database_url("postgresql+psycopg2://user:pass@db/app").drivername == "postgresql+asyncpg"
+    # Уже асинхронный URL не меняется
+    assert get_async_database_url("sqlite+aiosqlite:///./app.db").drivername == "sqlite+aiosqlite"
+
+
+def test_engine_options_per_dialect():
+    """
+    Параметры пула PostgreSQL берутся из профиля, in-memory SQLite остается со стандартным пулом.
+    """
+    profile = DatabaseEngineProfile(pool_size=7, max_overflow=3, pool_recycle=600)
+    pg_options = _engine_options(get_async_database_url("postgresql://user:pass@db/app"), profile)
+    assert pg_options["poolclass"] is MeteredAsyncQueuePool
+    assert (pg_options["pool_size"], pg_options["max_overflow"], pg_options["pool_recycle"]) == (7, 3, 600)
+    assert pg_options["pool_pre_ping"] is True
+    assert "connect_args" not in pg_options
+
+    sqlite_options = _engine_options(get_async_database_url("sqlite:///./app.db"), profile)
+    assert "pool_recycle" not in sqlite_options
+    assert sqlite_options["connect_args"] == {"timeout": 5.0}
+    assert _engine_options(get_async_database_url("sqlite://"), profile) == {}
+
+
+@pytest.mark.asyncio
+async def test_sqlite_engine_applies_pragmas_and_meters_checkouts(tmp_path):
+    """
+    Новые соединения SQLite получают WAL и synchronous=NORMAL, а выдачи из пула учитываются в метриках.
+    """
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'pragmas.db'}", DatabaseEngineProfile())
+    checkouts_before = pool_metrics.stats()["checkouts"]
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar() == "wal"
+            # 1 == NORMAL
+            assert (await conn.exec_driver_sql("PRAGMA synchronous")).scalar() == 1
+            assert pool_metrics.stats(engine.pool)["checked_out"] == 1
+    finally:
+        await engine.dispose()
+
+    stats = pool_metrics.stats()
+    assert stats["checkouts"] == checkouts_before + 1
+    assert stats["max_wait_ms"] >= stats["last_wait_ms"] >= 0
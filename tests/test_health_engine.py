@@ -0,0 +1,150 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.analytics.health import HealthEngine
+from app.ui_connector import mappers, schemas
+
+NOW = datetime(2025, 7, 11, 12, 0, tzinfo=timezone.utc)
+
+
+def transaction(transaction_id, date, amount, category):
+    return schemas.Transaction(
+        id=transaction_id,
+        date=date,
+        description=category,
+        amount=amount,
+        type="income" if amount > 0 else "expense",
+        category=category,
+        accountId="acc-1",
+    )
+
+
+def account(account_id, balance, account_type):
+    return schemas.Account(id=account_id, name=account_id, bankName="VBank", last4="0000", balance=balance, type=account_type, brandColor="#000")
+
+
+def loan(monthly_payment):
+    return schemas.Loan(
+        id="loan-1", name="Кредит", bankName="VBank", remainingAmount=100000, interestRate=10,
+        monthlyPayment=monthly_payment, nextPaymentDate="2025-07-20", linkedAccountId="acc-1",
+    )
+
+
+def history():
+    """
+    Полгода: зарплата 100 000, расходы 60 000 и перевод в накопления 20 000 каждый месяц.
+    """
+    transactions = []
+    for month in range(1, 7):
+        transactions.append(transaction(f"salary-{month}", f"2025-{month:02d}-05T09:00:00Z", 100000, "Зарплата"))
+        transactions.append(transaction(f"food-{month}", f"2025-{month:02d}-10T09:00:00Z", -60000, "Супермаркеты"))
+        transactions.append(transaction(f"save-{month}", f"2025-{month:02d}-15T09:00:00Z", -20000, "Накопления"))
+    return transactions
+
+
+def test_score_is_computed_from_accounts_loans_and_transactions():
+    engine = HealthEngine()
+    assert engine.update("user-1", history()) == 18
+
+    health = engine.score(
+        "user-1",
+        accounts=[account("savings", 180000, "savings"), account("credit", -40000, "credit")],
+        loans=[loan(13000)],
+        now=NOW,
+    )
+    components = {component.category: component for component in health.components}
+    assert components["spending"].score == 30 # Расходы 60% дохода
+    # Платежи 13 000 + 5% от 40 000 = 15% дохода
+    assert components["debt"].score == 30
+    assert "15%" in components["debt"].advice
+    # Откладывается 20% дохода, накоплений хватит на 3 месяца: (1 + 0.5) / 2 * 20
+    assert components["savings"].score == 15
+    assert components["regularity"].score == 20
+    assert health.total_score == 95
+
+    badges = {badge.name: badge.unlocked for badge in health.badges}
+    assert badges == {"Зарплатник": True, "Сберегатель": True, "Уничтожитель долгов": False, "Инвестор": False}
+    assert [reward.is_locked for reward in health.rewards] == [False, False, False]
+
+
+def test_update_is_incremental_and_changes_score():
+    engine = HealthEngine()
+    engine.update("user-1", history())
+    assert engine.update("user-1", history()) == 0
+
+    before = engine.score("user-1", loans=[loan(35000)], now=NOW)
+    debt = next(component for component in before.components if component.category == "debt")
+    assert debt.status == "fair" # 35% дохода
+
+    # Премия в июне увеличивает средний доход, и нагрузка снижается
+    assert engine.update("user-1", history() + [transaction("bonus", "2025-06-20T09:00:00Z", 150000, "Премия")]) == 1
+    after = engine.score("user-1", loans=[loan(35000)], now=NOW)
+    assert after.total_score > before.total_score
+
+
+def test_update_tells_apart_same_ids_from_different_banks_and_missing_ids():
+    def payload(transaction_id, amount, information):
+        raw = {
+            "bookingDateTime": "2025-06-20T09:00:00Z",
+            "amount": {"amount": str(amount), "currency": "RUB"},
+            "creditDebitIndicator": "Credit",
+            "transactionInformation": information,
+        }
+        if transaction_id:
+            raw["transactionId"] = transaction_id
+        return raw
+
+    engine = HealthEngine()
+    first_sync = [
+        mappers.map_transaction("vbank", "acc-1", payload("tx-1", 1000, "Кэшбэк"), "Кэшбэк"),
+        mappers.map_transaction("vbank", "acc-1", payload(None, 2000, "Возврат"), "Возврат"),
+    ]
+    assert engine.update("user-1", first_sync) == 2
+
+    second_sync = first_sync + [
+        mappers.map_transaction("abank", "acc-2", payload("tx-1", 3000, "Кэшбэк"), "Кэшбэк"),
+        mappers.map_transaction("abank", "acc-2", payload(None, 4000, "Возврат"), "Возврат"),
+    ]
+    assert engine.update("user-1", second_sync) == 2
+    assert engine.update("user-1", second_sync) == 0
+
+
+def test_score_without_income():
+    engine = HealthEngine()
+    engine.update("user-1", [transaction("t1", "2025-07-01T09:00:00Z", -500, "Рестораны")])
+    health = engine.score("user-1", now=NOW)
+    components = {component.category: component for component in health.components}
+    assert components["spending"].score == 0
+    assert components["debt"].score == 30 # Кредитов нет
+    assert components["regularity"].score == 0
+    assert all(reward.is_locked for reward in health.rewards)
+
+
+def test_component_timings_are_exposed():
+    engine = HealthEngine()
+    engine.update("user-1", history())
+    engine.score("user-1", now=NOW)
+    engine.score("user-1", now=NOW)
+
+    timings = engine.stats()["timings"]
+    assert set(timings) == {"update", "inputs", "spending", "debt", "savings", "regularity"}
+    assert timings["debt"]["calls"] == 2
+    assert timings["debt"]["total_ms"] >= timings["debt"]["max_ms"] >= 0
+
+
+def test_new_transaction_does_not_recompute_history():
+    """
+    Пять лет истории обрабатываются один раз; новая транзакция и пересчет оценки не зависят от длины истории.
+    """
+    start = datetime(2020, 7, 1, tzinfo=timezone.utc)
+    transactions = [
+        transaction(f"t{i}", (start + timedelta(hours=2 * i)).isoformat(), -float(100 + i % 900) if i % 50 else 5000.0, "Супермаркеты")
+        for i in range(22_000)
+    ]
+    engine = HealthEngine()
+    engine.update("user-1", transactions)
+
+    started = time.perf_counter()
+    engine.update("user-1", [transaction("new", "2025-07-10T10:00:00Z", -100.0, "Рестораны")])
+    engine.score("user-1", now=NOW)
+    assert time.perf_counter() - started < 0.05
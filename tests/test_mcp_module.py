@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
@@ -6,6 +7,8 @@ from sqlalchemy.orm import Session
 from main import app
 from app.db.database import get_db
 from app.mcp.services import MCPService
+from app.banks.response_cache import bank_response_cache
+from app.mcp.concurrency import BankConcurrencyLimiter
 from app.mcp.schemas import MultiBankAccountsRequest, MultiBankConsentRequest, BankOperationResponse
 from app.utils.bank_clients import get_bank_client
 from app.banks.base_client import BaseBankClient
@@ -51,6 +54,11 @@ def mcp_service(mock_db_session, mock_auth_manager):
     """Фикстура для MCPService с мокированными зависимостями."""
     return MCPService(db=mock_db_session, auth_manager=mock_auth_manager)
 
+@pytest.fixture
+def store_mcp_service(session, mock_auth_manager):
+    """Фикстура для MCPService с тестовой БД: транзакции сохраняются в локальное хранилище."""
+    return MCPService(db=session, auth_manager=mock_auth_manager)
+
 @pytest.fixture(name="test_client")
 def test_client_fixture(mock_db_session, mock_auth_manager):
     """Фикстура для тестового клиента FastAPI с переопределенными зависимостями."""
@@ -69,24 +77,24 @@ def test_client_fixture(mock_db_session, mock_auth_manager):
 # --- Tests for MCPService --- 
 
 @pytest.mark.asyncio
-async def test_get_all_accounts_consent_error(mcp_service, mock_auth_manager, mock_bank_client):
+async def test_get_all_accounts_resolves_consent_from_registry(store_mcp_service, mock_bank_client, monkeypatch):
     """
-    Тест ошибки, когда для получения счетов не предоставлен consent_id.
+    Без consent_id MCP создает согласие в каждом банке один раз и переиспользует его из реестра.
     """
-    bank_names = ["vbank", "abank"]
-    user_id = "test-user-1"
+    monkeypatch.setattr(bank_response_cache, "enabled", False)
+    user_id = "registry-user"
+    mock_bank_client.create_consent.side_effect = lambda token, permissions, user: f"consent-{len(mock_bank_client.create_consent.call_args_list)}"
+    mock_bank_client.accounts.get_accounts = AsyncMock(return_value=[{"accountId": "acc-1"}])
 
-    with patch("app.mcp.services.get_bank_client", return_value=mock_bank_client):
-        results = await mcp_service.get_all_accounts(bank_names, user_id)
+    with patch("app.mcp.services.get_bank_client", return_value=mock_bank_client), \
+         patch("app.mcp.consent_registry.get_bank_client", return_value=mock_bank_client):
+        first = await store_mcp_service.get_all_accounts(["vbank", "abank"], user_id)
+        second = await store_mcp_service.get_all_accounts(["vbank", "abank"], user_id)
 
-        assert len(results) == 2
-        for result in results:
-            assert result.status == "failed"
-            assert "требуется consent_id" in result.message
-        
-        # mock_auth_manager.get_access_token не должен вызываться в этом сценарии
-        mock_auth_manager.get_access_token.assert_not_called()
-        assert mock_bank_client.accounts.get_accounts.call_count == 0
+    assert [result.status for result in first + second] == ["success"] * 4
+    assert mock_bank_client.create_consent.call_count == 2
+    consent_ids = [call.args[1] for call in mock_bank_client.accounts.get_accounts.call_args_list]
+    assert sorted(consent_ids) == ["consent-1", "consent-1", "consent-2", "consent-2"]
 
 @pytest.mark.asyncio
 async def test_get_all_accounts_token_not_found(mcp_service, mock_auth_manager):
@@ -128,21 +136,91 @@ async def test_create_consent_success(mcp_service, mock_auth_manager, mock_bank_
         mock_auth_manager.get_access_token.assert_called_once_with(mcp_service.db, bank_name)
         mock_bank_client.create_consent.assert_called_once_with("mock_access_token", permissions, user_id)
 
+@pytest.mark.asyncio
+async def test_get_all_transactions_merges_accounts_and_reports_errors(store_mcp_service, mock_bank_client):
+    """
+    Транзакции всех счетов объединяются и сортируются по дате, ошибка по одному счету попадает в `errors`.
+    """
+    transactions_by_account = {
+        "acc-1": [{"transactionId": "t1", "bookingDateTime": "2025-01-01T10:00:00Z"}],
+        "acc-2": [{"transactionId": "t2", "bookingDateTime": "2025-01-03T10:00:00Z"}],
+    }
+
+    async def get_account_transactions(access_token, consent_id, user_id, account_id, from_booking_date=None):
+        if account_id == "acc-3":
+            raise ValueError("bank is down")
+        return transactions_by_account[account_id]
+
+    mock_bank_client.accounts.get_account_transactions = AsyncMock(side_effect=get_account_transactions)
+    accounts = [
+        {"bank_name": "vbank", "account_id": "acc-1"},
+        {"bank_name": "abank", "account_id": "acc-2"},
+        {"bank_name": "abank", "account_id": "acc-3"},
+    ]
+
+    with patch("app.mcp.transaction_store.get_bank_client", return_value=mock_bank_client):
+        result = await store_mcp_service.get_all_transactions(accounts, "fan-out-user", {"vbank": "c-v", "abank": "c-a"})
+
+    assert [tx["transactionId"] for tx in result.transactions] == ["t2", "t1"]
+    assert result.transactions[0]["bank_name"] == "abank"
+    assert result.transactions[0]["account_id"] == "acc-2"
+    assert len(result.errors) == 1
+    assert result.errors[0].account_id == "acc-3"
+    assert "bank is down" in result.errors[0].message
+    mock_bank_client.accounts.get_account_transactions.assert_any_call("mock_access_token", "c-v", "fan-out-user", "acc-1", from_booking_date=None)
+
+
+@pytest.mark.asyncio
+async def test_get_all_transactions_respects_per_bank_limit(store_mcp_service, mock_bank_client):
+    """
+    Число одновременных запросов к одному банку не превышает `max_per_bank`.
+    """
+    in_flight = 0
+    max_in_flight = 0
+
+    async def get_account_transactions(access_token, consent_id, user_id, account_id, from_booking_date=None):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [{"transactionId": account_id}]
+
+    mock_bank_client.accounts.get_account_transactions = AsyncMock(side_effect=get_account_transactions)
+    accounts = [{"bank_name": "vbank", "account_id": f"acc-{i}"} for i in range(10)]
+
+    with patch("app.mcp.transaction_store.get_bank_client", return_value=mock_bank_client), \
+         patch("app.mcp.services.bank_concurrency_limiter", BankConcurrencyLimiter(max_total=32, max_per_bank=2)):
+        result = await store_mcp_service.get_all_transactions(accounts, "limited-user", "consent-1")
+
+    assert len(result.transactions) == 10
+    assert not result.errors
+    assert max_in_flight == 2
+
 # --- Tests for API Endpoints --- 
 
-def test_api_get_all_accounts_error(test_client):
+def test_api_get_all_accounts_uses_registered_consent(client, mock_bank_client):
     """
-    Интеграционный тест получения счетов через API, ожидаем ошибку из-за отсутствия consent_id.
+    Интеграционный тест: согласие, созданное через MCP, используется при получении счетов без consent_id.
     """
-    response = test_client.post(
-        "/api/v1/mcp/accounts/all",
-        json={"bank_names": ["vbank"], "user_id": "test-user-1"}
-    )
+    mock_bank_client.create_consent.return_value = "api-consent-id"
+    mock_bank_client.accounts.get_accounts = AsyncMock(return_value=[{"accountId": "acc-1"}])
+    with patch("app.mcp.services.get_bank_client", return_value=mock_bank_client), \
+         patch("app.mcp.consent_registry.get_bank_client", return_value=mock_bank_client):
+        client.post(
+            "/api/v1/mcp/consents/create",
+            json={"bank_name": "vbank", "permissions": ["ReadAccountsDetail"], "user_id": "api-registry-user"}
+        )
+        response = client.post(
+            "/api/v1/mcp/accounts/all",
+            json={"bank_names": ["vbank"], "user_id": "api-registry-user"}
+        )
     assert response.status_code == 200
     results = response.json()
     assert len(results) == 1
-    assert results[0]["status"] == "failed"
-    assert "требуется consent_id" in results[0]["message"]
+    assert results[0]["status"] == "success"
+    mock_bank_client.create_consent.assert_called_once()
+    assert mock_bank_client.accounts.get_accounts.call_args.args[1] == "api-consent-id"
 
 def test_api_create_consent_success(test_client, mock_bank_client):
     """
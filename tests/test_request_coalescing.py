@@ -0,0 +1,81 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from main import app
+from app.banks.coalescing import RequestCoalescer
+from app.banks.vbank_client import VBankClient
+from app.utils.bank_clients import BankClientRegistry, get_bank_client_registry
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_reads_share_one_upstream_call():
+    """
+    Одновременные одинаковые запросы счетов выполняются одним запросом к банку,
+    а запрос с другим согласием — отдельным.
+    """
+    client = VBankClient(client_id="id", client_secret="secret", api_url="http://mockbank.com")
+    upstream_requests = []
+
+    async def handle(request):
+        upstream_requests.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"data": {"account": [{"accountId": "acc-1"}]}}, request=request)
+
+    with patch.object(httpx.AsyncHTTPTransport, "handle_async_request", side_effect=handle):
+        results = await asyncio.gather(
+            *[client.accounts.get_accounts("token", "consent-1", "user-1") for _ in range(5)],
+            client.accounts.get_accounts("token", "consent-2", "user-1"),
+        )
+    await client.aclose()
+
+    assert len(upstream_requests) == 2
+    assert all(result == [{"accountId": "acc-1"}] for result in results)
+    assert results[0] is results[4]
+    assert client.coalescing_stats() == {"upstream_calls": 2, "coalesced_calls": 4, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    """
+    Отмена одного ожидающего не отменяет общий запрос, ошибка передается всем ожидающим.
+    """
+    coalescer = RequestCoalescer()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "ok"
+
+    first = asyncio.create_task(coalescer.run("key", fetch))
+    second = asyncio.create_task(coalescer.run("key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+    assert await second == "ok"
+    assert first.cancelled()
+
+    async def failing_fetch():
+        await asyncio.sleep(0)
+        raise ValueError("bank is down")
+
+    results = await asyncio.gather(coalescer.run("other", failing_fetch), coalescer.run("other", failing_fetch), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert coalescer.stats()["coalesced_calls"] == 2
+
+
+def test_api_coalescing_stats_endpoint():
+    """
+    Число сэкономленных запросов доступно через служебный эндпоинт.
+    """
+    registry = BankClientRegistry()
+    registry.get("abank")
+    app.dependency_overrides[get_bank_client_registry] = lambda: registry
+    try:
+        response = TestClient(app).get("/api/v1/admin/bank-clients/coalescing/stats")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert response.json()["coalescing"]["abank"]["coalesced_calls"] == 0
@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.banks.response_cache import BankResponseCache
+
+
+def make_cache(ttl: float = 30.0, stale_ttl: float = 60.0, max_entries: int = 100) -> BankResponseCache:
+    return BankResponseCache({"accounts": ttl, "balances": ttl}, max_entries=max_entries, stale_ttl=stale_ttl)
+
+
+def expire(cache: BankResponseCache, seconds: float):
+    """
+    Сдвигает срок жизни всех записей в прошлое на `seconds` секунд.
+    """
+    for key, (value, expires_at) in cache._entries.items():
+        cache._entries[key] = (value, expires_at - seconds)
+
+
+@pytest.mark.asyncio
+async def test_hit_within_ttl_and_key_includes_consent():
+    """
+    Повторный запрос в пределах TTL не обращается к банку; другой consent_id — другая запись.
+    """
+    cache = make_cache()
+    fetch = AsyncMock(side_effect=[["acc-1"], ["acc-2"]])
+
+    assert await cache.get_or_fetch("vbank", "u1", "c1", "accounts", (), fetch) == (["acc-1"], "MISS")
+    assert await cache.get_or_fetch("vbank", "u1", "c1", "accounts", (), fetch) == (["acc-1"], "HIT")
+    assert await cache.get_or_fetch("vbank", "u1", "c2", "accounts", (), fetch) == (["acc-2"], "MISS")
+    assert fetch.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate_refreshes_in_background():
+    """
+    После истечения TTL отдается устаревший ответ, а свежий загружается в фоне одним запросом.
+    """
+    cache = make_cache(ttl=30.0, stale_ttl=60.0)
+    fetch = AsyncMock(side_effect=[{"balance": 100}, {"balance": 250}])
+    await cache.get_or_fetch("abank", "u1", "c1", "balances", ("acc-1",), fetch)
+    expire(cache, 31.0)
+
+    first = await cache.get_or_fetch("abank", "u1", "c1", "balances", ("acc-1",), fetch)
+    second = await cache.get_or_fetch("abank", "u1", "c1", "balances", ("acc-1",), fetch)
+    assert first == second == ({"balance": 100}, "STALE")
+
+    await asyncio.gather(*cache._refreshing.values())
+    assert await cache.get_or_fetch("abank", "u1", "c1", "balances", ("acc-1",), fetch) == ({"balance": 250}, "HIT")
+    assert fetch.await_count == 2
+    assert cache.stats()["background_refreshes"] == 1
+
+    # За пределами stale_ttl устаревший ответ не отдается
+    expire(cache, 100.0)
+    fetch.side_effect = [{"balance": 300}]
+    assert await cache.get_or_fetch("abank", "u1", "c1", "balances", ("acc-1",), fetch) == ({"balance": 300}, "MISS")
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_invalidation():
+    """
+    При переполнении вытесняется давно использованная запись; invalidate удаляет записи банка и пользователя.
+    """
+    cache = make_cache(max_entries=2)
+    fetch = AsyncMock(return_value=[])
+    await cache.get_or_fetch("vbank", "u1", "c1", "accounts", (), fetch)
+    await cache.get_or_fetch("vbank", "u2", "c1", "accounts", (), fetch)
+    await cache.get_or_fetch("vbank", "u1", "c1", "accounts", (), fetch) # u1 становится недавно использованным
+    await cache.get_or_fetch("sbank", "u1", "c1", "accounts", (), fetch)
+    assert cache.stats()["evictions"] == 1
+    assert ("vbank", "u2", "c1", "accounts", ()) not in cache._entries
+
+    assert cache.invalidate("vbank", "u1") == 1
+    assert cache.stats()["size"] == 1
+    assert (await cache.get_or_fetch("vbank", "u1", "c1", "accounts", (), fetch))[1] == "MISS"
+
+
+def test_api_balances_report_cache_status_and_close_account_invalidates(client):
+    """
+    Эндпоинт балансов сообщает статус кэша в заголовке X-Cache, закрытие счета сбрасывает кэш.
+    """
+    bank_client = MagicMock()
+    bank_client.accounts.get_account_balances = AsyncMock(return_value=[{"type": "InterimAvailable"}])
+    bank_client.accounts.close_account = AsyncMock(return_value={"status": "closed"})
+    request = {"bank_name": "vbank", "consent_id": "consent-1", "user_id": "cache-user"}
+
+    with patch("app.api.v1.endpoints.data.get_bank_client", return_value=bank_client):
+        statuses = [client.post("/api/v1/data/accounts/acc-1/balances", json=request).headers["X-Cache"] for _ in range(2)]
+        close_response = client.put("/api/v1/data/accounts/acc-1/close", json={"bank_name": "vbank", "user_id": "cache-user"})
+        after_close = client.post("/api/v1/data/accounts/acc-1/balances", json=request)
+
+    assert statuses == ["MISS", "HIT"]
+    assert close_response.status_code == 200
+    assert after_close.headers["X-Cache"] == "MISS"
+    assert bank_client.accounts.get_account_balances.await_count == 2
+
+    stats = client.get("/api/v1/admin/bank-clients/response-cache/stats").json()["response_cache"]
+    assert stats["hits"] == 1
+    assert stats["invalidations"] == 1
+
+
+def test_api_create_payment_invalidates_debtor_and_creditor_balances(client):
+    """
+    Платеж сбрасывает кэшированные балансы банка отправителя и, если он указан, банка получателя.
+    """
+    bank_client = MagicMock()
+    bank_client.accounts.get_account_balances = AsyncMock(return_value=[{"type": "InterimAvailable"}])
+    bank_client.payments.create_payment = AsyncMock(return_value={"paymentId": "p-1"})
+    payment = {
+        "Data": {
+            "Initiation": {
+                "InstructionIdentification": "instruction-1",
+                "EndToEndIdentification": "e2e-1",
+                "InstructedAmount": {"Amount": "1.00", "Currency": "RUB"},
+                "DebtorAccount": {"schemeName": "RU.CBR.Account", "identification": "acc-1"},
+                "CreditorAccount": {"schemeName": "RU.CBR.Account", "identification": "acc-2", "Name": "Получатель"},
+            }
+        },
+        "Risk": {},
+    }
+
+    def balances_status(bank_name, account_id):
+        request = {"bank_name": bank_name, "consent_id": "consent-1", "user_id": "payment-user"}
+        return client.post(f"/api/v1/data/accounts/{account_id}/balances", json=request).headers["X-Cache"]
+
+    with patch("app.api.v1.endpoints.data.get_bank_client", return_value=bank_client), \
+         patch("app.api.v1.endpoints.payments.get_bank_client", return_value=bank_client):
+        assert [balances_status("vbank", "acc-1"), balances_status("abank", "acc-2"), balances_status("sbank", "acc-3")] == ["MISS"] * 3
+        response = client.post("/api/v1/payments/vbank/create?creditor_bank=ABank", headers={"X-Consent-Id": "payment-consent"}, json=payment)
+        after_payment = [balances_status("vbank", "acc-1"), balances_status("abank", "acc-2"), balances_status("sbank", "acc-3")]
+
+    assert response.status_code == 200
+    assert after_payment == ["MISS", "MISS", "HIT"]
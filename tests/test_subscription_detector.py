@@ -0,0 +1,106 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.analytics.frame import TransactionFrame, normalize_merchant
+from app.analytics.subscriptions import SubscriptionDetector, detect_subscriptions
+from app.ui_connector import schemas
+
+NOW = datetime(2025, 6, 20, 12, 0, tzinfo=timezone.utc)
+
+
+def transaction(transaction_id, date, amount, description, account_id="acc-1"):
+    return schemas.Transaction(
+        id=transaction_id,
+        date=date,
+        description=description,
+        amount=amount,
+        type="income" if amount > 0 else "expense",
+        category="Подписки",
+        accountId=account_id,
+    )
+
+
+def history():
+    transactions = [
+        # Ежемесячная подписка: номер операции в описании меняется, цена один раз выросла
+        transaction(f"plus-{month}", f"2025-{month:02d}-0{3 + month % 2}T10:00:00Z", -299 if month < 4 else -319, f"YANDEX*PLUS {month}7781")
+        for month in range(1, 7)
+    ]
+    # Еженедельная тренировка
+    transactions += [transaction(f"gym-{i}", (datetime(2025, 4, 2) + timedelta(days=7 * i)).isoformat(), -500, "Fitness Club") for i in range(12)]
+    # Кофе каждые три дня — не подписка
+    transactions += [transaction(f"coffee-{i}", (datetime(2025, 1, 1) + timedelta(days=3 * i)).isoformat(), -150, "Кофейня") for i in range(50)]
+    # Годовая подписка на другом счете
+    transactions += [
+        transaction("ozon-2023", "2023-11-15T10:00:00Z", -1999, "Ozon Premium", "acc-2"),
+        transaction("ozon-2024", "2024-11-14T10:00:00Z", -1999, "Ozon Premium", "acc-2"),
+    ]
+    # Отмененная подписка: последний платеж три месяца назад
+    transactions += [transaction(f"ivi-{month}", f"2025-{month:02d}-10T10:00:00Z", -399, "IVI") for month in range(1, 4)]
+    return transactions
+
+
+def test_normalize_merchant():
+    assert normalize_merchant("YANDEX*PLUS 17781") == "yandex plus"
+    assert normalize_merchant("Ёлка-2") == "елка"
+    assert normalize_merchant("12345") is None
+
+
+def test_detects_weekly_monthly_and_yearly_subscriptions():
+    subscriptions = detect_subscriptions(TransactionFrame.from_transactions(history()), now=NOW)
+    found = {(subscription.name, subscription.billing_cycle): subscription for subscription in subscriptions}
+    assert set(found) == {("Fitness Club", "weekly"), ("YANDEX*PLUS 67781", "monthly"), ("Ozon Premium", "yearly")}
+
+    assert found[("Fitness Club", "weekly")].next_payment_date == "2025-06-25"
+    monthly = found[("YANDEX*PLUS 67781", "monthly")]
+    assert monthly.amount == 319
+    assert monthly.next_payment_date == "2025-07-03"
+    yearly = found[("Ozon Premium", "yearly")]
+    assert yearly.next_payment_date == "2025-11-14"
+    assert yearly.linked_account_id == "acc-2"
+    dates = [subscription.next_payment_date for subscription in subscriptions]
+    assert dates == sorted(dates)
+
+
+def test_detector_recomputes_only_updated_accounts():
+    detector = SubscriptionDetector()
+    detector.update("user-1", history())
+    first = detector.subscriptions("user-1", now=NOW)
+    assert detector.stats()["detections"] == 2
+
+    # Новый платеж подписки на первом счете: пересчитывается только он, идентификатор подписки сохраняется
+    assert detector.update("user-1", history() + [transaction("plus-7", "2025-07-03T10:00:00Z", -319, "YANDEX*PLUS 77781")]) == 1
+    second = detector.subscriptions("user-1", now=NOW)
+    assert detector.stats()["detections"] == 3
+    assert detector.stats()["reused"] == 1
+
+    before = {subscription.id: subscription for subscription in first}
+    after = {subscription.id: subscription for subscription in second}
+    assert before.keys() == after.keys()
+    monthly = next(subscription for subscription in after.values() if subscription.billing_cycle == "monthly")
+    assert monthly.next_payment_date == "2025-08-03"
+
+
+def test_detector_tells_apart_same_ids_from_different_accounts():
+    detector = SubscriptionDetector()
+    music = [transaction(f"tx-{month}", f"2025-{month:02d}-05T10:00:00Z", -169, "Music Service") for month in range(3, 7)]
+    assert detector.update("user-1", music) == 4
+
+    # Другой банк нумерует операции так же, но это другие платежи
+    cloud = [transaction(f"tx-{month}", f"2025-{month:02d}-12T10:00:00Z", -99, "Cloud Storage", account_id="acc-2") for month in range(3, 7)]
+    assert detector.update("user-1", music + cloud) == 4
+    assert {subscription.linked_account_id for subscription in detector.subscriptions("user-1", now=NOW)} == {"acc-1", "acc-2"}
+
+
+def test_detection_over_long_history_is_fast():
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    merchants = [f"Магазин {chr(ord('А') + i % 30)}{chr(ord('А') + i // 30 % 30)}" for i in range(900)]
+    transactions = [
+        transaction(f"t{i}", (start + timedelta(hours=2 * i)).isoformat(), -float(100 + i % 700), merchants[i % len(merchants)])
+        for i in range(22_000)
+    ]
+    frame = TransactionFrame.from_transactions(transactions)
+
+    started = time.perf_counter()
+    detect_subscriptions(frame, now=NOW)
+    assert time.perf_counter() - started < 0.5
@@ -0,0 +1,206 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.analytics.categorizer import Categorizer
+from app.core.config import settings
+from app.db import crud
+from app.mcp.transaction_store import TransactionStore, get_transaction_sync_stats
+from app.auth_manager.services import BaseAuthManager
+
+
+def bank_transaction(transaction_id: str, booking_date: str, amount: str = "100.00", indicator: str = "Debit", status: str = "Booked") -> dict:
+    return {
+        "transactionId": transaction_id,
+        "bookingDateTime": booking_date,
+        "amount": {"amount": amount, "currency": "RUB"},
+        "creditDebitIndicator": indicator,
+        "status": status,
+    }
+
+
+def mock_auth_manager():
+    auth_manager = MagicMock(spec=BaseAuthManager)
+    auth_manager.get_access_token = AsyncMock(return_value="mock_access_token")
+    return auth_manager
+
+
+def bank_client_returning(*responses):
+    """
+    Мок клиента банка, последовательно возвращающий списки транзакций.
+    """
+    client = MagicMock()
+    client.accounts.get_account_transactions = AsyncMock(side_effect=list(responses))
+    return client
+
+
+@pytest.mark.asyncio
+async def test_sync_fetches_delta_after_cursor_and_upserts(session):
+    """
+    Первая синхронизация загружает всю историю, следующая запрашивает транзакции после курсора
+    и обновляет уже сохраненные без дубликатов.
+    """
+    store = TransactionStore(session, mock_auth_manager())
+    initial = [
+        bank_transaction("t1", "2025-01-01T10:00:00Z"),
+        bank_transaction("t2", "2025-01-05T10:00:00Z", status="Pending"),
+    ]
+    delta = [
+        bank_transaction("t2", "2025-01-05T10:00:00Z", status="Booked"),
+        bank_transaction("t3", "2025-01-07T12:00:00Z", amount="500.00", indicator="Credit"),
+    ]
+    client = bank_client_returning(initial, delta)
+
+    with patch("app.mcp.transaction_store.get_bank_client", return_value=client):
+        assert await store.sync_account("vbank", "delta-user", "consent-1", "acc-1") == 2
+        assert await store.sync_account("vbank", "delta-user", "consent-1", "acc-1", force=True) == 2
+
+    first_call, second_call = client.accounts.get_account_transactions.call_args_list
+    assert first_call.kwargs["from_booking_date"] is None
+    expected_from = datetime(2025, 1, 5, 10, tzinfo=timezone.utc) - timedelta(seconds=settings.TRANSACTION_SYNC_OVERLAP)
+    assert second_call.kwargs["from_booking_date"] == expected_from
+
+    stored = await crud.get_transactions(session, "vbank", "delta-user", "acc-1")
+    assert [transaction.transaction_id for transaction in stored] == ["t3", "t2", "t1"]
+    assert stored[1].payload["status"] == "Booked"
+    assert (stored[0].amount, stored[1].amount) == (500.0, -100.0)
+
+    cursor = await crud.get_sync_cursor(session, "vbank", "delta-user", "acc-1")
+    assert cursor.last_transaction_id == "t3"
+
+
+@pytest.mark.asyncio
+async def test_booking_dates_with_offset_are_stored_in_utc(session):
+    """
+    Дата проведения со смещением переводится в UTC: порядок выдачи и курсор синхронизации не зависят от часового пояса банка.
+    """
+    store = TransactionStore(session, mock_auth_manager())
+    client = bank_client_returning(
+        [bank_transaction("moscow", "2025-01-01T10:00:00+03:00"), bank_transaction("utc", "2025-01-01T08:00:00Z")],
+        [],
+    )
+
+    with patch("app.mcp.transaction_store.get_bank_client", return_value=client):
+        await store.sync_account("vbank", "offset-user", "consent-1", "acc-1")
+        await store.sync_account("vbank", "offset-user", "consent-1", "acc-1", force=True)
+
+    stored = await crud.get_transactions(session, "vbank", "offset-user", "acc-1")
+    assert [transaction.transaction_id for transaction in stored] == ["utc", "moscow"]
+    assert crud.as_utc(stored[1].booking_date) == datetime(2025, 1, 1, 7, tzinfo=timezone.utc)
+
+    cursor = await crud.get_sync_cursor(session, "vbank", "offset-user", "acc-1")
+    assert cursor.last_transaction_id == "utc"
+    expected_from = datetime(2025, 1, 1, 8, tzinfo=timezone.utc) - timedelta(seconds=settings.TRANSACTION_SYNC_OVERLAP)
+    assert client.accounts.get_account_transactions.call_args_list[1].kwargs["from_booking_date"] == expected_from
+
+
+@pytest.mark.asyncio
+async def test_recent_sync_is_served_from_local_store(session):
+    """
+    В пределах TRANSACTION_SYNC_MIN_INTERVAL чтение не обращается к банку.
+    """
+    store = TransactionStore(session, mock_auth_manager())
+    client = bank_client_returning([bank_transaction("t1", "2025-02-01T10:00:00Z")])
+    skipped_before = get_transaction_sync_stats()["skipped_syncs"]
+
+    with patch("app.mcp.transaction_store.get_bank_client", return_value=client):
+        first = await store.get_account_transactions("abank", "local-user", "consent-1", "acc-1")
+        second = await store.get_account_transactions("abank", "local-user", "consent-1", "acc-1")
+
+    assert first == second == [bank_transaction("t1", "2025-02-01T10:00:00Z")]
+    assert client.accounts.get_account_transactions.call_count == 1
+    assert get_transaction_sync_stats()["skipped_syncs"] == skipped_before + 1
+
+
+def test_api_account_transactions_uses_local_store(client):
+    """
+    Эндпоинт транзакций счета отдает транзакции в формате банка из локального хранилища.
+    """
+    bank_client = bank_client_returning([bank_transaction("t1", "2025-03-01T10:00:00Z")])
+    with patch("app.mcp.transaction_store.get_bank_client", return_value=bank_client):
+        response = client.post(
+            "/api/v1/data/accounts/acc-api/transactions",
+            json={"bank_name": "sbank", "consent_id": "consent-1", "user_id": "api-user"},
+        )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["transactions"][0]["transactionId"] == "t1"
+    stats = client.get("/api/v1/admin/transactions/sync/stats").json()["transaction_sync"]
+    assert stats["syncs"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_transactions_page_uses_keyset_cursor_and_filters(session):
+    """
+    Страницы идут от новых транзакций к старым без пропусков и повторов, в том числе при одинаковой дате;
+    фильтры по дате, сумме, категории и тексту применяются в БД.
+    """
+    history = [
+        bank_transaction(f"t{i:02d}", f"2025-01-{1 + i // 2:02d}T10:00:00Z", amount=str(100 * (i + 1)))
+        for i in range(10)
+    ]
+    history[3]["category"] = "Кафе"
+    history[3]["transactionInformation"] = "Кофейня «Зерно»"
+    history.append({"transactionId": "no-date", "amount": {"amount": "1.00"}})
+    client = bank_client_returning(history)
+    store = TransactionStore(session, mock_auth_manager())
+
+    with patch("app.mcp.transaction_store.get_bank_client", return_value=client):
+        pages, cursor = [], None
+        while True:
+            page, cursor = await store.get_account_transactions_page("vbank", "page-user", "consent-1", "acc-1", limit=4, cursor=cursor)
+            pages.append([transaction["transactionId"] for transaction in page])
+            if cursor is None:
+                break
+
+    assert pages == [["t09", "t08", "t07", "t06"], ["t05", "t04", "t03", "t02"], ["t01", "t00", "no-date"]]
+    assert client.accounts.get_account_transactions.call_count == 1
+
+    async def page_ids(**filters):
+        page, _ = await store.get_account_transactions_page("vbank", "page-user", "consent-1", "acc-1", limit=20, cursor=None, **filters)
+        return [transaction["transactionId"] for transaction in page]
+
+    with patch("app.mcp.transaction_store.get_bank_client", return_value=client):
+        assert await page_ids(date_from=datetime(2025, 1, 4, tzinfo=timezone.utc)) == ["t09", "t08", "t07", "t06"]
+        # 12:00 по Москве — 09:00 UTC, до проведения t08 и t09 (10:00 UTC)
+        moscow = timezone(timedelta(hours=3))
+        assert await page_ids(date_from=datetime(2025, 1, 4, 12, tzinfo=moscow), date_to=datetime(2025, 1, 5, 12, tzinfo=moscow)) == ["t07", "t06"]
+        assert await page_ids(amount_min=-300, amount_max=-200) == ["t02", "t01"]
+        assert await page_ids(category="Кафе") == ["t03"]
+        assert await page_ids(text="зЕРНО") == ["t03"]
+        assert await page_ids(text="100%") == []
+
+
+def test_api_transactions_rejects_invalid_cursor(client):
+    """
+    Поврежденный курсор страницы отклоняется с кодом 400.
+    """
+    response = client.post(
+        "/api/v1/data/accounts/acc-api/transactions",
+        json={"bank_name": "sbank", "consent_id": "consent-1", "user_id": "api-user", "cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_category_filter_uses_categorizer_and_user_overrides(session):
+    """
+    Категория сохраняется при синхронизации по правилам категоризатора и пересчитывается после изменения правил пользователя.
+    """
+    history = [bank_transaction("taxi", "2025-01-02T10:00:00Z"), bank_transaction("coffee", "2025-01-03T10:00:00Z")]
+    history[0]["transactionInformation"] = "Такси до офиса"
+    history[1]["transactionInformation"] = "Coffee Like 12"
+    categorizer = Categorizer()
+    store = TransactionStore(session, mock_auth_manager(), categorizer=categorizer)
+
+    async def page_ids(category):
+        page, _ = await store.get_account_transactions_page("vbank", "category-user", "consent-1", "acc-1", limit=20, cursor=None, category=category)
+        return [transaction["transactionId"] for transaction in page]
+
+    with patch("app.mcp.transaction_store.get_bank_client", return_value=bank_client_returning(history)):
+        assert await page_ids("Такси") == ["taxi"]
+        assert await page_ids("Кофе") == []
+
+    categorizer.set_override("category-user", "coffee like", "Кофе")
+    assert await store.recategorize("category-user") == 1
+    assert await page_ids("Кофе") == ["coffee"]
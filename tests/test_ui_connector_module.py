@@ -1,3 +1,6 @@
+import asyncio
+import time
+
 import pytest
 from httpx import AsyncClient
 from fastapi import FastAPI, Depends
@@ -6,7 +9,7 @@ from unittest.mock import AsyncMock, MagicMock
 from app.ui_connector.router import router as ui_connector_router
 from app.ui_connector.services import UIService, get_ui_service
 from app.ui_connector import schemas
-from app.mcp.schemas import BankOperationResponse
+from app.mcp.schemas import BankOperationResponse, MultiAccountTransactionsResponse
 from app.mcp.services import MCPService
 from app.schemas.account import Account as MCPSchemaAccount # Используем схему из MCP для мока
 from app.schemas.payment import Transaction as MCPSchemaTransaction # Используем схему из MCP для мока
@@ -249,3 +252,184 @@ async def test_post_dashboard_endpoint(app: FastAPI, mock_ui_service):
 
     # Проверяем, что метод сервиса был вызван
     mock_ui_service.get_dashboard_data.assert_called_once_with(user_id="test_user", consent_id="test_consent")
+
+
+# --- Тесты агрегации данных банков (POST /api/v1/aggregator/all) ---
+
+def bank_response(bank_name, data):
+    return BankOperationResponse(bank_name=bank_name, status="success", data=data)
+
+
+@pytest.fixture
+def aggregator_mcp_service():
+    """
+    MCPService, в котором VBank отвечает сразу, а ABank не успевает ответить на запрос счетов.
+    """
+    mcp_service = AsyncMock(spec=MCPService)
+
+    async def get_all_accounts(bank_names, user_id, consent_id):
+        bank_name = bank_names[0]
+        if bank_name == "abank":
+            await asyncio.sleep(5)
+        return [bank_response(bank_name, [
+            {"accountId": f"{bank_name}-1", "accountSubType": "Checking", "account": [{"identification": "40817810000000001234", "name": "Текущий"}]},
+            {"accountId": f"{bank_name}-2", "accountSubType": "Savings", "nickname": "Копилка"},
+        ])]
+
+    async def get_account_balances(bank_name, user_id, consent_id, account_id):
+        if account_id.endswith("-2"):
+            return BankOperationResponse(bank_name=bank_name, status="failed", message="balance unavailable", error="500")
+        return bank_response(bank_name, [
+            {"type": "InterimBooked", "amount": {"amount": "900.00", "currency": "RUB"}, "creditDebitIndicator": "Credit"},
+            {"type": "InterimAvailable", "amount": {"amount": "1000.00", "currency": "RUB"}, "creditDebitIndicator": "Credit"},
+        ])
+
+    async def get_all_transactions(accounts, user_id, consent_id):
+        transactions = []
+        for account in accounts:
+            account_id = account["account_id"]
+            transactions += [
+                {"transactionId": f"{account_id}-t1", "bookingDateTime": "2025-01-02T10:00:00Z", "amount": {"amount": "150.00"}, "creditDebitIndicator": "Debit", "transactionInformation": "Кофе", "bank_name": account["bank_name"], "account_id": account_id},
+                {"transactionId": f"{account_id}-t2", "bookingDateTime": "2025-01-03T10:00:00Z", "amount": {"amount": "5000.00"}, "creditDebitIndicator": "Credit", "bank_name": account["bank_name"], "account_id": account_id},
+            ]
+        return MultiAccountTransactionsResponse(transactions=transactions)
+
+    mcp_service.get_all_accounts.side_effect = get_all_accounts
+    mcp_service.get_account_balances.side_effect = get_account_balances
+    mcp_service.get_all_transactions.side_effect = get_all_transactions
+    mcp_service.get_cards.side_effect = lambda bank_name, user_id, consent_id: bank_response(
+        bank_name, [{"cardId": "c1", "accountId": f"{bank_name}-1", "panMasked": "4111********1111", "status": "Active", "cardType": "Debit"}]
+    )
+    mcp_service.get_product_agreements.side_effect = lambda bank_name, user_id, consent_id: bank_response(bank_name, [])
+    return mcp_service
+
+
+@pytest.mark.asyncio
+async def test_aggregated_financial_data_is_partial_and_bounded(aggregator_mcp_service):
+    """
+    Банки опрашиваются параллельно: медленный банк отсекается по таймауту, для банка без согласия
+    оно берется из реестра MCPService, а данные ответивших банков возвращаются с отметками свежести.
+    """
+    ui_service = UIService(mcp_service=aggregator_mcp_service)
+    ui_service.bank_timeout = 0.3
+    ui_service.section_timeout = 0.2
+
+    started = time.perf_counter()
+    data = await ui_service.get_aggregated_financial_data(
+        user_id="test_user",
+        consents={"vbank": "consent-v", "abank": "consent-a"},
+        bank_names=["vbank", "abank", "sbank"],
+    )
+    assert time.perf_counter() - started < 1
+
+    assert [account.id for account in data.accounts] == ["vbank-1", "vbank-2", "sbank-1", "sbank-2"]
+    assert data.accounts[0].balance == 1000.0 # InterimAvailable предпочтительнее InterimBooked
+    assert data.accounts[0].last4 == "1234"
+    assert data.accounts[1].type == "savings"
+    assert data.net_worth == 2000.0
+    # Транзакции всех счетов объединены и отсортированы от новых к старым
+    assert [transaction.amount for transaction in data.transactions[:2]] == [5000.0, 5000.0]
+    assert data.transactions[-1].type == "expense"
+    assert data.cards[0].last4 == "1111"
+
+    statuses = {(source.bank_name, source.section): source.status for source in data.sources}
+    assert statuses[("vbank", "accounts")] == "ok"
+    assert statuses[("vbank", "balances")] == "partial"
+    assert statuses[("abank", "accounts")] == "timeout"
+    assert statuses[("abank", "transactions")] == "skipped"
+    assert statuses[("sbank", "accounts")] == "ok"
+    assert statuses[("sbank", "transactions")] == "ok"
+    # Согласие SBank не передано: MCPService получает None и берет согласие из реестра
+    aggregator_mcp_service.get_all_accounts.assert_any_await(["sbank"], "test_user", None)
+    assert data.is_partial
+
+
+def test_aggregator_endpoint_passes_consents(aggregator_mcp_service):
+    """
+    Эндпоинт агрегатора передает пользователя и согласия в UIService.
+    """
+    from main import app as main_app
+
+    main_app.dependency_overrides[get_ui_service] = lambda: UIService(mcp_service=aggregator_mcp_service)
+    try:
+        response = TestClient(main_app).post(
+            "/api/v1/aggregator/all",
+            json={"user_id": "test_user", "consents": {"vbank": "consent-v"}, "bank_names": ["vbank"]},
+        )
+    finally:
+        main_app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["netWorth"] == 1000.0
+    assert data["isPartial"] is True
+    assert {source["section"] for source in data["sources"]} == {"accounts", "balances", "transactions", "cards", "agreements"}
+
+
+# --- Тесты потоковой агрегации (POST /api/v1/aggregator/stream) ---
+
+@pytest.mark.asyncio
+async def test_stream_publishes_fast_bank_before_slow_bank_completes(aggregator_mcp_service):
+    """
+    Разделы быстрого банка отдаются до того, как медленный банк исчерпает свой бюджет,
+    а последним событием приходит итоговый `FinancialData`.
+    """
+    ui_service = UIService(mcp_service=aggregator_mcp_service)
+    ui_service.bank_timeout = 0.5
+    ui_service.section_timeout = 0.4
+
+    started = time.perf_counter()
+    events = []
+    first_event_at = None
+    async for event in ui_service.stream_aggregated_financial_data(
+        user_id="test_user",
+        consents={"vbank": "consent-v", "abank": "consent-a"},
+        bank_names=["vbank", "abank"],
+    ):
+        if first_event_at is None:
+            first_event_at = time.perf_counter() - started
+        events.append(event)
+
+    assert first_event_at < 0.3
+    assert events[-1].event == "complete"
+    assert [account.id for account in events[-1].data.accounts] == ["vbank-1", "vbank-2"]
+
+    sections = [event for event in events if event.event == "section"]
+    vbank_accounts = next(event for event in sections if event.bank_name == "vbank" and event.section == "accounts")
+    assert [account.id for account in vbank_accounts.data] == ["vbank-1", "vbank-2"]
+    assert {source.section for source in vbank_accounts.sources} == {"accounts", "balances"}
+    # Все разделы VBank опубликованы раньше, чем раздел счетов ABank, отсеченный по таймауту
+    abank_accounts_index = next(i for i, event in enumerate(sections) if event.bank_name == "abank" and event.section == "accounts")
+    assert all(i < abank_accounts_index for i, event in enumerate(sections) if event.bank_name == "vbank")
+    assert sections[abank_accounts_index].sources[0].status == "timeout"
+
+
+def test_stream_endpoint_formats(aggregator_mcp_service):
+    """
+    По умолчанию эндпоинт отдает NDJSON, а с заголовком `Accept: text/event-stream` — SSE.
+    """
+    import json
+    from main import app as main_app
+
+    payload = {"user_id": "test_user", "consents": {"vbank": "consent-v"}, "bank_names": ["vbank"]}
+    main_app.dependency_overrides[get_ui_service] = lambda: UIService(mcp_service=aggregator_mcp_service)
+    try:
+        client = TestClient(main_app)
+        ndjson_response = client.post("/api/v1/aggregator/stream", json=payload)
+        sse_response = client.post("/api/v1/aggregator/stream", json=payload, headers={"Accept": "text/event-stream"})
+    finally:
+        main_app.dependency_overrides.clear()
+
+    assert ndjson_response.status_code == 200
+    assert ndjson_response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in ndjson_response.text.splitlines()]
+    assert {(event["bankName"], event["section"]) for event in events[:-1]} == {
+        ("vbank", "accounts"), ("vbank", "transactions"), ("vbank", "cards"), ("vbank", "agreements"),
+    }
+    assert events[-1]["event"] == "complete"
+    assert events[-1]["data"]["netWorth"] == 1000.0
+
+    assert sse_response.headers["content-type"].startswith("text/event-stream")
+    messages = [message for message in sse_response.text.split("\n\n") if message]
+    assert messages[-1].startswith("event: complete\ndata: ")
+    assert json.loads(messages[-1].split("data: ", 1)[1])["data"]["netWorth"] == 1000.0
@@ -1,5 +1,5 @@
 
-import { FinancialData, TrustIssue, BudgetPlan, FinancialHealth } from '../types';
+import { FinancialData, TrustIssue, BudgetPlan, FinancialHealth, AggregatorStreamEvent } from '../types';
 
 /**
  * ---------------------------------------------------------------------------
@@ -311,3 +311,52 @@ export const fetchFinancialData = async (): Promise<FinancialData> => {
         }, 500);
     });
 };
+
+/**
+ * Reads the streaming aggregator endpoint (NDJSON) and calls `onEvent` for every event
+ * as soon as it arrives, so the UI can render fast banks without waiting for slow ones.
+ * Resolves with the final `FinancialData` from the `complete` event.
+ *
+ * @api POST /api/v1/aggregator/stream
+ */
+export const streamFinancialData = async (
+    request: { user_id: string; consents: Record<string, string>; bank_names?: string[] },
+    onEvent: (event: AggregatorStreamEvent) => void,
+    signal?: AbortSignal,
+): Promise<FinancialData> => {
+    const response = await fetch('/api/v1/aggregator/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', Accept: 'application/x-ndjson' },
+        body: JSON.stringify(request),
+        signal,
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`Aggregator stream failed: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result: FinancialData | null = null;
+    const handleLine = (line: string) => {
+        if (!line.trim()) return;
+        const event = JSON.parse(line) as AggregatorStreamEvent;
+        if (event.event === 'complete') result = event.data;
+        onEvent(event);
+    };
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop() ?? '';
+        lines.forEach(handleLine);
+    }
+    handleLine(buffer + decoder.decode());
+
+    if (!result) {
+        throw new Error('Aggregator stream ended without a complete event');
+    }
+    return result;
+};
@@ -71,6 +71,10 @@ export interface Transaction {
    * Used by: 'Smart Pay' (to determine cashback), 'CardsPage' (recommendations), 'Dashboard' (charts).
    */
   category: string;
+  /** Account the transaction belongs to (present in aggregated bank data) */
+  accountId?: string;
+  /** Bank the transaction comes from (present in aggregated bank data) */
+  bankName?: string;
 }
 
 /**
@@ -175,7 +179,7 @@ export interface Subscription {
     id: string;
     name: string;
     amount: number;
-    billingCycle: 'monthly' | 'yearly';
+    billingCycle: 'weekly' | 'monthly' | 'yearly';
     /** ISO 8601 date string of next estimated payment */
     nextPaymentDate: string;
     /** Account ID used for payment */
@@ -338,6 +342,43 @@ export interface FinancialHealth {
     rewards: Reward[];
 }
 
+/**
+ * A card issued on one of the user's accounts.
+ */
+export interface Card {
+  id: string;
+  accountId?: string;
+  bankName: string;
+  last4: string;
+  status: string;
+  type: string;
+}
+
+/**
+ * A product agreement (deposit, loan, card product) opened in a bank.
+ */
+export interface ProductAgreementSummary {
+  id: string;
+  productId: string;
+  bankName: string;
+  status: string;
+  openDate: string;
+}
+
+/**
+ * Freshness and error marker for one data section of one bank.
+ * Lets the UI render partial data when some banks are slow or unavailable.
+ */
+export interface DataSourceStatus {
+  bankName: string;
+  section: 'accounts' | 'balances' | 'transactions' | 'cards' | 'agreements';
+  status: 'ok' | 'partial' | 'error' | 'timeout' | 'skipped';
+  /** ISO 8601 time the data was fetched */
+  fetchedAt?: string;
+  latencyMs?: number;
+  error?: string;
+}
+
 /**
  * Aggregated object containing all financial data for the user.
  * This simulates the response from a "Backend-for-Frontend" (BFF) aggregator endpoint.
@@ -362,4 +403,31 @@ export interface FinancialData {
   recommendedCardOffers: RecommendedCardOffer[];
   budgetPlan: BudgetPlan;
   financialHealth: FinancialHealth;
+  cards?: Card[];
+  productAgreements?: ProductAgreementSummary[];
+  /** Per-bank, per-section freshness and error markers */
+  sources?: DataSourceStatus[];
+  /** True when some bank data could not be fetched in time */
+  isPartial?: boolean;
 }
+
+/**
+ * One event of the streaming aggregator response (NDJSON line or SSE message).
+ * `section` events carry one section of one bank as soon as the bank answers;
+ * the last event is `complete` with the full `FinancialData`.
+ *
+ * @api POST /api/v1/aggregator/stream
+ */
+export type AggregatorStreamEvent =
+  | {
+      event: 'section';
+      bankName: string;
+      section: 'accounts' | 'transactions' | 'cards' | 'agreements';
+      sources: DataSourceStatus[];
+      data: Account[] | Transaction[] | Card[] | ProductAgreementSummary[];
+    }
+  | {
+      event: 'complete';
+      sources: DataSourceStatus[];
+      data: FinancialData;
+    };